@@ -0,0 +1,287 @@
+"""
+Admission control for uploads and downloads.
+
+Endpoints opt in with `@admission_class("upload")` (or "download").
+`AdmissionMiddleware` admits their requests before the body is read, within:
+
+- a per-instance byte budget (ADMISSION_MEMORY_BUDGET), reserving each
+  request's Content-Length (or a per-class estimate);
+- a per-class concurrency limit (ADMISSION_MAX_UPLOADS / ADMISSION_MAX_DOWNLOADS);
+- a fair share per user: at most ADMISSION_MAX_PER_USER requests, and no more
+  than an equal split of the class limit among the users currently active.
+
+Requests that do not fit wait, in arrival order, for up to
+ADMISSION_QUEUE_TIMEOUT seconds; when the queue is full
+(ADMISSION_MAX_QUEUE) or the wait times out they get 429 with Retry-After.
+"""
+import os
+import math
+import time
+import asyncio
+import base64
+import json
+import logging
+from collections import deque
+from typing import Callable, Deque, Dict, Optional
+
+from starlette.responses import JSONResponse
+from starlette.routing import Match
+
+from app.metrics import (
+    ADMISSION_IN_FLIGHT,
+    ADMISSION_QUEUED,
+    ADMISSION_REJECTIONS,
+    ADMISSION_RESERVED_BYTES,
+    ADMISSION_WAIT,
+)
+
+logger = logging.getLogger(__name__)
+
+UPLOAD = "upload"
+DOWNLOAD = "download"
+
+# Bytes reserved when a request does not say how large it is.
+DEFAULT_COSTS = {UPLOAD: 8 * 1024 * 1024, DOWNLOAD: 4 * 1024 * 1024}
+
+
+def admission_class(name: str) -> Callable:
+    """Mark an endpoint as subject to admission control under `name`."""
+    def decorator(endpoint: Callable) -> Callable:
+        endpoint.__admission_class__ = name
+        return endpoint
+    return decorator
+
+
+class Rejected(Exception):
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class _Waiter:
+    __slots__ = ("route_class", "user", "cost", "future")
+
+    def __init__(self, route_class: str, user: str, cost: int, future: asyncio.Future):
+        self.route_class = route_class
+        self.user = user
+        self.cost = cost
+        self.future = future
+
+
+class AdmissionController:
+    """Tracks admitted requests and queues the rest. Used from the event loop only."""
+
+    def __init__(
+        self,
+        budget: Optional[int] = None,
+        limits: Optional[Dict[str, int]] = None,
+        max_per_user: Optional[int] = None,
+        max_queue: Optional[int] = None,
+        queue_timeout: Optional[float] = None,
+    ):
+        self.budget = int(os.getenv("ADMISSION_MEMORY_BUDGET", 512 * 1024 * 1024)) if budget is None else budget
+        self.limits = limits if limits is not None else {
+            UPLOAD: int(os.getenv("ADMISSION_MAX_UPLOADS", "8")),
+            DOWNLOAD: int(os.getenv("ADMISSION_MAX_DOWNLOADS", "32")),
+        }
+        self.max_per_user = int(os.getenv("ADMISSION_MAX_PER_USER", "4")) if max_per_user is None else max_per_user
+        self.max_queue = int(os.getenv("ADMISSION_MAX_QUEUE", "32")) if max_queue is None else max_queue
+        self.queue_timeout = (
+            float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "5")) if queue_timeout is None else queue_timeout
+        )
+        self.reserved = 0
+        self.in_flight: Dict[str, int] = {}
+        self.per_user: Dict[tuple, int] = {}
+        self._waiters: Deque[_Waiter] = deque()
+
+    def _user_share(self, route_class: str, user: str) -> int:
+        limit = self.limits.get(route_class)
+        users = {u for (c, u), n in self.per_user.items() if c == route_class and n}
+        users.add(user)
+        share = math.ceil(limit / len(users)) if limit else self.max_per_user
+        return max(1, min(self.max_per_user, share))
+
+    def _fits_globally(self, route_class: str, cost: int) -> bool:
+        limit = self.limits.get(route_class)
+        if limit is not None and self.in_flight.get(route_class, 0) >= limit:
+            return False
+        # An idle instance always admits one request, however large.
+        return self.reserved == 0 or self.reserved + cost <= self.budget
+
+    def _fits_user(self, route_class: str, user: str) -> bool:
+        return self.per_user.get((route_class, user), 0) < self._user_share(route_class, user)
+
+    def _admit(self, route_class: str, user: str, cost: int) -> None:
+        self.reserved += cost
+        self.in_flight[route_class] = self.in_flight.get(route_class, 0) + 1
+        self.per_user[(route_class, user)] = self.per_user.get((route_class, user), 0) + 1
+        ADMISSION_IN_FLIGHT.labels(route_class).inc()
+        ADMISSION_RESERVED_BYTES.set(self.reserved)
+
+    def release(self, route_class: str, user: str, cost: int) -> None:
+        self.reserved -= cost
+        self.in_flight[route_class] -= 1
+        key = (route_class, user)
+        self.per_user[key] -= 1
+        if not self.per_user[key]:
+            del self.per_user[key]
+        ADMISSION_IN_FLIGHT.labels(route_class).dec()
+        ADMISSION_RESERVED_BYTES.set(self.reserved)
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        """
+        Admit waiters in arrival order. A waiter blocked by the budget or its
+        class limit holds back those behind it (so large uploads are not
+        starved); one blocked only by its user's share is skipped.
+        """
+        blocked_classes = set()
+        for waiter in list(self._waiters):
+            if waiter.future.done():
+                self._waiters.remove(waiter)
+                continue
+            if waiter.route_class in blocked_classes:
+                continue
+            if not self._fits_globally(waiter.route_class, waiter.cost):
+                blocked_classes.add(waiter.route_class)
+                continue
+            if not self._fits_user(waiter.route_class, waiter.user):
+                continue
+            self._waiters.remove(waiter)
+            ADMISSION_QUEUED.labels(waiter.route_class).dec()
+            self._admit(waiter.route_class, waiter.user, waiter.cost)
+            waiter.future.set_result(None)
+
+    async def acquire(self, route_class: str, user: str, cost: int) -> int:
+        """
+        Wait for room for one request. Returns the bytes reserved, to pass
+        back to `release`; raises Rejected if it cannot be admitted in time.
+        """
+        cost = min(cost, self.budget)
+        queued_for_class = sum(1 for w in self._waiters if w.route_class == route_class)
+        if not queued_for_class and self._fits_globally(route_class, cost) and self._fits_user(route_class, user):
+            self._admit(route_class, user, cost)
+            return cost
+        if len(self._waiters) >= self.max_queue:
+            ADMISSION_REJECTIONS.labels(route_class, "queue_full").inc()
+            raise Rejected("queue_full")
+
+        waiter = _Waiter(route_class, user, cost, asyncio.get_running_loop().create_future())
+        self._waiters.append(waiter)
+        ADMISSION_QUEUED.labels(route_class).inc()
+        # The waiters ahead may only be held back by their own users' shares.
+        self._dispatch()
+        if waiter.future.done():
+            return cost
+        started = time.perf_counter()
+        try:
+            # Not wait_for: on Python 3.11 it returns instead of raising when
+            # the task is cancelled just after the waiter was admitted.
+            await asyncio.wait((waiter.future,), timeout=self.queue_timeout)
+        except asyncio.CancelledError:
+            self._abandon(waiter)
+            raise
+        finally:
+            ADMISSION_WAIT.labels(route_class).observe(time.perf_counter() - started)
+        if not waiter.future.done():
+            self._abandon(waiter)
+            ADMISSION_REJECTIONS.labels(route_class, "timeout").inc()
+            raise Rejected("timeout")
+        return cost
+
+    def _abandon(self, waiter: _Waiter) -> None:
+        """Give up on `waiter`: leave the queue, or hand the slot back if it was admitted meanwhile."""
+        if waiter.future.done():
+            self.release(waiter.route_class, waiter.user, waiter.cost)
+        else:
+            waiter.future.cancel()
+            self._waiters.remove(waiter)
+            ADMISSION_QUEUED.labels(waiter.route_class).dec()
+            # It may have been holding back the waiters behind it.
+            self._dispatch()
+
+
+def _header(scope, name: bytes) -> Optional[str]:
+    for key, value in scope["headers"]:
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+
+def request_user(scope) -> str:
+    """
+    Who a request counts against: the bearer token's `sub`, else the
+    `uploaded_by_user_id` query parameter, else the client address. The
+    token is not verified here; this only decides fair shares.
+    """
+    authorization = _header(scope, b"authorization") or ""
+    if authorization.lower().startswith("bearer "):
+        parts = authorization[7:].strip().split(".")
+        if len(parts) == 3:
+            try:
+                payload = json.loads(base64.urlsafe_b64decode(parts[1] + "=" * (-len(parts[1]) % 4)))
+                if payload.get("sub"):
+                    return f"sub:{payload['sub']}"
+            except (ValueError, AttributeError):
+                pass
+    for pair in scope.get("query_string", b"").decode("latin-1").split("&"):
+        name, _, value = pair.partition("=")
+        if name == "uploaded_by_user_id" and value:
+            return f"user:{value}"
+    forwarded = _header(scope, b"x-forwarded-for")
+    if forwarded:
+        return f"ip:{forwarded.split(',')[0].strip()}"
+    client = scope.get("client")
+    return f"ip:{client[0]}" if client else "anonymous"
+
+
+class AdmissionMiddleware:
+    """
+    Pure ASGI middleware applying an AdmissionController to endpoints marked
+    with `admission_class`, before their request body is read.
+    """
+
+    def __init__(self, app, controller: Optional[AdmissionController] = None, retry_after: Optional[int] = None):
+        self.app = app
+        self.controller = controller or AdmissionController()
+        self.retry_after = int(os.getenv("ADMISSION_RETRY_AFTER", "5")) if retry_after is None else retry_after
+        self._routes = None
+
+    def _route_class(self, scope) -> Optional[str]:
+        if self._routes is None:
+            # Routes are fixed once the app serves traffic; keep only the gated ones.
+            self._routes = [
+                (route, route.endpoint.__admission_class__)
+                for route in scope["app"].routes
+                if hasattr(getattr(route, "endpoint", None), "__admission_class__")
+            ]
+        for route, route_class in self._routes:
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                return route_class
+        return None
+
+    async def __call__(self, scope, receive, send):
+        route_class = self._route_class(scope) if scope["type"] == "http" else None
+        if route_class is None:
+            await self.app(scope, receive, send)
+            return
+
+        user = request_user(scope)
+        content_length = _header(scope, b"content-length")
+        cost = int(content_length) if content_length and content_length.isdigit() else DEFAULT_COSTS.get(route_class, 0)
+        try:
+            reserved = await self.controller.acquire(route_class, user, cost)
+        except Rejected as e:
+            logger.warning(f"Rejected {route_class} request from {user}: {e.reason}")
+            response = JSONResponse(
+                status_code=429,
+                content={"detail": "Too many concurrent transfers; retry later."},
+                headers={"Retry-After": str(self.retry_after)},
+            )
+            await response(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release(route_class, user, reserved)
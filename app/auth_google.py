@@ -1,57 +1,44 @@
-import os
-import time
-import google.auth.transport.requests
-import google.oauth2.id_token
-from google.cloud import firestore
+import requests
 from fastapi import HTTPException, status, Depends
 from fastapi.security import OAuth2PasswordBearer
 from app.models.claims import GoogleClaims
+from app.token_verifier import GoogleTokenVerifier
+from app.client_allowlist import ClientIdAllowlist
+from app.metrics import instrument
 
 # OAuth2 scheme to extract Bearer token
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="dummy")
 
-_client_id_cache = {
-    "last_update": 0.0,
-    "cache_ttl": 60.0,
-    "client_ids": set()
-}
+# Keeps Google's signing certs and recently verified tokens in memory
+token_verifier = GoogleTokenVerifier()
 
-def get_valid_client_ids_from_firestore() -> set:
-    now = time.time()
-    if now - _client_id_cache["last_update"] < _client_id_cache["cache_ttl"]:
-        # Return cached version
-        return _client_id_cache["client_ids"]
-    # Otherwise fetch from Firestore
-    db = firestore.Client()
-    new_ids = set()
-    docs = db.collection("allowedClientIDs").stream()
-    for doc in docs:
-        data = doc.to_dict()
-        cid = data.get("clientId")
-        if cid:
-            new_ids.add(cid)
-    # Update cache
-    _client_id_cache["client_ids"] = new_ids
-    _client_id_cache["last_update"] = now
-    return new_ids
+# Allowed token audiences, loaded once and kept current by a snapshot listener
+client_allowlist = ClientIdAllowlist()
 
+def get_valid_client_ids_from_firestore() -> frozenset:
+    return client_allowlist.get()
+
+@instrument("google_auth", "verify_id_token")
 def verify_google_id_token(id_token: str) -> GoogleClaims:
     """
     Verifies the Google ID token and checks if its audience is allowed.
     Returns a GoogleClaims instance if valid.
     """
     try:
-        request = google.auth.transport.requests.Request()
         # Verify the token without specifying 'audience'
-        decoded_claims = google.oauth2.id_token.verify_oauth2_token(
-            id_token, request, audience=None
-        )
+        decoded_claims = token_verifier.verify(id_token)
     except ValueError as e:
         # Invalid token
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail=f"Invalid Google ID token: {str(e)}"
         )
+    except requests.RequestException:
+        # Signing certs could not be loaded at all
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Unable to load Google signing certificates."
+        )
 
     # Ensure the token is issued by Google
     if decoded_claims.get("iss") not in {"accounts.google.com", "https://accounts.google.com"}:
@@ -68,8 +55,7 @@ def verify_google_id_token(id_token: str) -> GoogleClaims:
             detail="ID token missing 'aud' claim."
         )
 
-    allowed_client_ids = get_valid_client_ids_from_firestore()
-    if aud not in allowed_client_ids:
+    if aud not in client_allowlist:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail=f"Token audience '{aud}' is not allowed."
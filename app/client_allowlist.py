@@ -0,0 +1,118 @@
+import os
+import time
+import logging
+import threading
+from typing import FrozenSet, Optional
+from google.cloud import firestore
+from app.services.registry import registry
+
+logger = logging.getLogger(__name__)
+
+
+class ClientIdAllowlist:
+    """
+    In-memory set of OAuth client IDs allowed as token audiences.
+
+    - Loaded once (at startup or on first use) from the `allowedClientIDs` collection.
+    - Kept current by a Firestore snapshot listener; while the listener is down,
+      the set is re-read every `poll_interval` seconds and the listener re-attached.
+    - Reads are lock-free: the set is an immutable frozenset swapped atomically.
+    - Only one caller refreshes at a time; everyone else keeps the current set.
+    """
+
+    def __init__(self, collection_name: Optional[str] = None, client: Optional[firestore.Client] = None):
+        self.collection_name = collection_name or os.getenv("ALLOWED_CLIENT_IDS_COLLECTION", "allowedClientIDs")
+        self.poll_interval = float(os.getenv("ALLOWED_CLIENT_IDS_POLL_INTERVAL", "60"))
+        self._client = client
+        self._client_lock = threading.Lock()
+        self._client_ids: FrozenSet[str] = frozenset()
+        self._loaded = False
+        self._last_update = 0.0
+        self._refresh_lock = threading.Lock()
+        self._watch = None
+
+    @property
+    def client(self) -> firestore.Client:
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    # Shares the process-wide client instead of opening another channel.
+                    self._client = registry.firestore_client()
+        return self._client
+
+    @staticmethod
+    def _extract_ids(docs) -> FrozenSet[str]:
+        ids = set()
+        for doc in docs:
+            cid = (doc.to_dict() or {}).get("clientId")
+            if cid:
+                ids.add(cid)
+        return frozenset(ids)
+
+    def _set_ids(self, ids: FrozenSet[str]) -> None:
+        self._client_ids = ids
+        self._last_update = time.monotonic()
+        self._loaded = True
+
+    def _on_snapshot(self, docs, changes, read_time) -> None:
+        # Each snapshot carries the full result set of the collection.
+        self._set_ids(self._extract_ids(docs))
+        logger.info(f"Allowed client IDs updated by listener ({len(self._client_ids)} IDs)")
+
+    def _listener_active(self) -> bool:
+        return self._watch is not None and self._watch.is_active
+
+    def _start_listener(self) -> None:
+        if self._watch is not None:
+            self._watch.unsubscribe()
+        try:
+            self._watch = self.client.collection(self.collection_name).on_snapshot(self._on_snapshot)
+        except Exception:
+            self._watch = None
+            logger.exception("Could not attach allowed client IDs listener; falling back to polling")
+
+    def refresh(self, wait: bool = True) -> bool:
+        """
+        Re-read the collection and (re)attach the listener if it is down.
+        With `wait=False`, returns False immediately if another caller is refreshing.
+        """
+        seen = self._last_update
+        if not self._refresh_lock.acquire(blocking=wait):
+            return False
+        try:
+            if self._last_update != seen:
+                # Another caller refreshed while we waited for the lock.
+                return True
+            docs = self.client.collection(self.collection_name).stream()
+            self._set_ids(self._extract_ids(docs))
+            if not self._listener_active():
+                self._start_listener()
+            return True
+        finally:
+            self._refresh_lock.release()
+
+    def start(self) -> None:
+        """Load the allowlist eagerly; failures are logged and retried on first use."""
+        try:
+            self.refresh()
+        except Exception:
+            logger.exception("Initial load of allowed client IDs failed")
+
+    def stop(self) -> None:
+        if self._watch is not None:
+            self._watch.unsubscribe()
+            self._watch = None
+
+    def get(self) -> FrozenSet[str]:
+        if not self._loaded:
+            self.refresh()
+        elif time.monotonic() - self._last_update >= self.poll_interval and not self._listener_active():
+            try:
+                self.refresh(wait=False)
+            except Exception:
+                # Keep serving the last known set.
+                logger.exception("Refreshing allowed client IDs failed")
+        return self._client_ids
+
+    def __contains__(self, client_id: str) -> bool:
+        return client_id in self.get()
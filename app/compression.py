@@ -0,0 +1,313 @@
+"""
+Content codings for objects at rest and for HTTP responses.
+
+gzip is always available; zstd is used when the optional `zstandard`
+package is installed. `CompressionMiddleware` compresses responses with
+the best coding the client accepts, while `EncodingWriter` / `DecodingReader`
+compress and decompress GCS objects stored with a `Content-Encoding`.
+"""
+import os
+import zlib
+from typing import Dict, Optional, Sequence, Tuple
+
+from app.metrics import RESPONSE_COMPRESSION_BYTES, STORAGE_COMPRESSION_BYTES
+from app.services.executor import run_blocking
+
+try:
+    import zstandard
+except ImportError:  # optional dependency
+    zstandard = None
+
+GZIP = "gzip"
+ZSTD = "zstd"
+IDENTITY = "identity"
+
+# Server preference when the client accepts several codings equally.
+SUPPORTED_ENCODINGS: Tuple[str, ...] = (ZSTD, GZIP) if zstandard is not None else (GZIP,)
+
+# Levels trading ratio for CPU (see benchmarks/bench_compression.py): gzip
+# past 4 gains ~10% ratio for ~40% less throughput on lead CSVs.
+STORAGE_LEVELS = {GZIP: 4, ZSTD: 6}
+RESPONSE_LEVELS = {GZIP: 4, ZSTD: 3}
+
+DEFAULT_MINIMUM_SIZE = 1024
+# Response chunks above this are compressed off the event loop (zlib and zstd release the GIL).
+OFFLOAD_SIZE = 64 * 1024
+
+COMPRESSIBLE_TYPES = (
+    "text/",
+    "application/json",
+    "application/x-ndjson",
+    "application/xml",
+    "application/javascript",
+)
+
+
+class _GzipCompressor:
+    def __init__(self, level: int):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush()
+
+
+class _ZstdCompressor:
+    def __init__(self, level: int):
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush()
+
+
+def compressor(encoding: str, level: Optional[int] = None):
+    """Streaming compressor with `compress(data)` and a final `flush()`."""
+    if encoding == GZIP:
+        return _GzipCompressor(STORAGE_LEVELS[GZIP] if level is None else level)
+    if encoding == ZSTD and zstandard is not None:
+        return _ZstdCompressor(STORAGE_LEVELS[ZSTD] if level is None else level)
+    raise ValueError(f"Unsupported content encoding '{encoding}'.")
+
+
+def decompressor(encoding: str):
+    """Streaming decompressor with `decompress(data)`."""
+    if encoding == GZIP:
+        return zlib.decompressobj(31)
+    if encoding == ZSTD and zstandard is not None:
+        return zstandard.ZstdDecompressor().decompressobj()
+    raise ValueError(f"Unsupported content encoding '{encoding}'.")
+
+
+def storage_encoding() -> Optional[str]:
+    """Coding for new objects (GCS_CONTENT_ENCODING), or None to store them raw."""
+    encoding = (os.getenv("GCS_CONTENT_ENCODING") or "").strip().lower()
+    if not encoding or encoding == IDENTITY:
+        return None
+    if encoding not in SUPPORTED_ENCODINGS:
+        raise ValueError(f"GCS_CONTENT_ENCODING '{encoding}' is not available; use one of {SUPPORTED_ENCODINGS}.")
+    return encoding
+
+
+def parse_accept_encoding(header: Optional[str]) -> Dict[str, float]:
+    """Map of coding -> q-value from an Accept-Encoding header."""
+    accepted: Dict[str, float] = {}
+    for part in (header or "").split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[coding] = q
+    return accepted
+
+
+def accepts(header: Optional[str], encoding: str) -> bool:
+    accepted = parse_accept_encoding(header)
+    return accepted.get(encoding, accepted.get("*", 0.0)) > 0
+
+
+def negotiate(header: Optional[str], available: Sequence[str] = SUPPORTED_ENCODINGS) -> Optional[str]:
+    """The accepted coding with the highest q-value (server preference breaks ties), or None."""
+    accepted = parse_accept_encoding(header)
+    best, best_q = None, 0.0
+    for encoding in available:
+        q = accepted.get(encoding, accepted.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+class EncodingWriter:
+    """Object writer that compresses everything written before passing it on."""
+
+    def __init__(self, raw, encoding: str, level: Optional[int] = None):
+        self.raw = raw
+        self.encoding = encoding
+        self._compressor = compressor(encoding, level)
+        self._written = 0
+        self._stored = 0
+
+    def write(self, data: bytes) -> int:
+        compressed = self._compressor.compress(data)
+        if compressed:
+            self.raw.write(compressed)
+        self._written += len(data)
+        self._stored += len(compressed)
+        return len(data)
+
+    def close(self) -> None:
+        tail = self._compressor.flush()
+        self.raw.write(tail)
+        self.raw.close()
+        STORAGE_COMPRESSION_BYTES.labels(self.encoding, "in").inc(self._written)
+        STORAGE_COMPRESSION_BYTES.labels(self.encoding, "out").inc(self._stored + len(tail))
+
+
+class DecodingReader:
+    """
+    Binary reader over a compressed stream. `tell()` reports the position in
+    the compressed source, so progress can be measured against its size.
+    """
+
+    def __init__(self, raw, encoding: str, block_size: int = 1024 * 1024):
+        self.raw = raw
+        self.block_size = block_size
+        self._decompressor = decompressor(encoding)
+        self._buffer = b""
+        self._eof = False
+
+    def read(self, size: int = -1) -> bytes:
+        while not self._eof and (size < 0 or len(self._buffer) < size):
+            block = self.raw.read(self.block_size)
+            if not block:
+                self._eof = True
+                break
+            self._buffer += self._decompressor.decompress(block)
+        if size < 0:
+            data, self._buffer = self._buffer, b""
+        else:
+            data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+    def tell(self) -> int:
+        return self.raw.tell()
+
+    def close(self) -> None:
+        self.raw.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _header(headers, name: bytes) -> Optional[bytes]:
+    for key, value in headers:
+        if key.lower() == name:
+            return value
+    return None
+
+
+def _is_download(headers) -> bool:
+    """
+    Resumable or attachment downloads: compressing them would drop their
+    byte ranges and strong ETag, so they are only ever sent in the coding
+    they are stored in (GCS_CONTENT_ENCODING).
+    """
+    accept_ranges = _header(headers, b"accept-ranges")
+    if accept_ranges is not None and accept_ranges.strip().lower() == b"bytes":
+        return True
+    disposition = _header(headers, b"content-disposition")
+    return disposition is not None and disposition.strip().lower().startswith(b"attachment")
+
+
+class CompressionMiddleware:
+    """
+    Pure ASGI middleware compressing responses with the best coding the
+    client accepts (zstd, else gzip), chunk by chunk as they stream.
+
+    Left untouched: bodies below `minimum_size` that arrive in one message,
+    non-text media types, Server-Sent Events (they must not be buffered),
+    partial content (206), resumable or attachment downloads, and responses that already carry a
+    Content-Encoding, such as objects passed through in their stored coding.
+    """
+
+    def __init__(self, app, minimum_size: int = DEFAULT_MINIMUM_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        accept_encoding = _header(scope["headers"], b"accept-encoding")
+        encoding = negotiate(accept_encoding.decode("latin-1")) if accept_encoding else None
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        encoder = None
+        passthrough = False
+
+        async def compress(body: bytes, final: bool) -> bytes:
+            if len(body) > OFFLOAD_SIZE:
+                compressed = await run_blocking(encoder.compress, body)
+            else:
+                compressed = encoder.compress(body)
+            if final:
+                compressed += encoder.flush()
+            RESPONSE_COMPRESSION_BYTES.labels(encoding, "in").inc(len(body))
+            RESPONSE_COMPRESSION_BYTES.labels(encoding, "out").inc(len(compressed))
+            return compressed
+
+        async def send_wrapper(message):
+            nonlocal start_message, encoder, passthrough
+            if message["type"] == "http.response.start":
+                headers = message.get("headers", [])
+                content_type = (_header(headers, b"content-type") or b"").decode("latin-1")
+                passthrough = (
+                    message["status"] == 206
+                    or message["status"] < 200
+                    or _header(headers, b"content-encoding") is not None
+                    or _is_download(headers)
+                    or not content_type.startswith(COMPRESSIBLE_TYPES)
+                    or content_type.startswith("text/event-stream")
+                )
+                if passthrough:
+                    await send(message)
+                else:
+                    # Wait for the first body chunk to know whether compressing pays off.
+                    start_message = message
+                return
+            if passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if encoder is None:
+                if not more_body and len(body) < self.minimum_size:
+                    passthrough = True
+                    await send(start_message)
+                    await send(message)
+                    return
+                encoder = compressor(encoding, RESPONSE_LEVELS[encoding])
+                headers = [
+                    (key, value) for key, value in start_message.get("headers", [])
+                    if key.lower() not in (b"content-length", b"accept-ranges")
+                ]
+                etag = _header(headers, b"etag")
+                if etag is not None and not etag.startswith(b"W/"):
+                    # The compressed bytes differ from the representation the strong ETag names.
+                    headers = [(k, v) for k, v in headers if k.lower() != b"etag"] + [(b"etag", b"W/" + etag)]
+                vary = _header(headers, b"vary")
+                headers = [(k, v) for k, v in headers if k.lower() != b"vary"]
+                headers.append((b"vary", vary + b", Accept-Encoding" if vary else b"Accept-Encoding"))
+                headers.append((b"content-encoding", encoding.encode("ascii")))
+                if not more_body:
+                    compressed = await compress(body, final=True)
+                    headers.append((b"content-length", str(len(compressed)).encode("ascii")))
+                    await send({**start_message, "headers": headers})
+                    await send({"type": "http.response.body", "body": compressed})
+                    return
+                await send({**start_message, "headers": headers})
+
+            compressed = await compress(body, final=not more_body)
+            if compressed or not more_body:
+                await send({"type": "http.response.body", "body": compressed, "more_body": more_body})
+
+        await self.app(scope, receive, send_wrapper)
@@ -1,6 +1,15 @@
 import uvicorn
-from fastapi import FastAPI, APIRouter
+from fastapi import FastAPI, APIRouter, Response
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 from app.routers import firestore, pubsub, storage, scrub_files
+from app.auth_google import client_allowlist, token_verifier
+from app.services.executor import shutdown_io_executor
+from app.services.firestore_service import document_cache
+from app.services.registry import registry, warm_up_enabled
+from app.metrics import PrometheusMiddleware, register_document_cache
+from app.compression import CompressionMiddleware, DEFAULT_MINIMUM_SIZE, storage_encoding
+from app.admission import AdmissionMiddleware
+from app.profiler import Profiler, ProfilerMiddleware, admin_router
 from dotenv import load_dotenv
 import os
 from fastapi.middleware.cors import CORSMiddleware
@@ -15,6 +24,10 @@ logger = logging.getLogger(__name__)
 
 app = FastAPI(title="GCP FastAPI Example with Google Auth")
 
+# Byte budget and concurrency limits for uploads/downloads; 429 + Retry-After when over.
+# Innermost, so rejections still get CORS headers and show up in request metrics.
+app.add_middleware(AdmissionMiddleware)
+
 # Configure CORS (adjust origins as needed)
 app.add_middleware(
     CORSMiddleware,
@@ -22,9 +35,27 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
-    expose_headers=["Content-Disposition"],
+    expose_headers=["Content-Disposition", "ETag"],
 )
 
+# Negotiated gzip/zstd for JSON, NDJSON and CSV bodies (RESPONSE_COMPRESSION=false to turn off)
+if os.getenv("RESPONSE_COMPRESSION", "true").lower() not in ("0", "false", "no"):
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=int(os.getenv("RESPONSE_COMPRESSION_MIN_SIZE", DEFAULT_MINIMUM_SIZE)),
+    )
+
+# Request latency per route template and in-flight requests, served at /metrics
+app.add_middleware(PrometheusMiddleware)
+register_document_cache(document_cache)
+
+# Opt-in sampling profiler (PROFILER_ADMIN_TOKEN); when unset nothing is installed.
+profiler = Profiler.from_env()
+if profiler is not None:
+    profiler.install()
+    app.add_middleware(ProfilerMiddleware, profiler=profiler)
+    app.include_router(admin_router(profiler))
+
 # Create a new APIRouter with the prefix /api/v1
 api_router = APIRouter(prefix="/api/v1")
 
@@ -37,11 +68,47 @@ api_router.include_router(scrub_files.router)
 # Include the new APIRouter in the main app
 app.include_router(api_router)
 
+@app.on_event("startup")
+async def warm_up_clients():
+    # Build the shared GCP clients now rather than on the first request (GCP_CLIENT_WARMUP=false to skip).
+    if warm_up_enabled():
+        await registry.warm_up()
+
+@app.on_event("startup")
+def check_storage_encoding():
+    # Fail at boot rather than on the first upload when GCS_CONTENT_ENCODING names an unavailable coding.
+    storage_encoding()
+
+@app.on_event("startup")
+def load_client_allowlist():
+    client_allowlist.start()
+
+@app.on_event("shutdown")
+def stop_client_allowlist():
+    client_allowlist.stop()
+
+@app.on_event("shutdown")
+def stop_token_verifier():
+    token_verifier.stop()
+
+@app.on_event("shutdown")
+async def close_clients():
+    # Flushes batched Pub/Sub messages, detaches status listeners and closes the shared clients.
+    await registry.close()
+
+@app.on_event("shutdown")
+def stop_io_executor():
+    shutdown_io_executor()
+
 @app.get("/health", tags=["Health"])
 def health_check():
     logger.info("Health check requested")
     return {"status": "OK"}
 
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
 if __name__ == "__main__":
     # For local testing: python -m app.main
     logger.info("Starting Uvicorn server")
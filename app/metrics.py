@@ -0,0 +1,241 @@
+import time
+import inspect
+import functools
+from typing import Callable, Dict, Optional
+
+from prometheus_client import Counter, Gauge, Histogram, REGISTRY
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template.",
+    ["method", "route", "status"],
+)
+REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress",
+    "HTTP requests currently being served.",
+    ["method"],
+)
+DEPENDENCY_LATENCY = Histogram(
+    "dependency_call_duration_seconds",
+    "Latency of calls to Firestore, Cloud Storage, Pub/Sub and token verification.",
+    ["dependency", "operation"],
+)
+DEPENDENCY_ERRORS = Counter(
+    "dependency_call_errors_total",
+    "Failed dependency calls by exception type.",
+    ["dependency", "operation", "error"],
+)
+STORAGE_UPLOADED_BYTES = Counter(
+    "storage_uploaded_bytes_total",
+    "Bytes uploaded to Cloud Storage.",
+)
+STORAGE_DOWNLOADED_BYTES = Counter(
+    "storage_downloaded_bytes_total",
+    "Bytes downloaded from Cloud Storage.",
+)
+SCRUB_ROWS = Counter(
+    "scrub_rows_total",
+    "Rows scrubbed in-process, by output file.",
+    ["category"],
+)
+SCRUB_DEDUP_LOOKUPS = Counter(
+    "scrub_dedup_lookups_total",
+    "Upload deduplication lookups by result (hit, miss).",
+    ["result"],
+)
+SCRUB_DEDUP_SAVED_BYTES = Counter(
+    "scrub_dedup_saved_bytes_total",
+    "Bytes of duplicate uploads that reused an earlier job's results.",
+)
+RESPONSE_COMPRESSION_BYTES = Counter(
+    "http_response_compression_bytes_total",
+    "Response body bytes before (in) and after (out) compression, by coding.",
+    ["encoding", "stage"],
+)
+STORAGE_COMPRESSION_BYTES = Counter(
+    "storage_compression_bytes_total",
+    "Object bytes before (in) and after (out) compression at rest, by coding.",
+    ["encoding", "stage"],
+)
+ADMISSION_IN_FLIGHT = Gauge(
+    "admission_in_flight",
+    "Admitted uploads/downloads currently running, by admission class.",
+    ["route_class"],
+)
+ADMISSION_QUEUED = Gauge(
+    "admission_queue_depth",
+    "Requests waiting for admission, by admission class.",
+    ["route_class"],
+)
+ADMISSION_REJECTIONS = Counter(
+    "admission_rejections_total",
+    "Requests rejected with 429, by admission class and reason (queue_full, timeout).",
+    ["route_class", "reason"],
+)
+ADMISSION_RESERVED_BYTES = Gauge(
+    "admission_reserved_bytes",
+    "Bytes of the instance's admission budget held by admitted requests.",
+)
+ADMISSION_WAIT = Histogram(
+    "admission_wait_seconds",
+    "Time queued requests waited for admission, by admission class.",
+    ["route_class"],
+)
+
+# Requests that matched no route share one label value to bound cardinality.
+UNMATCHED_ROUTE = "unmatched"
+
+
+def observe_dependency(dependency: str, operation: str, started: float, error: Optional[BaseException] = None) -> None:
+    """Record one dependency call that started at `started` (a perf_counter value)."""
+    DEPENDENCY_LATENCY.labels(dependency, operation).observe(time.perf_counter() - started)
+    if error is not None:
+        DEPENDENCY_ERRORS.labels(dependency, operation, type(error).__name__).inc()
+
+
+def instrument(dependency: str, operation: Optional[str] = None) -> Callable:
+    """
+    Decorator recording latency and errors of a dependency call.
+    Works on plain functions, coroutines and (async) generators; generators
+    are timed until they are exhausted or closed.
+    """
+
+    def decorator(func: Callable) -> Callable:
+        op = operation or func.__name__
+
+        if inspect.isasyncgenfunction(func):
+            @functools.wraps(func)
+            async def async_gen_wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                error = None
+                try:
+                    async for item in func(*args, **kwargs):
+                        yield item
+                except Exception as e:
+                    error = e
+                    raise
+                finally:
+                    observe_dependency(dependency, op, started, error)
+            return async_gen_wrapper
+
+        if inspect.isgeneratorfunction(func):
+            @functools.wraps(func)
+            def gen_wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                error = None
+                try:
+                    yield from func(*args, **kwargs)
+                except Exception as e:
+                    error = e
+                    raise
+                finally:
+                    observe_dependency(dependency, op, started, error)
+            return gen_wrapper
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                error = None
+                try:
+                    return await func(*args, **kwargs)
+                except Exception as e:
+                    error = e
+                    raise
+                finally:
+                    observe_dependency(dependency, op, started, error)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            error = None
+            try:
+                return func(*args, **kwargs)
+            except Exception as e:
+                error = e
+                raise
+            finally:
+                observe_dependency(dependency, op, started, error)
+        return wrapper
+
+    return decorator
+
+
+class RouteTemplates:
+    """Route template (e.g. `/api/v1/scrub-files/status/{id}`) of a request, once it was routed."""
+
+    def __init__(self):
+        self._routes: Optional[Dict[Callable, str]] = None
+
+    def __call__(self, scope) -> str:
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return UNMATCHED_ROUTE
+        if self._routes is None:
+            # Routes are fixed once the app serves traffic; map endpoints to paths once.
+            self._routes = {
+                route.endpoint: route.path
+                for route in scope["app"].routes
+                if hasattr(route, "endpoint") and hasattr(route, "path")
+            }
+        return self._routes.get(endpoint, UNMATCHED_ROUTE)
+
+
+class PrometheusMiddleware:
+    """
+    Pure ASGI middleware recording request latency per route template
+    (e.g. `/api/v1/scrub-files/status/{id}`) and in-flight requests.
+    Streaming responses are timed until their last body chunk is sent.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._route_template = RouteTemplates()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status_code = 500
+        in_progress = REQUESTS_IN_PROGRESS.labels(method)
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        in_progress.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            in_progress.dec()
+            REQUEST_LATENCY.labels(method, self._route_template(scope), str(status_code)).observe(
+                time.perf_counter() - started
+            )
+
+
+class DocumentCacheCollector:
+    """Exposes DocumentCache counters at scrape time, so lookups pay nothing extra."""
+
+    def __init__(self, cache):
+        self.cache = cache
+
+    def collect(self):
+        stats = self.cache.stats()
+        hits = CounterMetricFamily("firestore_cache_hits", "Firestore document cache hits.")
+        hits.add_metric([], stats["hits"])
+        misses = CounterMetricFamily("firestore_cache_misses", "Firestore document cache misses.")
+        misses.add_metric([], stats["misses"])
+        size = GaugeMetricFamily("firestore_cache_size", "Documents held in the Firestore cache.")
+        size.add_metric([], stats["size"])
+        return [hits, misses, size]
+
+
+def register_document_cache(cache) -> None:
+    REGISTRY.register(DocumentCacheCollector(cache))
@@ -3,4 +3,12 @@ from enum import Enum
 class FileType(str, Enum):
     clean = "clean"
     invalid = "invalid"
-    dnc = "dnc"
\ No newline at end of file
+    dnc = "dnc"
+
+
+# Keys of `outputFiles` holding each result file's storage path, as written by the scrub workers.
+FILE_TYPE_MAPPING = {
+    FileType.clean: "cleanFilePath",
+    FileType.invalid: "invaldFilePath",
+    FileType.dnc: "blacklistedFilePath",
+}
@@ -0,0 +1,16 @@
+from pydantic import Field
+from typing import Dict
+from datetime import datetime
+from app.models.item import CamelModel
+
+class SignedUploadRequest(CamelModel):
+    file_name: str = Field(..., alias="fileName")
+    content_type: str = Field("application/octet-stream", alias="contentType")
+
+class SignedUrl(CamelModel):
+    url: str
+    method: str
+    # Headers the client must send with the request, e.g. Content-Type for uploads.
+    headers: Dict[str, str] = {}
+    path: str
+    expires_at: datetime = Field(..., alias="expiresAt")
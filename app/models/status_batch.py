@@ -0,0 +1,9 @@
+from pydantic import Field
+from typing import List
+from app.models.item import CamelModel
+
+# Documents read per request; one get_all RPC serves them all.
+MAX_STATUS_BATCH_IDS = 500
+
+class StatusBatchRequest(CamelModel):
+    ids: List[str] = Field(..., min_items=1, max_items=MAX_STATUS_BATCH_IDS)
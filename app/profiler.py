@@ -0,0 +1,256 @@
+"""
+Opt-in sampling profiler for live hot-path analysis.
+
+Installed only when PROFILER_ADMIN_TOKEN is set; otherwise nothing is added
+to the app. Requests are profiled when they carry the token in
+`X-Profile-Token`, and a random PROFILER_SAMPLE_RATE fraction of the rest.
+
+While a profiled request runs, a background thread samples every thread's
+stack each PROFILER_INTERVAL seconds (`sys._current_frames`). A stack counts
+towards the request when it runs inside the request's coroutine chain on
+the event loop, or in a `run_blocking` call the request started. Samples are
+aggregated per route as collapsed stacks (`frame;frame;frame count`, ready
+for flamegraph.pl / speedscope) and dumped by `GET /admin/profile`.
+"""
+import os
+import sys
+import hmac
+import time
+import random
+import threading
+from collections import Counter
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Optional
+
+from fastapi import APIRouter, Header, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+
+from app.metrics import RouteTemplates
+from app.services.executor import set_call_wrapper
+from app.utils import FastJSONResponse
+
+TOKEN_HEADER = b"x-profile-token"
+DEFAULT_INTERVAL = 0.01
+DEFAULT_MAX_STACKS = 5000
+# Stacks beyond PROFILER_MAX_STACKS distinct ones per route are counted here.
+OVERFLOW_STACK = "[other]"
+THREAD_FRAME = "[blocking]"
+
+
+class _ProfiledRequest:
+    __slots__ = ("samples",)
+
+    def __init__(self):
+        self.samples: Counter = Counter()
+
+
+# The profiled request the current task works for, if any.
+_current: ContextVar[Optional[_ProfiledRequest]] = ContextVar("profiled_request", default=None)
+
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    return f"{frame.f_globals.get('__name__', '?')}.{getattr(code, 'co_qualname', code.co_name)}"
+
+
+def _run_attributed(profiler: "Profiler", request: _ProfiledRequest, call: Callable[[], Any]) -> Any:
+    ident = threading.get_ident()
+    with profiler._lock:
+        profiler._threads[ident] = request
+    try:
+        return call()
+    finally:
+        with profiler._lock:
+            profiler._threads.pop(ident, None)
+
+
+_RUN_ATTRIBUTED_CODE = _run_attributed.__code__
+
+
+class Profiler:
+    """Per-route collapsed stacks sampled from profiled requests."""
+
+    def __init__(
+        self,
+        admin_token: str,
+        sample_rate: float = 0.0,
+        interval: float = DEFAULT_INTERVAL,
+        max_stacks: int = DEFAULT_MAX_STACKS,
+    ):
+        self.admin_token = admin_token
+        self.sample_rate = sample_rate
+        self.interval = interval
+        self.max_stacks = max_stacks
+        self.routes: Dict[str, Counter] = {}
+        self.requests: Counter = Counter()
+        self._frames: Dict[Any, _ProfiledRequest] = {}
+        self._threads: Dict[int, _ProfiledRequest] = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+
+    @classmethod
+    def from_env(cls) -> Optional["Profiler"]:
+        """The profiler configured by PROFILER_* variables, or None when it is off."""
+        admin_token = os.getenv("PROFILER_ADMIN_TOKEN")
+        if not admin_token:
+            return None
+        return cls(
+            admin_token,
+            sample_rate=float(os.getenv("PROFILER_SAMPLE_RATE", "0")),
+            interval=float(os.getenv("PROFILER_INTERVAL", DEFAULT_INTERVAL)),
+            max_stacks=int(os.getenv("PROFILER_MAX_STACKS", DEFAULT_MAX_STACKS)),
+        )
+
+    def authorized(self, token: Optional[str]) -> bool:
+        return bool(token) and hmac.compare_digest(token.encode("utf-8"), self.admin_token.encode("utf-8"))
+
+    def wants(self, scope) -> bool:
+        for key, value in scope["headers"]:
+            if key == TOKEN_HEADER:
+                return self.authorized(value.decode("latin-1"))
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def install(self) -> None:
+        set_call_wrapper(self.wrap_call)
+
+    def uninstall(self) -> None:
+        set_call_wrapper(None)
+
+    def wrap_call(self, call: Callable[[], Any]) -> Callable[[], Any]:
+        """Attribute a `run_blocking` call to the profiled request that started it, if any."""
+        request = _current.get()
+        if request is None:
+            return call
+        return lambda: _run_attributed(self, request, call)
+
+    def begin(self, frame) -> _ProfiledRequest:
+        request = _ProfiledRequest()
+        with self._lock:
+            self._frames[frame] = request
+        if self._sampler is None:
+            self._sampler = threading.Thread(target=self._run, name="profiler", daemon=True)
+            self._sampler.start()
+        self._wake.set()
+        return request
+
+    def end(self, frame, request: _ProfiledRequest, route: str) -> None:
+        with self._lock:
+            self._frames.pop(frame, None)
+            if not self._frames:
+                self._wake.clear()
+            stacks = self.routes.setdefault(route, Counter())
+            for stack, count in request.samples.items():
+                if stack not in stacks and len(stacks) >= self.max_stacks:
+                    stack = OVERFLOW_STACK
+                stacks[stack] += count
+            self.requests[route] += 1
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while True:
+            self._wake.wait()
+            self._sample(own)
+            time.sleep(self.interval)
+
+    def _sample(self, own: int) -> None:
+        frames = sys._current_frames()
+        with self._lock:
+            for ident, leaf in frames.items():
+                if ident == own:
+                    continue
+                thread_request = self._threads.get(ident)
+                names = []
+                frame = leaf
+                request = None
+                while frame is not None:
+                    if thread_request is not None and frame.f_code is _RUN_ATTRIBUTED_CODE:
+                        request = thread_request
+                        names.append(THREAD_FRAME)
+                        break
+                    request = self._frames.get(frame)
+                    if request is not None:
+                        break
+                    names.append(_frame_name(frame))
+                    frame = frame.f_back
+                if request is not None and names:
+                    request.samples[";".join(reversed(names))] += 1
+
+    def reset(self) -> None:
+        with self._lock:
+            self.routes.clear()
+            self.requests.clear()
+
+    def collapsed(self, route: Optional[str] = None) -> str:
+        """`route;frame;...;frame count` lines, one per distinct stack."""
+        with self._lock:
+            lines = [
+                f"{name};{stack} {count}"
+                for name, stacks in self.routes.items()
+                if route is None or name == route
+                for stack, count in stacks.most_common()
+            ]
+        return "\n".join(lines) + ("\n" if lines else "")
+
+    def summary(self, route: Optional[str] = None) -> dict:
+        with self._lock:
+            return {
+                name: {
+                    "requests": self.requests[name],
+                    "samples": sum(stacks.values()),
+                    "seconds": round(sum(stacks.values()) * self.interval, 3),
+                    "stacks": dict(stacks.most_common()),
+                }
+                for name, stacks in self.routes.items()
+                if route is None or name == route
+            }
+
+
+class ProfilerMiddleware:
+    """
+    Pure ASGI middleware profiling the requests `Profiler.wants`. Its own
+    coroutine frame marks the request's stacks; everything below it counts.
+    """
+
+    def __init__(self, app, profiler: Profiler):
+        self.app = app
+        self.profiler = profiler
+        self._route_template = RouteTemplates()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.profiler.wants(scope):
+            await self.app(scope, receive, send)
+            return
+
+        frame = sys._getframe()
+        request = self.profiler.begin(frame)
+        token = _current.set(request)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _current.reset(token)
+            self.profiler.end(frame, request, f'{scope["method"]} {self._route_template(scope)}')
+
+
+def admin_router(profiler: Profiler) -> APIRouter:
+    """`GET /admin/profile`: the collected stacks, for holders of the admin token."""
+    router = APIRouter()
+
+    @router.get("/admin/profile", include_in_schema=False)
+    def dump_profile(
+        route: Optional[str] = Query(None, description="Only this route, e.g. 'GET /api/v1/scrub-files/list'."),
+        format: str = Query("collapsed", regex="^(collapsed|json)$"),
+        reset: bool = Query(False, description="Clear the collected stacks after dumping them."),
+        token: Optional[str] = Header(None, alias="X-Profile-Token"),
+    ):
+        if not profiler.authorized(token):
+            raise HTTPException(status_code=403, detail="Invalid profiler token.")
+        if format == "json":
+            response = FastJSONResponse(content={"interval": profiler.interval, "routes": profiler.summary(route)})
+        else:
+            response = PlainTextResponse(profiler.collapsed(route))
+        if reset:
+            profiler.reset()
+        return response
+
+    return router
@@ -1,14 +1,26 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, status
 from app.auth_google import google_auth_dependency
 from app.models.item import Item
 from app.services.firestore_service import FirestoreService
+from app.services.registry import get_firestore_service
 from app.models.claims import GoogleClaims
+from app.utils import (
+    FastJSONResponse,
+    is_not_modified,
+    not_modified_response,
+    update_time_etag,
+    validator_headers,
+)
 
-router = APIRouter()
-firestore_service = FirestoreService()
+router = APIRouter(default_response_class=FastJSONResponse)
 
 @router.post("/create")
-def create_document(item: Item, claims: GoogleClaims = Depends(google_auth_dependency)):
+def create_document(
+    item: Item,
+    claims: GoogleClaims = Depends(google_auth_dependency),
+    firestore_service: FirestoreService = Depends(get_firestore_service),
+):
     """
     Create a Firestore document with the given item data.
     Requires a valid Google ID token from the front-end.
@@ -17,21 +29,47 @@ def create_document(item: Item, claims: GoogleClaims = Depends(google_auth_depen
     return {"message": "Document created", "doc_id": doc_id}
 
 @router.get("/{doc_id}")
-def get_document(doc_id: str, claims: GoogleClaims = Depends(google_auth_dependency)):
-    doc = firestore_service.get_document(doc_id)
+def get_document(
+    doc_id: str,
+    if_none_match: Optional[str] = Header(None, alias="If-None-Match"),
+    if_modified_since: Optional[str] = Header(None, alias="If-Modified-Since"),
+    claims: GoogleClaims = Depends(google_auth_dependency),
+    firestore_service: FirestoreService = Depends(get_firestore_service),
+):
+    if if_none_match or if_modified_since:
+        # Conditional requests are decided from the update time alone.
+        update_time = firestore_service.get_update_time(doc_id)
+        if update_time is not None:
+            headers = validator_headers(update_time_etag(update_time), update_time)
+            if is_not_modified(if_none_match, if_modified_since, headers["ETag"], update_time):
+                return not_modified_response(headers)
+    doc, update_time = firestore_service.get_document_with_update_time(doc_id)
     if doc is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Document not found")
-    return doc
+    # Returned directly so FastAPI skips its jsonable_encoder pass.
+    return FastJSONResponse(
+        content=doc,
+        headers=validator_headers(update_time_etag(update_time) if update_time else None, update_time),
+    )
 
 @router.put("/{doc_id}")
-def update_document(doc_id: str, item: Item, claims: GoogleClaims = Depends(google_auth_dependency)):
+def update_document(
+    doc_id: str,
+    item: Item,
+    claims: GoogleClaims = Depends(google_auth_dependency),
+    firestore_service: FirestoreService = Depends(get_firestore_service),
+):
     updated = firestore_service.update_document(doc_id, item.dict())
     if not updated:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Document not found")
     return {"message": "Document updated"}
 
 @router.delete("/{doc_id}")
-def delete_document(doc_id: str, claims: GoogleClaims = Depends(google_auth_dependency)):
+def delete_document(
+    doc_id: str,
+    claims: GoogleClaims = Depends(google_auth_dependency),
+    firestore_service: FirestoreService = Depends(get_firestore_service),
+):
     deleted = firestore_service.delete_document(doc_id)
     if not deleted:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Document not found")
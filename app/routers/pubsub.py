@@ -1,13 +1,17 @@
 from fastapi import APIRouter, Depends, HTTPException
 from app.auth_google import google_auth_dependency
 from app.services.pubsub_service import PubSubService
+from app.services.registry import get_pubsub_service
 from app.models.claims import GoogleClaims
 
 router = APIRouter()
-pubsub_service = PubSubService()
 
 @router.post("/publish")
-def publish_message(message: str, claims: GoogleClaims = Depends(google_auth_dependency)):
+def publish_message(
+    message: str,
+    claims: GoogleClaims = Depends(google_auth_dependency),
+    pubsub_service: PubSubService = Depends(get_pubsub_service),
+):
     """
     Publishes a message to Pub/Sub. Requires valid Google ID token.
     """
@@ -1,85 +1,233 @@
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Depends, BackgroundTasks, Query
-from fastapi.responses import JSONResponse, StreamingResponse
-from datetime import datetime
-import json
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Depends, Query, Header
+from fastapi.responses import RedirectResponse, StreamingResponse
+from datetime import datetime, timedelta
+from email.utils import format_datetime
+from typing import List, Optional
+from pydantic import ValidationError
+import csv
 import io
+import json
 import os
 import asyncio
+import itertools
 import mimetypes
 
-from app.services.firestore_service import FirestoreService
-from app.services.storage_service import StorageService
-from app.services.pubsub_service import PubSubService
+from app.services.firestore_service import AsyncFirestoreService
+from app.services.storage_service import AsyncStorageService
+from app.services.pubsub_service import AsyncPubSubService
+from app.services.status_watch_service import StatusWatchService
+from app.services.dedup_service import DedupService, dedup_key
+from app.services.registry import (
+    get_async_firestore_service,
+    get_async_pubsub_service,
+    get_async_storage_service,
+    get_dedup_service,
+    get_scrub_engine,
+    get_status_watch_service,
+    registry,
+)
+from app.services.executor import run_blocking, get_io_executor
 from app.models.item import Item, Status, OutputFiles
-from app.models.file_type import FileType
+from app.models.file_type import FILE_TYPE_MAPPING, FileType
 from app.models.pubsub_message import PubSubMessage
-from app.utils import make_serializable
+from app.models.signed_url import SignedUploadRequest, SignedUrl
+from app.models.status_batch import StatusBatchRequest
+from app.metrics import SCRUB_DEDUP_SAVED_BYTES
+from app.compression import accepts
+from app.admission import DOWNLOAD, UPLOAD, admission_class
+from app.utils import (
+    FastJSONResponse,
+    dumps,
+    if_range_matches,
+    is_not_modified,
+    not_modified_response,
+    parse_byte_range,
+    update_time_etag,
+    validator_headers,
+    versions_etag,
+)
 from app.auth_google import google_auth_dependency #TODO: implement auth for scrub-files
 
 router = APIRouter(
     prefix="/scrub-files",
     tags=["Scrub Files"],
+    default_response_class=FastJSONResponse,
 )
     #FIXME: dependencies=[Depends(google_auth_dependency)],
 
-firestore_service = FirestoreService()
-storage_service = StorageService()
-pubsub_service = PubSubService()
+MAX_PAGE_SIZE = 1000
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
 
 @router.get("/list")
-async def list_files():
+async def list_files(
+    page_size: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE, description="Maximum number of files to return."),
+    cursor: Optional[str] = Query(None, description="ID of the last file of the previous page."),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return, e.g. fileName,status,timestamp."),
+    uploaded_by_user_id: Optional[str] = Query(None, description="Only files uploaded by this user."),
+    stage: Optional[str] = Query(None, description="Only files whose status.stage matches."),
+    format: Optional[str] = Query(None, regex="^(json|ndjson)$", description="Set to ndjson to stream one file per line."),
+    accept: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None, alias="If-None-Match"),
+    firestore_service: AsyncFirestoreService = Depends(get_async_firestore_service),
+):
     """
-    List all uploaded files and their statuses.
+    List uploaded files and their statuses.
+    Paginate with `page_size` and `cursor`; the JSON response includes `nextCursor`
+    when more results may follow. Request NDJSON (`format=ndjson` or
+    `Accept: application/x-ndjson`) to stream rows as the query returns them.
+    JSON pages carry a weak ETag; `If-None-Match` is checked with a keys-only
+    query, so an unchanged page is answered 304 without reading the documents.
     """
+    query_options = {
+        "page_size": page_size,
+        "cursor": cursor,
+        "fields": [f.strip() for f in fields.split(",") if f.strip()] if fields else None,
+        "uploaded_by_user_id": uploaded_by_user_id,
+        "stage": stage,
+    }
     try:
-        documents = firestore_service.list_documents()
-        files_serializable = []
-        for doc in documents:
-            doc_serializable = make_serializable(doc)
-            files_serializable.append(doc_serializable)
+        if format == "ndjson" or (format is None and accept and NDJSON_MEDIA_TYPE in accept):
+            async def ndjson_lines():
+                async for doc in firestore_service.stream_documents(**query_options):
+                    yield dumps(doc) + b"\n"
 
-        return JSONResponse(
+            return StreamingResponse(ndjson_lines(), media_type=NDJSON_MEDIA_TYPE)
+
+        if if_none_match:
+            etag = versions_etag(await firestore_service.list_versions(**query_options))
+            if is_not_modified(if_none_match, None, etag, None):
+                return not_modified_response({"ETag": etag})
+
+        documents, versions = await firestore_service.list_documents_with_versions(**query_options)
+
+        next_cursor = None
+        if page_size and len(documents) == page_size:
+            next_cursor = documents[-1]["id"]
+
+        return FastJSONResponse(
             status_code=200,
-            content={"data": files_serializable},
+            content={"data": documents, "nextCursor": next_cursor},
+            headers={"ETag": versions_etag(versions)},
         )
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def _prepare_file_config(file_config: Item, storage_path: str, content_sha256: Optional[str] = None) -> dict:
+    """Mark an uploaded file's config as UPLOADED and point it at its storage path."""
+    file_config.status = Status(stage="UPLOADED", last_updated=datetime.utcnow())
+    file_config.output_files = OutputFiles(
+        base_file_path=storage_path,
+        clean_file_path=file_config.output_files.clean_file_path or "",
+        invalid_file_path=file_config.output_files.invalid_file_path or "",
+        dnc_file_path=file_config.output_files.dnc_file_path or ""
+    )
+    data = file_config.dict(by_alias=True)
+    if content_sha256:
+        data["contentSha256"] = content_sha256
+    return data
+
+async def _reuse_scrubbed_upload(
+    upload: dict,
+    file_config: Item,
+    dedup_service: DedupService,
+    storage_service: AsyncStorageService,
+) -> Optional[dict]:
+    """
+    When the same content was already scrubbed with the same phone settings,
+    returns the new file's config marked DONE with that job's `outputFiles`,
+    and deletes the duplicate object. Returns None otherwise.
+    """
+    found = await dedup_service.find(dedup_key(upload["sha256"], file_config))
+    if found is None:
+        return None
+    source_id, source = found
+    output_files = dict(source.get("outputFiles") or {})
+
+    if upload["path"] != output_files.get("baseFilePath"):
+        # Only delete our own upload, not a different file PUT to the same name since.
+        blob = await storage_service.get_blob(upload["path"])
+        if blob is not None and blob.crc32c == upload["crc32c"]:
+            await storage_service.delete_blob(upload["path"], blob.generation)
+    SCRUB_DEDUP_SAVED_BYTES.inc(upload["size"])
+
+    status = {"stage": "DONE", "lastUpdated": datetime.utcnow(), "progress": 1.0}
+    if "rowCounts" in (source.get("status") or {}):
+        status["rowCounts"] = source["status"]["rowCounts"]
+    return {
+        **file_config.dict(by_alias=True),
+        "status": status,
+        "outputFiles": output_files,
+        "contentSha256": upload["sha256"],
+        "dedupOf": source_id,
+    }
+
+def _scrub_job_message(doc_id: str, file_config: Item) -> dict:
+    return PubSubMessage(
+        fileId=doc_id,
+        bucket=os.getenv("BUCKET_NAME"),
+        fileName=file_config.file_name,
+        configDocumentPath=f"{os.getenv('FIRESTORE_COLLECTION')}/{doc_id}",
+    ).dict()
+
+def scrub_in_process() -> bool:
+    return os.getenv("SCRUB_IN_PROCESS", "false").lower() in ("1", "true", "yes")
+
+async def _queue_scrub_jobs(jobs: List[tuple], pubsub_service: AsyncPubSubService) -> None:
+    """
+    Queue scrub jobs for (doc_id, file_config) pairs: on this instance's scrub
+    engine when SCRUB_IN_PROCESS is set, otherwise as Pub/Sub messages.
+    """
+    if scrub_in_process():
+        engine = registry.scrub_engine()
+        for doc_id, _ in jobs:
+            engine.submit(doc_id)
+    elif len(jobs) == 1:
+        # Batched, fire-and-forget: the publisher callback logs the outcome.
+        await pubsub_service.publish_nowait(_scrub_job_message(*jobs[0]))
+    elif jobs:
+        await pubsub_service.publish_batch([_scrub_job_message(*job) for job in jobs])
+
 @router.post("/upload")
+@admission_class(UPLOAD)
 async def upload_file(
-    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     fileConfig: str = Form(...),
+    firestore_service: AsyncFirestoreService = Depends(get_async_firestore_service),
+    storage_service: AsyncStorageService = Depends(get_async_storage_service),
+    pubsub_service: AsyncPubSubService = Depends(get_async_pubsub_service),
+    dedup_service: DedupService = Depends(get_dedup_service),
 ):
     """
     Upload a file to Google Cloud Storage and save its configuration to Firestore.
+    A file already scrubbed with the same phone settings is not processed
+    again: the new file is DONE at once and shares the earlier results.
     """
     try:
         file_config_data = json.loads(fileConfig)
         file_config = Item(**file_config_data)
 
         storage_path = f"uploads/{file_config.file_name}"
-        await storage_service.upload_file(file, storage_path)
-
-        file_config.status = Status(stage="UPLOADED", last_updated=datetime.utcnow())
-        file_config.output_files = OutputFiles(
-            base_file_path=storage_path,
-            clean_file_path=file_config.output_files.clean_file_path or "",
-            invalid_file_path=file_config.output_files.invalid_file_path or "",
-            dnc_file_path=file_config.output_files.dnc_file_path or ""
-        )
+        upload = await storage_service.upload_stream(file, storage_path)
 
-        doc_id = firestore_service.create_document(file_config.dict(by_alias=True))
+        reused = await _reuse_scrubbed_upload(upload, file_config, dedup_service, storage_service)
+        if reused is not None:
+            doc_id = await firestore_service.create_document(reused)
+            return FastJSONResponse(
+                status_code=200,
+                content={
+                    "message": "File already scrubbed; results reused.",
+                    "id": doc_id,
+                    "deduplicatedFrom": reused["dedupOf"],
+                },
+            )
 
-        message = PubSubMessage(
-            fileId=doc_id,
-            bucket=os.getenv("BUCKET_NAME"),
-            fileName=file_config.file_name,
-            configDocumentPath=f"{os.getenv('FIRESTORE_COLLECTION')}/{doc_id}",
+        doc_id = await firestore_service.create_document(
+            _prepare_file_config(file_config, storage_path, upload["sha256"])
         )
-        background_tasks.add_task(pubsub_service.publish_message, message.dict())
+        await dedup_service.record(dedup_key(upload["sha256"], file_config), doc_id, upload["sha256"])
+        await _queue_scrub_jobs([(doc_id, file_config)], pubsub_service)
 
-        return JSONResponse(
+        return FastJSONResponse(
             status_code=200,
             content={"message": "File uploaded and config saved.", "id": doc_id},
         )
@@ -88,77 +236,562 @@ async def upload_file(
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/upload-url")
+async def create_upload_url(
+    upload: SignedUploadRequest,
+    storage_service: AsyncStorageService = Depends(get_async_storage_service),
+):
+    """
+    Issue a V4 signed URL to PUT a file straight to Cloud Storage, bypassing
+    this service. Send the returned headers with the PUT, then call
+    `/upload/finalize` with the file's config.
+    """
+    storage_path = f"uploads/{upload.file_name}"
+    try:
+        url = await storage_service.generate_upload_url(storage_path, upload.content_type)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    signed_url = SignedUrl(
+        url=url,
+        method="PUT",
+        headers={"Content-Type": upload.content_type},
+        path=storage_path,
+        expires_at=datetime.utcnow() + timedelta(seconds=storage_service.signed_url_ttl),
+    )
+    return FastJSONResponse(status_code=200, content=signed_url.dict(by_alias=True))
+
+@router.post("/upload/finalize")
+async def finalize_upload(
+    file_config: Item,
+    firestore_service: AsyncFirestoreService = Depends(get_async_firestore_service),
+    storage_service: AsyncStorageService = Depends(get_async_storage_service),
+    pubsub_service: AsyncPubSubService = Depends(get_async_pubsub_service),
+):
+    """
+    Save the config of a file uploaded through a signed URL and queue its scrub job.
+    """
+    storage_path = f"uploads/{file_config.file_name}"
+    try:
+        blob = await storage_service.get_blob(storage_path)
+        if blob is None:
+            raise HTTPException(status_code=404, detail="Uploaded file not found. PUT it to the signed URL first.")
+
+        doc_id = await firestore_service.create_document(_prepare_file_config(file_config, storage_path))
+        await _queue_scrub_jobs([(doc_id, file_config)], pubsub_service)
+
+        return FastJSONResponse(
+            status_code=200,
+            content={"message": "File upload finalized and config saved.", "id": doc_id, "size": blob.size},
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+MAX_BATCH_FILES = 100
+UPLOAD_BATCH_CONCURRENCY = int(os.getenv("UPLOAD_BATCH_CONCURRENCY", "4"))
+
+@router.post("/upload-batch")
+@admission_class(UPLOAD)
+async def upload_files_batch(
+    files: List[UploadFile] = File(...),
+    fileConfigs: str = Form(..., description="JSON array of file configs, in the same order as files."),
+    firestore_service: AsyncFirestoreService = Depends(get_async_firestore_service),
+    storage_service: AsyncStorageService = Depends(get_async_storage_service),
+    pubsub_service: AsyncPubSubService = Depends(get_async_pubsub_service),
+    dedup_service: DedupService = Depends(get_dedup_service),
+):
+    """
+    Upload many files at once.
+    Files go to GCS concurrently (at most UPLOAD_BATCH_CONCURRENCY at a time), all
+    configs are written in one Firestore batch and all scrub jobs are published
+    together. Files already scrubbed reuse their results, as with `/upload`.
+    Returns one result per file; a failed upload does not fail the batch.
+    """
+    try:
+        configs_data = json.loads(fileConfigs)
+    except json.JSONDecodeError:
+        raise HTTPException(status_code=400, detail="Invalid JSON for fileConfigs.")
+    if not isinstance(configs_data, list) or len(configs_data) != len(files):
+        raise HTTPException(status_code=400, detail="fileConfigs must be a list with one config per file.")
+    if len(files) > MAX_BATCH_FILES:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_FILES} files per batch.")
+    try:
+        file_configs = [Item(**data) for data in configs_data]
+    except ValidationError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        semaphore = asyncio.Semaphore(UPLOAD_BATCH_CONCURRENCY)
+
+        async def upload_one(file: UploadFile, file_config: Item) -> tuple:
+            storage_path = f"uploads/{file_config.file_name}"
+            async with semaphore:
+                upload = await storage_service.upload_stream(file, storage_path)
+            reused = await _reuse_scrubbed_upload(upload, file_config, dedup_service, storage_service)
+            if reused is not None:
+                return upload, reused
+            return upload, _prepare_file_config(file_config, storage_path, upload["sha256"])
+
+        uploads = await asyncio.gather(
+            *(upload_one(file, config) for file, config in zip(files, file_configs)),
+            return_exceptions=True,
+        )
+
+        results = [{"fileName": config.file_name} for config in file_configs]
+        uploaded = []
+        for index, outcome in enumerate(uploads):
+            if isinstance(outcome, Exception):
+                results[index]["error"] = str(outcome)
+            else:
+                uploaded.append((index, *outcome))
+
+        if uploaded:
+            doc_ids = await firestore_service.create_documents([data for _, _, data in uploaded])
+            jobs = []
+            records = []
+            for (index, upload, data), doc_id in zip(uploaded, doc_ids):
+                results[index]["id"] = doc_id
+                if "dedupOf" in data:
+                    results[index]["deduplicatedFrom"] = data["dedupOf"]
+                    continue
+                jobs.append((doc_id, file_configs[index]))
+                records.append(dedup_service.record(
+                    dedup_key(upload["sha256"], file_configs[index]), doc_id, upload["sha256"]
+                ))
+            await asyncio.gather(*records)
+            await _queue_scrub_jobs(jobs, pubsub_service)
+
+        return FastJSONResponse(
+            status_code=200,
+            content={"message": f"{len(uploaded)} of {len(files)} files uploaded.", "results": results},
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/process/{id}", status_code=202)
+async def process_file(
+    id: str,
+    firestore_service: AsyncFirestoreService = Depends(get_async_firestore_service),
+    scrub_engine = Depends(get_scrub_engine),
+):
+    """
+    Scrub an uploaded file on this instance instead of the Pub/Sub worker.
+    Returns 202 at once; follow progress through `/status/{id}` or its events.
+    """
+    try:
+        file_config = await firestore_service.get_document(id)
+        if not file_config:
+            raise HTTPException(status_code=404, detail="FileConfig not found.")
+        scrub_engine.submit(id)
+        return FastJSONResponse(
+            status_code=202,
+            content={"message": "Scrub job queued.", "id": id},
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+SSE_KEEPALIVE_SECONDS = 15.0
+MAX_WATCHED_IDS = 50
+TERMINAL_STAGES = {"DONE", "ERROR", "FAILED"}
+
+async def _status_event_stream(ids: List[str], status_watch_service: StatusWatchService):
+    """
+    Yields Server-Sent Events for every stage transition of the given documents.
+    The stream ends once each document reached a terminal stage or was deleted.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    for doc_id in ids:
+        await run_blocking(status_watch_service.subscribe, doc_id, queue, loop)
+    pending = set(ids)
+    try:
+        while pending:
+            try:
+                event = await asyncio.wait_for(queue.get(), timeout=SSE_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            yield f"event: status\ndata: {json.dumps(event)}\n\n"
+            stage = (event["status"] or {}).get("stage")
+            if not event["exists"] or stage in TERMINAL_STAGES:
+                pending.discard(event["id"])
+    finally:
+        # Detaching listeners may block; don't hold up the disconnecting client.
+        for doc_id in ids:
+            get_io_executor().submit(status_watch_service.unsubscribe, doc_id, queue, loop)
+
+def _sse_response(ids: List[str], status_watch_service: StatusWatchService) -> StreamingResponse:
+    return StreamingResponse(
+        _status_event_stream(ids, status_watch_service),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.get("/status/events")
+async def stream_statuses(
+    ids: str = Query(..., description="Comma-separated file IDs to watch."),
+    status_watch_service: StatusWatchService = Depends(get_status_watch_service),
+):
+    """
+    Stream status changes of several files as Server-Sent Events.
+    """
+    doc_ids = list(dict.fromkeys(i.strip() for i in ids.split(",") if i.strip()))
+    if not doc_ids or len(doc_ids) > MAX_WATCHED_IDS:
+        raise HTTPException(status_code=400, detail=f"Provide between 1 and {MAX_WATCHED_IDS} ids.")
+    return _sse_response(doc_ids, status_watch_service)
+
+@router.get("/status/{id}/events")
+async def stream_status(
+    id: str,
+    status_watch_service: StatusWatchService = Depends(get_status_watch_service),
+):
+    """
+    Stream the file's status changes (UPLOADED → ... → DONE) as Server-Sent Events.
+    """
+    return _sse_response([id], status_watch_service)
+
+# Field mask for batched status reads.
+STATUS_BATCH_FIELDS = ["status", "outputFiles"]
+
+@router.post("/status:batch")
+async def get_status_batch(
+    request: StatusBatchRequest,
+    firestore_service: AsyncFirestoreService = Depends(get_async_firestore_service),
+):
+    """
+    Status and output files of up to 500 files in one Firestore read.
+    Unknown ids are listed under `missing` instead of failing the request.
+    """
+    try:
+        documents = await firestore_service.get_documents(request.ids, field_paths=STATUS_BATCH_FIELDS)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    data, missing = {}, []
+    for doc_id in dict.fromkeys(request.ids):
+        document = documents.get(doc_id)
+        if document is None:
+            missing.append(doc_id)
+        else:
+            data[doc_id] = {"status": document.get("status"), "outputFiles": document.get("outputFiles")}
+    return FastJSONResponse(status_code=200, content={"data": data, "missing": missing})
 
 @router.get("/status/{id}")
-async def get_status(id: str):
+async def get_status(
+    id: str,
+    if_none_match: Optional[str] = Header(None, alias="If-None-Match"),
+    if_modified_since: Optional[str] = Header(None, alias="If-Modified-Since"),
+    firestore_service: AsyncFirestoreService = Depends(get_async_firestore_service),
+):
     """
     Retrieve the processing status of the file.
+    Supports `If-None-Match` / `If-Modified-Since` against the document's update time.
     """
     try:
-        file_config = firestore_service.get_document(id)
+        if if_none_match or if_modified_since:
+            # Decided from the update time alone (cached, or read without fields).
+            update_time = await firestore_service.get_update_time(id)
+            if update_time is not None:
+                headers = validator_headers(update_time_etag(update_time), update_time)
+                if is_not_modified(if_none_match, if_modified_since, headers["ETag"], update_time):
+                    return not_modified_response(headers)
+
+        file_config, update_time = await firestore_service.get_document_with_update_time(id)
         if not file_config:
             raise HTTPException(status_code=404, detail="FileConfig not found.")
 
-        return JSONResponse(
+        return FastJSONResponse(
             status_code=200,
-            content=file_config.status.dict(),
+            content=file_config.get("status"),
+            headers=validator_headers(update_time_etag(update_time) if update_time else None, update_time),
         )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-# Define the mapping
-FILE_TYPE_MAPPING = {
-    FileType.clean: "cleanFilePath",
-    FileType.invalid: "invaldFilePath",
-    FileType.dnc: "blacklistedFilePath",
-}
+def _output_file_path(file_config: dict, file_type: FileType) -> str:
+    """Storage path of a completed file's clean/invalid/dnc output, or an HTTPException."""
+    if file_config.get('status', {}).get('stage') != "DONE":
+        raise HTTPException(
+            status_code=400, detail="Processing not completed yet."
+        )
 
-@router.get("/download/{id}")
-async def download_results(
+    output_files = file_config.get('outputFiles', {})
+    storage_key = FILE_TYPE_MAPPING.get(file_type)
+
+    if not storage_key:
+        raise HTTPException(status_code=400, detail=f"Invalid file_type '{file_type.value}'.")
+
+    storage_path = output_files.get(storage_key)
+
+    if not storage_path:
+        raise HTTPException(status_code=404, detail=f"File type '{file_type}' not found.")
+
+    return storage_path
+
+DEFAULT_PREVIEW_KB = 64
+MAX_PREVIEW_KB = 1024
+SUMMARY_SAMPLE_BYTES = 64 * 1024
+
+def _parse_preview(data: bytes, complete: bool, config: dict, max_rows: int) -> dict:
+    """Header, resolved phone columns and first rows of a CSV prefix, read per the file config."""
+    # The scrub engine pulls in the worker pool and numpy; only load its helpers when previewing.
+    from app.scrub.engine import resolve_phone_indexes, split_records
+
+    if not complete:
+        # Drop the record cut off by the end of the range.
+        data, _ = split_records(data)
+    records = csv.reader(io.StringIO(data.decode("utf-8", errors="replace"), newline=""))
+    header = next(records, None) if config.get("hasHeaderRow") else None
+    rows = list(itertools.islice(records, max_rows))
+    return {
+        "header": header,
+        "phoneColumnIndexes": resolve_phone_indexes(config, header),
+        "rows": rows,
+    }
+
+@router.get("/preview/{id}")
+async def preview_file(
     id: str,
-    file_type: FileType = Query(..., description="Type of file to download: clean, invalid, dnc")
+    file_type: Optional[FileType] = Query(None, description="Result file to preview: clean, invalid, dnc. Defaults to the uploaded file."),
+    size_kb: int = Query(DEFAULT_PREVIEW_KB, ge=1, le=MAX_PREVIEW_KB, description="KiB read from the start of the file."),
+    rows: int = Query(20, ge=1, le=1000),
+    firestore_service: AsyncFirestoreService = Depends(get_async_firestore_service),
+    storage_service: AsyncStorageService = Depends(get_async_storage_service),
 ):
     """
-    Download a specific processing results file if processing is completed.
+    Header and first rows of the uploaded file or a results file, parsed
+    with the file's `hasHeaderRow` and phone column settings. Only the
+    first `size_kb` KiB of the object are read.
     """
     try:
-        file_config = firestore_service.get_document(id)
+        file_config = await firestore_service.get_document(id)
         if not file_config:
             raise HTTPException(status_code=404, detail="FileConfig not found.")
+        if file_type is None:
+            storage_path = (file_config.get('outputFiles') or {}).get('baseFilePath')
+            if not storage_path:
+                raise HTTPException(status_code=404, detail="Uploaded file not found.")
+        else:
+            storage_path = _output_file_path(file_config, file_type)
 
-        if file_config.get('status', {}).get('stage') != "DONE":
-            raise HTTPException(
-                status_code=400, detail="Processing not completed yet."
+        blob = await storage_service.get_blob(storage_path)
+        if blob is None:
+            raise HTTPException(status_code=404, detail="File not found in storage.")
+
+        data, stored = await storage_service.read_head(blob, size_kb * 1024)
+        complete = stored >= (blob.size or 0) and len(data) < size_kb * 1024
+        preview = await run_blocking(_parse_preview, data, complete, file_config, rows)
+        return FastJSONResponse(status_code=200, content={
+            "id": id,
+            "path": storage_path,
+            "size": blob.size,
+            "truncated": not complete,
+            **preview,
+        })
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+async def _estimate_rows(blob, has_header_row: bool, storage_service: AsyncStorageService) -> int:
+    """
+    Data rows in `blob` from at most SUMMARY_SAMPLE_BYTES read: the middle of
+    a raw object, or the head of a compressed one, scaled up to its size.
+    Exact when the sample covers the whole object.
+    """
+    size = blob.size or 0
+    if not size:
+        return 0
+    if not blob.content_encoding and size > SUMMARY_SAMPLE_BYTES:
+        start = (size - SUMMARY_SAMPLE_BYTES) // 2
+        sample = await storage_service.download_range(blob, start, start + SUMMARY_SAMPLE_BYTES - 1)
+        return round(sample.count(b"\n") * size / max(len(sample), 1))
+    data, stored = await storage_service.read_head(blob, SUMMARY_SAMPLE_BYTES)
+    if stored >= size and len(data) < SUMMARY_SAMPLE_BYTES:
+        records = data.count(b"\n") + (1 if data and not data.endswith(b"\n") else 0)
+        return max(records - (1 if has_header_row else 0), 0)
+    return round(data.count(b"\n") * size / max(stored, 1))
+
+@router.get("/summary/{id}")
+async def get_results_summary(
+    id: str,
+    firestore_service: AsyncFirestoreService = Depends(get_async_firestore_service),
+    storage_service: AsyncStorageService = Depends(get_async_storage_service),
+):
+    """
+    Size, generation and row count of each results file, without downloading
+    them. Row counts come from the scrub when it recorded them
+    (`rowsExact: true`), otherwise they are estimated from a sampled range.
+    """
+    try:
+        file_config = await firestore_service.get_document(id)
+        if not file_config:
+            raise HTTPException(status_code=404, detail="FileConfig not found.")
+        paths = {file_type: _output_file_path(file_config, file_type) for file_type in FileType
+                 if (file_config.get('outputFiles') or {}).get(FILE_TYPE_MAPPING[file_type])}
+        if not paths:
+            raise HTTPException(status_code=404, detail="No results files found.")
+        row_counts = (file_config.get('status') or {}).get('rowCounts') or {}
+
+        async def summarize(file_type: FileType, storage_path: str) -> Optional[dict]:
+            blob = await storage_service.get_blob(storage_path)
+            if blob is None:
+                return None
+            exact = row_counts.get(file_type.value)
+            rows = exact if exact is not None else await _estimate_rows(
+                blob, bool(file_config.get('hasHeaderRow')), storage_service
             )
+            return {
+                "path": storage_path,
+                "size": blob.size,
+                "generation": blob.generation,
+                "updated": blob.updated,
+                "contentEncoding": blob.content_encoding,
+                "rows": rows,
+                "rowsExact": exact is not None,
+            }
+
+        summaries = await asyncio.gather(*(summarize(t, p) for t, p in paths.items()))
+        return FastJSONResponse(status_code=200, content={
+            "id": id,
+            "files": {file_type.value: summary for file_type, summary in zip(paths, summaries)},
+        })
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/download-url/{id}")
+async def get_download_url(
+    id: str,
+    file_type: FileType = Query(..., description="Type of file to download: clean, invalid, dnc"),
+    redirect: bool = Query(False, description="Respond with a 307 redirect to the signed URL."),
+    firestore_service: AsyncFirestoreService = Depends(get_async_firestore_service),
+    storage_service: AsyncStorageService = Depends(get_async_storage_service),
+):
+    """
+    Issue a V4 signed URL to download a completed results file straight from
+    Cloud Storage, or redirect to it with `redirect=true`.
+    """
+    try:
+        file_config = await firestore_service.get_document(id)
+        if not file_config:
+            raise HTTPException(status_code=404, detail="FileConfig not found.")
 
-        output_files = file_config.get('outputFiles', {})
-        storage_key = FILE_TYPE_MAPPING.get(file_type)
+        storage_path = _output_file_path(file_config, file_type)
+        url = await storage_service.generate_download_url(storage_path, filename=os.path.basename(storage_path))
 
-        if not storage_key:
-            raise HTTPException(status_code=400, detail=f"Invalid file_type '{file_type.value}'.")
+        if redirect:
+            return RedirectResponse(url, status_code=307)
+        signed_url = SignedUrl(
+            url=url,
+            method="GET",
+            path=storage_path,
+            expires_at=datetime.utcnow() + timedelta(seconds=storage_service.signed_url_ttl),
+        )
+        return FastJSONResponse(status_code=200, content=signed_url.dict(by_alias=True))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
-        storage_path = output_files.get(storage_key)
+@router.get("/download/{id}")
+@admission_class(DOWNLOAD)
+async def download_results(
+    id: str,
+    file_type: FileType = Query(..., description="Type of file to download: clean, invalid, dnc"),
+    range_header: Optional[str] = Header(None, alias="Range"),
+    if_range: Optional[str] = Header(None, alias="If-Range"),
+    if_none_match: Optional[str] = Header(None, alias="If-None-Match"),
+    if_modified_since: Optional[str] = Header(None, alias="If-Modified-Since"),
+    accept_encoding: Optional[str] = Header(None, alias="Accept-Encoding"),
+    firestore_service: AsyncFirestoreService = Depends(get_async_firestore_service),
+    storage_service: AsyncStorageService = Depends(get_async_storage_service),
+):
+    """
+    Download a specific processing results file if processing is completed.
+    Supports single `Range` requests (with `If-Range`) so large downloads can be resumed.
+    Compressed objects are sent as stored when the client accepts their
+    encoding (ranges then count compressed bytes), and decoded otherwise.
+    `If-None-Match` (generation ETag) / `If-Modified-Since` are answered with
+    304 from the object's metadata, without reading it.
+    """
+    try:
+        file_config = await firestore_service.get_document(id)
+        if not file_config:
+            raise HTTPException(status_code=404, detail="FileConfig not found.")
 
-        if not storage_path:
-            raise HTTPException(status_code=404, detail=f"File type '{file_type}' not found.")
+        storage_path = _output_file_path(file_config, file_type)
 
-        file_bytes = await asyncio.to_thread(storage_service.download_file, storage_path)
+        # One metadata request replaces the old exists() + full download.
+        blob = await storage_service.get_blob(storage_path)
 
-        if not file_bytes:
+        if blob is None:
             raise HTTPException(status_code=404, detail="File not found in storage.")
 
         filename = os.path.basename(storage_path)
-        file_like = io.BytesIO(file_bytes)
         media_type, _ = mimetypes.guess_type(filename)
         if not media_type:
             media_type = 'application/octet-stream'  # Fallback
 
+        size = blob.size
+        etag = f'"{blob.generation}"'
+        headers = {
+            'Content-Disposition': f'attachment; filename="{filename}"',
+            'Accept-Ranges': 'bytes',
+            'ETag': etag,
+        }
+        if blob.updated:
+            headers['Last-Modified'] = format_datetime(blob.updated, usegmt=True)
+
+        stored_encoding = blob.content_encoding
+        if stored_encoding:
+            headers['Vary'] = 'Accept-Encoding'
+            if not accepts(accept_encoding, stored_encoding):
+                # Decoded on the fly: the length is unknown and ranges would
+                # not line up with the stored bytes, so the whole file is sent.
+                headers['Accept-Ranges'] = 'none'
+                headers['ETag'] = f'W/"{blob.generation}-decoded"'
+                if is_not_modified(if_none_match, if_modified_since, headers['ETag'], blob.updated):
+                    return not_modified_response(headers)
+                return StreamingResponse(
+                    storage_service.iter_decoded(blob),
+                    media_type=media_type,
+                    headers=headers,
+                )
+            headers['Content-Encoding'] = stored_encoding
+
+        if is_not_modified(if_none_match, if_modified_since, etag, blob.updated):
+            return not_modified_response(headers)
+
+        byte_range = None
+        if if_range_matches(if_range, etag, blob.updated):
+            try:
+                byte_range = parse_byte_range(range_header, size)
+            except ValueError:
+                raise HTTPException(
+                    status_code=416,
+                    detail="Requested range not satisfiable.",
+                    headers={'Content-Range': f'bytes */{size}'},
+                )
+
+        status_code = 200
+        start, end = 0, size - 1
+        if byte_range:
+            start, end = byte_range
+            status_code = 206
+            headers['Content-Range'] = f'bytes {start}-{end}/{size}'
+        headers['Content-Length'] = str(end - start + 1)
+
         return StreamingResponse(
-            file_like,
+            storage_service.iter_download(blob, start, end),
+            status_code=status_code,
             media_type=media_type,
-            headers={
-                'Content-Disposition': f'attachment; filename="{filename}"'
-            }
+            headers=headers,
         )
 
     except HTTPException as he:
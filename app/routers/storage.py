@@ -1,13 +1,24 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, UploadFile, File
+from fastapi.responses import JSONResponse
 from app.auth_google import google_auth_dependency
 from app.services.storage_service import StorageService
+from app.services.registry import get_storage_service
 from app.models.claims import GoogleClaims
+from app.admission import UPLOAD, admission_class
+from app.utils import is_not_modified, not_modified_response, validator_headers
 
 router = APIRouter()
-storage_service = StorageService()
+
+PREVIEW_BYTES = 100
 
 @router.post("/upload")
-async def upload_file(file: UploadFile = File(...), claims: GoogleClaims = Depends(google_auth_dependency)):
+@admission_class(UPLOAD)
+async def upload_file(
+    file: UploadFile = File(...),
+    claims: GoogleClaims = Depends(google_auth_dependency),
+    storage_service: StorageService = Depends(get_storage_service),
+):
     """
     Uploads a file to GCS. Protected by Google ID token.
     """
@@ -18,20 +29,31 @@ async def upload_file(file: UploadFile = File(...), claims: GoogleClaims = Depen
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/download/{filename}")
-def download_file(filename: str, claims: GoogleClaims = Depends(google_auth_dependency)):
+def download_file(
+    filename: str,
+    if_none_match: Optional[str] = Header(None, alias="If-None-Match"),
+    if_modified_since: Optional[str] = Header(None, alias="If-Modified-Since"),
+    claims: GoogleClaims = Depends(google_auth_dependency),
+    storage_service: StorageService = Depends(get_storage_service),
+):
     """
-    Downloads a file from GCS. Protected by Google ID token.
+    Returns a file's size and a preview of its first bytes. Protected by Google ID token.
+    The ETag is the object's generation; unchanged objects are answered 304.
     """
     try:
-        file_content = storage_service.download_file(filename)
-        if file_content is None:
+        # Metadata plus one ranged read; the object itself is never downloaded.
+        blob = storage_service.get_blob(filename)
+        if blob is None:
             raise HTTPException(status_code=404, detail="File not found")
-        # For demonstration, returning a preview. Adjust as needed.
-        return {
+        headers = validator_headers(f'"{blob.generation}"', blob.updated)
+        if is_not_modified(if_none_match, if_modified_since, headers["ETag"], blob.updated):
+            return not_modified_response(headers)
+        preview, _ = storage_service.read_head(blob, PREVIEW_BYTES)
+        return JSONResponse(content={
             "filename": filename,
-            "size": len(file_content),
-            "content_preview": file_content[:100].decode("utf-8", errors="replace")
-        }
+            "size": blob.size,
+            "content_preview": preview.decode("utf-8", errors="replace")
+        }, headers=headers)
     except HTTPException:
         raise
     except Exception as e:
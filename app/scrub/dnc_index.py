@@ -0,0 +1,262 @@
+"""
+Compact, memory-mapped Do-Not-Call index.
+
+A 10-digit number is split into a prefix (`number >> 16`) and a 16-bit
+suffix. The file stores, after a fixed header:
+
+- a directory of PREFIX_COUNT + 1 uint64 offsets: the suffixes of prefix
+  `p` are `suffixes[directory[p]:directory[p + 1]]`;
+- the sorted suffixes as uint16, 2 bytes per number, so a list of 300M
+  numbers takes about 600 MB instead of tens of GB as a Python set;
+- optionally a Bloom filter (uint64 words) that rejects most absent
+  numbers before the suffixes are touched.
+
+Files are opened with `np.memmap`, so every worker process shares the same
+read-only page cache. Build one with:
+
+    python -m app.scrub.dnc_index build dnc.txt dnc.idx --bloom-bits 10
+"""
+import os
+import sys
+import math
+import struct
+import shutil
+import argparse
+import itertools
+import tempfile
+from typing import Iterable, Iterator, List, Optional
+
+import numpy as np
+
+from app.scrub.phones import normalize_phones
+
+MAGIC = b"DNCIDX\x00\x01"
+VERSION = 1
+# magic, version, bloom hashes, count, directory/suffix/bloom offsets, bloom words.
+HEADER = struct.Struct("<8sIIQQQQQ")
+HEADER_SIZE = 64
+
+SUFFIX_BITS = 16
+SUFFIX_MASK = (1 << SUFFIX_BITS) - 1
+MAX_NUMBER = 10 ** 10 - 1
+PREFIX_COUNT = (MAX_NUMBER >> SUFFIX_BITS) + 1
+# A prefix holds at most 2**16 suffixes, so a binary search needs 17 steps.
+SEARCH_STEPS = SUFFIX_BITS + 1
+
+DEFAULT_PARTITIONS = 64
+DEFAULT_BATCH_LINES = 256 * 1024
+
+_MIX1 = np.uint64(0xBF58476D1CE4E5B9)
+_MIX2 = np.uint64(0x94D049BB133111EB)
+_SEED = np.uint64(0x9E3779B97F4A7C15)
+
+
+def _mix(values: np.ndarray) -> np.ndarray:
+    """splitmix64 finalizer over a uint64 array (wrapping arithmetic)."""
+    x = values.copy()
+    x ^= x >> np.uint64(30)
+    x *= _MIX1
+    x ^= x >> np.uint64(27)
+    x *= _MIX2
+    x ^= x >> np.uint64(31)
+    return x
+
+
+def _bloom_positions(numbers: np.ndarray, hashes: int, bits: int) -> Iterator[np.ndarray]:
+    """Bit positions of `numbers` for each of the `hashes` hash functions (double hashing)."""
+    keys = numbers.astype(np.uint64)
+    h1 = _mix(keys)
+    h2 = _mix(keys ^ _SEED) | np.uint64(1)
+    for i in range(hashes):
+        yield (h1 + np.uint64(i) * h2) % np.uint64(bits)
+
+
+def _align(offset: int) -> int:
+    return (offset + 7) & ~7
+
+
+class DncIndex:
+    """Read-only view of an index file. `contains` checks a whole batch at once."""
+
+    def __init__(self, path: str):
+        self.path = path
+        data = np.memmap(path, dtype=np.uint8, mode="r")
+        if len(data) < HEADER_SIZE:
+            raise ValueError(f"{path} is not a DNC index.")
+        magic, version, hashes, count, directory_offset, suffix_offset, bloom_offset, bloom_words = (
+            HEADER.unpack(bytes(data[:HEADER.size]))
+        )
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} DNC index.")
+        self.count = count
+        self.bloom_hashes = hashes
+        self.directory = np.frombuffer(data, dtype=np.uint64, count=PREFIX_COUNT + 1, offset=directory_offset)
+        self.suffixes = np.frombuffer(data, dtype=np.uint16, count=count, offset=suffix_offset)
+        self.bloom = (
+            np.frombuffer(data, dtype=np.uint64, count=bloom_words, offset=bloom_offset) if bloom_words else None
+        )
+        if int(self.directory[-1]) != count:
+            raise ValueError(f"{path} is truncated or corrupt.")
+
+    def __len__(self) -> int:
+        return self.count
+
+    def _maybe_contains(self, numbers: np.ndarray) -> np.ndarray:
+        bits = len(self.bloom) * 64
+        hit = np.ones(len(numbers), dtype=bool)
+        for positions in _bloom_positions(numbers, self.bloom_hashes, bits):
+            words = self.bloom[(positions >> np.uint64(6)).astype(np.int64)]
+            hit &= ((words >> (positions & np.uint64(63))) & np.uint64(1)).astype(bool)
+        return hit
+
+    def contains(self, numbers: np.ndarray) -> np.ndarray:
+        """
+        Membership of normalized numbers (as from `normalize_phones`); invalid
+        values (-1) are never members. A vectorized binary search runs inside
+        each number's prefix bucket.
+        """
+        numbers = np.asarray(numbers, dtype=np.int64)
+        result = np.zeros(len(numbers), dtype=bool)
+        candidates = np.flatnonzero((numbers >= 0) & (numbers <= MAX_NUMBER))
+        if self.count == 0 or len(candidates) == 0:
+            return result
+        if self.bloom is not None:
+            candidates = candidates[self._maybe_contains(numbers[candidates])]
+            if len(candidates) == 0:
+                return result
+
+        wanted = numbers[candidates]
+        prefix = wanted >> SUFFIX_BITS
+        suffix = (wanted & SUFFIX_MASK).astype(np.uint16)
+        lo = self.directory[prefix].astype(np.int64)
+        end = self.directory[prefix + 1].astype(np.int64)
+        hi = end.copy()
+        last = self.count - 1
+        for _ in range(SEARCH_STEPS):
+            active = lo < hi
+            if not active.any():
+                break
+            mid = (lo + hi) >> 1
+            below = self.suffixes[np.minimum(mid, last)] < suffix
+            lo = np.where(active & below, mid + 1, lo)
+            hi = np.where(active & ~below, mid, hi)
+        result[candidates] = (lo < end) & (self.suffixes[np.minimum(lo, last)] == suffix)
+        return result
+
+
+def _iter_batches(paths: Iterable[str], batch_lines: int) -> Iterator[np.ndarray]:
+    """Normalized, valid numbers from text files with one number per line."""
+    for path in paths:
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            while True:
+                lines = [line.strip() for line in itertools.islice(f, batch_lines)]
+                if not lines:
+                    break
+                numbers = normalize_phones(lines)
+                yield numbers[numbers >= 0]
+
+
+def build_index(
+    sources: List[str],
+    output: str,
+    bloom_bits: int = 0,
+    partitions: int = DEFAULT_PARTITIONS,
+    batch_lines: int = DEFAULT_BATCH_LINES,
+    tmp_dir: Optional[str] = None,
+) -> dict:
+    """
+    Compile raw DNC lists into an index file at `output`, in bounded memory.
+
+    Numbers are first spread over `partitions` temporary files by prefix
+    range; each partition is then sorted, de-duplicated and appended in
+    order, so only one partition is in memory at a time. `bloom_bits` bits
+    per number (0 disables it) size the optional Bloom filter, which is the
+    one structure held in memory in full.
+    """
+    work_dir = tempfile.mkdtemp(prefix="dnc-build-", dir=tmp_dir)
+    try:
+        part_paths = [os.path.join(work_dir, f"part-{i:04d}.bin") for i in range(partitions)]
+        part_files = [open(path, "wb") for path in part_paths]
+        read = 0
+        try:
+            for numbers in _iter_batches(sources, batch_lines):
+                read += len(numbers)
+                part = (numbers >> SUFFIX_BITS) * partitions // PREFIX_COUNT
+                order = np.argsort(part, kind="stable")
+                bounds = np.searchsorted(part[order], np.arange(partitions + 1))
+                for i in range(partitions):
+                    if bounds[i] < bounds[i + 1]:
+                        numbers[order[bounds[i]:bounds[i + 1]]].tofile(part_files[i])
+        finally:
+            for f in part_files:
+                f.close()
+
+        hashes = max(1, round(bloom_bits * math.log(2))) if bloom_bits else 0
+        bloom = np.zeros((bloom_bits * read + 63) // 64, dtype=np.uint64) if bloom_bits and read else None
+        counts = np.zeros(PREFIX_COUNT, dtype=np.uint64)
+
+        directory_offset = HEADER_SIZE
+        suffix_offset = _align(directory_offset + (PREFIX_COUNT + 1) * 8)
+        partial = output + ".part"
+        with open(partial, "wb") as out:
+            out.seek(suffix_offset)
+            for path in part_paths:
+                numbers = np.unique(np.fromfile(path, dtype=np.int64))
+                os.remove(path)
+                counts += np.bincount(numbers >> SUFFIX_BITS, minlength=PREFIX_COUNT).astype(np.uint64)
+                (numbers & SUFFIX_MASK).astype(np.uint16).tofile(out)
+                if bloom is not None:
+                    for positions in _bloom_positions(numbers, hashes, len(bloom) * 64):
+                        np.bitwise_or.at(
+                            bloom,
+                            (positions >> np.uint64(6)).astype(np.int64),
+                            np.uint64(1) << (positions & np.uint64(63)),
+                        )
+            count = int(counts.sum())
+
+            bloom_offset = _align(suffix_offset + count * 2)
+            bloom_words = 0
+            if bloom is not None:
+                out.seek(bloom_offset)
+                bloom.tofile(out)
+                bloom_words = len(bloom)
+
+            directory = np.zeros(PREFIX_COUNT + 1, dtype=np.uint64)
+            np.cumsum(counts, out=directory[1:])
+            out.seek(0)
+            out.write(HEADER.pack(
+                MAGIC, VERSION, hashes, count, directory_offset, suffix_offset, bloom_offset, bloom_words
+            ).ljust(HEADER_SIZE, b"\0"))
+            out.seek(directory_offset)
+            directory.tofile(out)
+        os.replace(partial, output)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    return {"read": read, "count": count, "bloom_hashes": hashes, "bytes": os.path.getsize(output)}
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Build or inspect a DNC index.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="Compile text lists (one number per line) into an index.")
+    build.add_argument("sources", nargs="+")
+    build.add_argument("output")
+    build.add_argument("--bloom-bits", type=int, default=0, help="Bloom filter bits per number (0 disables it).")
+    build.add_argument("--partitions", type=int, default=DEFAULT_PARTITIONS)
+    build.add_argument("--tmp-dir", help="Where to spill partitions (default: system temp dir).")
+    info = commands.add_parser("info", help="Describe an index file.")
+    info.add_argument("path")
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        stats = build_index(args.sources, args.output, args.bloom_bits, args.partitions, tmp_dir=args.tmp_dir)
+        print(f"{stats['count']} numbers ({stats['read']} read), {stats['bytes']} bytes -> {args.output}")
+    else:
+        index = DncIndex(args.path)
+        bloom = f"bloom {len(index.bloom) * 64} bits, {index.bloom_hashes} hashes" if index.bloom is not None else "no bloom"
+        print(f"{args.path}: {len(index)} numbers, {bloom}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,117 @@
+import os
+import glob
+import time
+import logging
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+from app.scrub.dnc_index import DncIndex
+from app.services.storage_service import StorageService
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_REFRESH_INTERVAL = 300.0
+DEFAULT_MAX_VERSIONS = 3
+
+
+class DncIndexManager:
+    """
+    Hands scrub jobs the path of the newest DNC index.
+
+    - With DNC_INDEX_BLOB set, the index object in the bucket is checked at
+      most every DNC_INDEX_REFRESH_INTERVAL seconds. A new generation is
+      downloaded to DNC_INDEX_DIR, validated and swapped in.
+    - Jobs pin the version they start with (`pinned`); a replaced version is
+      deleted once its last job finishes, so workers that have not opened it
+      yet still find it.
+    - At most DNC_INDEX_MAX_VERSIONS versions are kept on disk, which is
+      memory on Cloud Run. While that many are still pinned, a newer
+      generation waits for a later refresh.
+    - Otherwise DNC_LIST_FILE, a local index file, is used as is.
+    """
+
+    def __init__(self, storage_service: StorageService):
+        self.storage_service = storage_service
+        self.blob_path = os.getenv("DNC_INDEX_BLOB") or None
+        self.local_path = os.getenv("DNC_LIST_FILE") or None
+        self.cache_dir = os.getenv("DNC_INDEX_DIR") or os.path.join(tempfile.gettempdir(), "dnc-index")
+        self.refresh_interval = float(os.getenv("DNC_INDEX_REFRESH_INTERVAL", DEFAULT_REFRESH_INTERVAL))
+        # The current version plus the one being downloaded, at least.
+        self.max_versions = max(int(os.getenv("DNC_INDEX_MAX_VERSIONS", DEFAULT_MAX_VERSIONS)), 2)
+        self._path: Optional[str] = None
+        self._generation: Optional[int] = None
+        self._checked_at = float("-inf")
+        self._pins: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def pinned(self) -> Iterator[Optional[str]]:
+        """
+        Local path of the index to scrub against (None when there is no DNC
+        list), kept on disk until the block exits.
+        """
+        if not self.blob_path:
+            yield self.local_path
+            return
+        with self._lock:
+            if time.monotonic() - self._checked_at >= self.refresh_interval:
+                self._checked_at = time.monotonic()
+                try:
+                    self._refresh()
+                except Exception as e:
+                    # Keep scrubbing against the version we have.
+                    logger.error(f"Refreshing the DNC index from {self.blob_path} failed: {e}")
+            path = self._path
+            if path is not None:
+                self._pins[path] = self._pins.get(path, 0) + 1
+        try:
+            yield path
+        finally:
+            if path is not None:
+                with self._lock:
+                    self._pins[path] -= 1
+                    if not self._pins[path]:
+                        del self._pins[path]
+                    self._remove_stale()
+
+    def _refresh(self) -> None:
+        blob = self.storage_service.get_blob(self.blob_path)
+        if blob is None:
+            logger.warning(f"DNC index {self.blob_path} not found; DNC classification is off.")
+            return
+        if blob.generation == self._generation:
+            return
+
+        path = os.path.join(self.cache_dir, f"dnc-{blob.generation}.idx")
+        kept = set(self._pins) | ({self._path} if self._path else set())
+        if path not in kept and len(kept) >= self.max_versions:
+            logger.warning(
+                f"{len(kept)} DNC index versions are in use; generation {blob.generation} "
+                f"waits for running jobs to finish."
+            )
+            return
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        if not os.path.exists(path):
+            partial = path + ".part"
+            try:
+                self.storage_service.download_to_filename(blob, partial)
+                DncIndex(partial)
+                os.replace(partial, path)
+            finally:
+                if os.path.exists(partial):
+                    os.remove(partial)
+        self._path, self._generation = path, blob.generation
+        logger.info(f"Using DNC index generation {blob.generation} ({os.path.getsize(path)} bytes).")
+        self._remove_stale()
+
+    def _remove_stale(self) -> None:
+        """Delete versions that are neither current nor pinned, including ones left by earlier processes."""
+        for stale in glob.glob(os.path.join(self.cache_dir, "dnc-*.idx")):
+            if stale != self._path and stale not in self._pins:
+                try:
+                    os.remove(stale)
+                except FileNotFoundError:
+                    pass
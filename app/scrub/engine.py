@@ -0,0 +1,251 @@
+import os
+import csv
+import time
+import logging
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+from typing import Iterator, List, Optional, Tuple
+
+from app.metrics import SCRUB_ROWS
+from app.models.file_type import FILE_TYPE_MAPPING, FileType
+from app.scrub import worker
+from app.scrub.dnc_manager import DncIndexManager
+from app.services.firestore_service import FirestoreService
+from app.services.storage_service import StorageService
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_BYTES = 8 * 1024 * 1024
+DEFAULT_PROGRESS_INTERVAL = 2.0
+
+
+def split_records(data: bytes) -> Tuple[bytes, bytes]:
+    """
+    Split `data` after its last complete CSV record. A newline only ends a
+    record when it sits outside quotes, i.e. after an even number of `"`.
+    Returns (complete records, remainder).
+    """
+    end = len(data)
+    while True:
+        newline = data.rfind(b"\n", 0, end)
+        if newline < 0:
+            return b"", data
+        if data.count(b'"', 0, newline) % 2 == 0:
+            return data[:newline + 1], data[newline + 1:]
+        end = newline
+
+
+def iter_record_blocks(reader, block_size: int, initial: bytes = b"") -> Iterator[bytes]:
+    """
+    Yield blocks of whole CSV records of roughly `block_size` bytes from a
+    binary reader, starting with the already-read bytes in `initial`.
+    """
+    remainder = initial
+    while True:
+        block = reader.read(block_size)
+        if not block:
+            break
+        records, remainder = split_records(remainder + block)
+        if records:
+            yield records
+    if remainder:
+        yield remainder if remainder.endswith(b"\n") else remainder + b"\n"
+
+
+def read_header(reader) -> Tuple[bytes, bytes]:
+    """Read the first CSV record. Returns (header record, bytes read past it)."""
+    buffered = b""
+    while True:
+        block = reader.read(64 * 1024)
+        buffered += block
+        start = 0
+        while True:
+            newline = buffered.find(b"\n", start)
+            if newline < 0:
+                break
+            if buffered.count(b'"', 0, newline) % 2 == 0:
+                return buffered[:newline + 1], buffered[newline + 1:]
+            start = newline + 1
+        if not block:
+            return buffered, b""
+
+
+def resolve_phone_indexes(config: dict, header: Optional[List[str]]) -> List[int]:
+    """
+    CSV column indexes of the phone columns, in priority order.
+
+    `phoneColumnIndexes` wins; otherwise `phoneColumns` (or their
+    `columnAliases`) are looked up in the header. `phoneOrderIndexes` then
+    orders them, given either as positions in that list or as column indexes.
+    """
+    indexes = list(config.get("phoneColumnIndexes") or [])
+    if not indexes and header:
+        aliases = config.get("columnAliases") or {}
+        positions = {name.strip(): i for i, name in enumerate(header)}
+        for name in config.get("phoneColumns") or []:
+            for candidate in (name, aliases.get(name)):
+                if candidate and candidate in positions:
+                    indexes.append(positions[candidate])
+                    break
+
+    order = list(config.get("phoneOrderIndexes") or [])
+    if order and sorted(order) == list(range(len(indexes))):
+        indexes = [indexes[position] for position in order]
+    elif order and set(order) <= set(indexes):
+        indexes = order + [index for index in indexes if index not in order]
+    return indexes
+
+
+def output_paths(doc_id: str, file_name: str) -> dict:
+    stem = os.path.splitext(os.path.basename(file_name))[0]
+    return {
+        FILE_TYPE_MAPPING[file_type]: f"results/{doc_id}/{stem}-{file_type.value}.csv"
+        for file_type in FileType
+    }
+
+
+class ScrubEngine:
+    """
+    Scrubs uploaded CSV files in-process, streaming from and back to GCS.
+
+    - The source is read in blocks of whole records (SCRUB_CHUNK_BYTES) and
+      each block is scrubbed by a process pool (SCRUB_WORKERS, default one
+      per core; 1 runs inline). At most SCRUB_MAX_IN_FLIGHT blocks are
+      queued, so memory stays constant whatever the file size.
+    - Results are written in source order to clean/invalid/dnc writers that
+      stream to resumable uploads.
+    - `status` moves UPLOADED -> PROCESSING -> DONE (or ERROR); progress is
+      written at most every SCRUB_PROGRESS_INTERVAL seconds.
+    - DNC numbers come from a memory-mapped index (see `DncIndexManager`);
+      each job keeps the version that was newest when it started.
+    """
+
+    def __init__(self, storage_service: StorageService, firestore_service: FirestoreService):
+        self.storage_service = storage_service
+        self.firestore_service = firestore_service
+        self.workers = int(os.getenv("SCRUB_WORKERS", os.cpu_count() or 1))
+        self.chunk_bytes = int(os.getenv("SCRUB_CHUNK_BYTES", DEFAULT_CHUNK_BYTES))
+        self.max_in_flight = int(os.getenv("SCRUB_MAX_IN_FLIGHT", 2 * max(self.workers, 1)))
+        self.progress_interval = float(os.getenv("SCRUB_PROGRESS_INTERVAL", DEFAULT_PROGRESS_INTERVAL))
+        self.dnc_indexes = DncIndexManager(storage_service)
+        self._jobs = ThreadPoolExecutor(
+            max_workers=int(os.getenv("SCRUB_MAX_JOBS", "1")), thread_name_prefix="scrub-job"
+        )
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+
+    def _process_pool(self) -> ProcessPoolExecutor:
+        with self._pool_lock:
+            if self._pool is None:
+                # Spawned, not forked: forking a process with live gRPC channels is unsafe.
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._pool
+
+    def _submit_chunk(self, data: bytes, phone_indexes: List[int], dnc_path: Optional[str]) -> Future:
+        if self.workers > 1:
+            return self._process_pool().submit(worker.scrub_chunk, data, phone_indexes, dnc_path)
+        future = Future()
+        future.set_result(worker.scrub_chunk(data, phone_indexes, dnc_path))
+        return future
+
+    def submit(self, doc_id: str) -> Future:
+        """Queue a scrub job; jobs beyond SCRUB_MAX_JOBS wait for a free slot."""
+        return self._jobs.submit(self.run, doc_id)
+
+    def _set_status(self, doc_id: str, stage: str, **fields) -> None:
+        status = {"stage": stage, "lastUpdated": datetime.utcnow(), **fields}
+        self.firestore_service.update_document(doc_id, {"status": status})
+
+    def run(self, doc_id: str) -> dict:
+        """Scrub one uploaded file end to end. Returns the row counts."""
+        try:
+            with self.dnc_indexes.pinned() as dnc_path:
+                return self._run(doc_id, dnc_path)
+        except Exception as e:
+            logger.exception(f"Scrubbing {doc_id} failed")
+            try:
+                self._set_status(doc_id, "ERROR", error=str(e))
+            except Exception:
+                logger.exception(f"Could not record the failure of {doc_id}")
+            raise
+
+    def _run(self, doc_id: str, dnc_path: Optional[str]) -> dict:
+        config = self.firestore_service.get_document(doc_id)
+        if config is None:
+            raise ValueError(f"FileConfig {doc_id} not found.")
+        file_name = config.get("fileName", "")
+        source_path = (config.get("outputFiles") or {}).get("baseFilePath") or f"uploads/{file_name}"
+        blob = self.storage_service.get_blob(source_path)
+        if blob is None:
+            raise FileNotFoundError(f"Uploaded file {source_path} not found.")
+
+        self._set_status(doc_id, "PROCESSING", progress=0.0)
+        paths = output_paths(doc_id, file_name)
+        counts = {"rows": 0, "clean": 0, "invalid": 0, "dnc": 0}
+
+        reader = self.storage_service.open_reader(blob)
+        writers = {
+            FileType.clean: self.storage_service.open_writer(paths[FILE_TYPE_MAPPING[FileType.clean]]),
+            FileType.invalid: self.storage_service.open_writer(paths[FILE_TYPE_MAPPING[FileType.invalid]]),
+            FileType.dnc: self.storage_service.open_writer(paths[FILE_TYPE_MAPPING[FileType.dnc]]),
+        }
+        with reader:
+            header_names = None
+            leftover = b""
+            if config.get("hasHeaderRow"):
+                header, leftover = read_header(reader)
+                header_names = next(csv.reader([header.decode("utf-8", errors="replace").rstrip("\r\n")]), [])
+                for writer in writers.values():
+                    writer.write(header)
+            phone_indexes = resolve_phone_indexes(config, header_names)
+
+            pending: deque = deque()
+            last_progress = time.monotonic()
+
+            def drain_one() -> None:
+                result: worker.ChunkResult = pending.popleft().result()
+                writers[FileType.clean].write(result.clean)
+                writers[FileType.invalid].write(result.invalid)
+                writers[FileType.dnc].write(result.dnc)
+                counts["rows"] += result.rows
+                counts["clean"] += result.clean_rows
+                counts["invalid"] += result.invalid_rows
+                counts["dnc"] += result.dnc_rows
+
+            for block in iter_record_blocks(reader, self.chunk_bytes, initial=leftover):
+                pending.append(self._submit_chunk(block, phone_indexes, dnc_path))
+                if len(pending) >= self.max_in_flight:
+                    drain_one()
+                if time.monotonic() - last_progress >= self.progress_interval:
+                    last_progress = time.monotonic()
+                    self._set_status(
+                        doc_id, "PROCESSING", progress=round(min(reader.tell() / max(blob.size, 1), 1.0), 3)
+                    )
+            while pending:
+                drain_one()
+
+        # Closing finalizes the uploads; on failure they are abandoned instead.
+        for writer in writers.values():
+            writer.close()
+
+        for category in ("clean", "invalid", "dnc"):
+            SCRUB_ROWS.labels(category).inc(counts[category])
+        self.firestore_service.update_document(doc_id, {
+            "status": {"stage": "DONE", "lastUpdated": datetime.utcnow(), "progress": 1.0, "rowCounts": counts},
+            **{f"outputFiles.{key}": path for key, path in paths.items()},
+        })
+        logger.info(f"Scrubbed {doc_id}: {counts}")
+        return counts
+
+    def close(self) -> None:
+        self._jobs.shutdown(wait=False, cancel_futures=True)
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=True, cancel_futures=True)
+                self._pool = None
@@ -0,0 +1,52 @@
+import numpy as np
+
+# Longest raw value considered; anything longer is invalid. Formatted NANP
+# numbers ("+1 (555) 123-4567 ext") stay well under this.
+MAX_RAW_LENGTH = 24
+# Digits accumulated per value; more than this can never be a valid number.
+MAX_DIGITS = 11
+
+_ZERO = ord("0")
+_TEN_DIGITS = 10 ** 10
+
+
+def normalize_phones(values) -> np.ndarray:
+    """
+    Normalize raw phone strings to 10-digit NANP numbers, vectorized.
+
+    Every non-digit character is dropped, a leading country code 1 is
+    removed, and the result must have 10 digits with an area code and
+    exchange starting with 2-9. Returns an int64 array holding the number,
+    or -1 where the value is invalid.
+    """
+    raw = np.asarray(values, dtype=f"U{MAX_RAW_LENGTH + 1}")
+    if raw.size == 0:
+        return np.empty(0, dtype=np.int64)
+    # One row of UCS-4 code points per value; the extra column flags overlong input.
+    codes = raw.view(np.uint32).reshape(raw.size, MAX_RAW_LENGTH + 1)
+    too_long = codes[:, MAX_RAW_LENGTH] != 0
+
+    digits = codes[:, :MAX_RAW_LENGTH].astype(np.int64) - _ZERO
+    is_digit = (digits >= 0) & (digits <= 9)
+
+    number = np.zeros(raw.size, dtype=np.int64)
+    count = np.zeros(raw.size, dtype=np.int64)
+    for column in range(MAX_RAW_LENGTH):
+        take = is_digit[:, column] & (count < MAX_DIGITS + 1)
+        number = np.where(take, number * 10 + digits[:, column], number)
+        count += is_digit[:, column]
+
+    country_code = (count == 11) & (number // _TEN_DIGITS == 1)
+    number = np.where(country_code, number - _TEN_DIGITS, number)
+    count = np.where(country_code, 10, count)
+
+    area_lead = number // 10 ** 9
+    exchange_lead = (number // 10 ** 6) % 10
+    valid = (count == 10) & (area_lead >= 2) & (exchange_lead >= 2) & ~too_long
+    return np.where(valid, number, -1)
+
+
+def format_phones(numbers: np.ndarray) -> list:
+    """Render normalized numbers as 10-digit strings ('' where invalid)."""
+    return ["" if n < 0 else str(n) for n in numbers.tolist()]
+
@@ -0,0 +1,96 @@
+"""
+Chunk-level scrubbing, run inside the engine's worker processes.
+
+Kept free of GCP imports so spawned workers start quickly and never
+inherit gRPC state from the parent.
+"""
+import csv
+import io
+from typing import List, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+from app.scrub.dnc_index import DncIndex
+from app.scrub.phones import format_phones, normalize_phones
+
+CLEAN, INVALID, DNC = 0, 1, 2
+
+# Per-process DNC index, memory-mapped on first use and reopened when the
+# engine hands out a new path (a new list version).
+_dnc: Optional[DncIndex] = None
+
+
+class ChunkResult(NamedTuple):
+    clean: bytes
+    invalid: bytes
+    dnc: bytes
+    rows: int
+    clean_rows: int
+    invalid_rows: int
+    dnc_rows: int
+
+
+def use_dnc_index(dnc_path: Optional[str]) -> None:
+    global _dnc
+    if dnc_path is None:
+        _dnc = None
+    elif _dnc is None or _dnc.path != dnc_path:
+        _dnc = DncIndex(dnc_path)
+
+
+def classify(numbers: np.ndarray) -> np.ndarray:
+    """
+    Classify rows from their normalized phones, shaped (phone columns, rows)
+    in priority order. The first valid phone decides: DNC if it is listed,
+    clean otherwise; rows without a valid phone are invalid.
+    """
+    valid = numbers >= 0
+    any_valid = valid.any(axis=0)
+    primary = numbers[valid.argmax(axis=0), np.arange(numbers.shape[1])]
+    if _dnc is not None:
+        on_dnc = _dnc.contains(primary) & any_valid
+    else:
+        on_dnc = np.zeros(numbers.shape[1], dtype=bool)
+    return np.where(~any_valid, INVALID, np.where(on_dnc, DNC, CLEAN))
+
+
+def scrub_chunk(data: bytes, phone_indexes: Sequence[int], dnc_path: Optional[str] = None) -> ChunkResult:
+    """
+    Scrub a block of complete CSV records against the DNC index at
+    `dnc_path`. Clean rows are written with their valid phones normalized
+    to 10 digits; invalid and DNC rows are written unchanged. Returns the CSV
+    bytes for each output plus row counts.
+    """
+    use_dnc_index(dnc_path)
+    rows: List[List[str]] = [row for row in csv.reader(io.StringIO(data.decode("utf-8", errors="replace"), newline="")) if row]
+    outputs = [io.StringIO(), io.StringIO(), io.StringIO()]
+    counts = [0, 0, 0]
+    if rows and phone_indexes:
+        numbers = np.stack([
+            normalize_phones([row[index] if index < len(row) else "" for row in rows])
+            for index in phone_indexes
+        ])
+        categories = classify(numbers).tolist()
+        formatted = [format_phones(column) for column in numbers]
+        writers = [csv.writer(output, lineterminator="\n") for output in outputs]
+        for position, (row, category) in enumerate(zip(rows, categories)):
+            if category == CLEAN:
+                for column, index in enumerate(phone_indexes):
+                    # Numbers that failed normalization keep their original text.
+                    if index < len(row) and numbers[column, position] >= 0:
+                        row[index] = formatted[column][position]
+            writers[category].writerow(row)
+            counts[category] += 1
+    elif rows:
+        csv.writer(outputs[INVALID], lineterminator="\n").writerows(rows)
+        counts[INVALID] = len(rows)
+
+    return ChunkResult(
+        clean=outputs[CLEAN].getvalue().encode("utf-8"),
+        invalid=outputs[INVALID].getvalue().encode("utf-8"),
+        dnc=outputs[DNC].getvalue().encode("utf-8"),
+        rows=len(rows),
+        clean_rows=counts[CLEAN],
+        invalid_rows=counts[INVALID],
+        dnc_rows=counts[DNC],
+    )
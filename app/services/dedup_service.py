@@ -0,0 +1,110 @@
+import os
+import json
+import hashlib
+import logging
+from datetime import datetime, timezone
+from typing import Optional, Tuple
+
+from google.cloud import firestore
+
+from app.metrics import SCRUB_DEDUP_LOOKUPS, instrument
+from app.models.item import Item
+from app.services.firestore_service import AsyncFirestoreService
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_AGE = 24 * 60 * 60
+
+
+def dedup_key(content_sha256: str, file_config: Item) -> str:
+    """
+    Key of an upload's scrub result: its content hash plus every config
+    field that changes the output (phone columns, their indexes and order,
+    aliases and the header flag).
+    """
+    relevant = {
+        "phoneColumns": file_config.phone_columns,
+        "columnAliases": file_config.column_aliases,
+        "phoneColumnIndexes": file_config.phone_column_indexes,
+        "phoneOrderIndexes": file_config.phone_order_indexes,
+        "hasHeaderRow": file_config.has_header_row,
+    }
+    config = json.dumps(relevant, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(f"{content_sha256}:{config}".encode("utf-8")).hexdigest()
+
+
+class DedupService:
+    """
+    Index from dedup keys to the file config that was scrubbed for them,
+    kept in its own Firestore collection (SCRUB_DEDUP_COLLECTION).
+
+    A finished job is reused for at most SCRUB_DEDUP_MAX_AGE seconds after
+    it completed, so results eventually pick up a newer DNC list;
+    SCRUB_DEDUP_MAX_AGE=0 turns deduplication off.
+    """
+
+    def __init__(self, client: firestore.AsyncClient, firestore_service: AsyncFirestoreService):
+        self.client = client
+        self.firestore_service = firestore_service
+        self.collection_name = os.environ.get(
+            "SCRUB_DEDUP_COLLECTION", f"{os.environ.get('FIRESTORE_COLLECTION', 'scrubFiles')}Dedup"
+        )
+        self.max_age = float(os.environ.get("SCRUB_DEDUP_MAX_AGE", DEFAULT_MAX_AGE))
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_age > 0
+
+    @instrument("firestore", "get_dedup_entry")
+    async def _get_entry(self, key: str) -> Optional[dict]:
+        snapshot = await self.client.collection(self.collection_name).document(key).get()
+        return snapshot.to_dict() if snapshot.exists else None
+
+    def _reusable(self, source: Optional[dict]) -> bool:
+        status = (source or {}).get("status") or {}
+        if status.get("stage") != "DONE":
+            return False
+        completed = status.get("lastUpdated")
+        if not isinstance(completed, datetime):
+            return False
+        if completed.tzinfo is None:
+            completed = completed.replace(tzinfo=timezone.utc)
+        return (datetime.now(timezone.utc) - completed).total_seconds() <= self.max_age
+
+    async def find(self, key: str) -> Optional[Tuple[str, dict]]:
+        """
+        The (doc ID, file config) of a finished job with the same key whose
+        results can be reused, or None.
+        """
+        if not self.enabled:
+            return None
+        try:
+            entry = await self._get_entry(key)
+            source_id = entry.get("docId") if entry else None
+            source = await self.firestore_service.get_document(source_id) if source_id else None
+        except Exception as e:
+            # Deduplication only saves work; never fail an upload over it.
+            logger.warning(f"Dedup lookup failed, scrubbing anyway: {e}")
+            source_id, source = None, None
+        if self._reusable(source):
+            SCRUB_DEDUP_LOOKUPS.labels("hit").inc()
+            return source_id, source
+        SCRUB_DEDUP_LOOKUPS.labels("miss").inc()
+        return None
+
+    @instrument("firestore", "set_dedup_entry")
+    async def _set_entry(self, key: str, entry: dict) -> None:
+        await self.client.collection(self.collection_name).document(key).set(entry)
+
+    async def record(self, key: str, doc_id: str, content_sha256: str) -> None:
+        """Point `key` at the job scrubbing `doc_id`; later identical uploads reuse it once DONE."""
+        if not self.enabled:
+            return
+        try:
+            await self._set_entry(key, {
+                "docId": doc_id,
+                "contentSha256": content_sha256,
+                "createdAt": firestore.SERVER_TIMESTAMP,
+            })
+        except Exception as e:
+            logger.warning(f"Recording dedup entry for {doc_id} failed: {e}")
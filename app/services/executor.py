@@ -0,0 +1,46 @@
+import os
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+DEFAULT_MAX_WORKERS = 32
+
+_executor: Optional[ThreadPoolExecutor] = None
+# Wraps each call handed to the executor; only set while the profiler is installed.
+_call_wrapper: Optional[Callable[[Callable[[], Any]], Callable[[], Any]]] = None
+
+
+def get_io_executor() -> ThreadPoolExecutor:
+    """
+    Bounded thread pool for blocking GCS and Pub/Sub client calls.
+    Size it with GCP_IO_MAX_WORKERS; calls beyond that queue instead of
+    spawning threads.
+    """
+    global _executor
+    if _executor is None:
+        max_workers = int(os.getenv("GCP_IO_MAX_WORKERS", DEFAULT_MAX_WORKERS))
+        _executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="gcp-io")
+    return _executor
+
+
+async def run_blocking(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """Run a blocking call on the I/O executor without blocking the event loop."""
+    loop = asyncio.get_running_loop()
+    call = functools.partial(func, *args, **kwargs)
+    if _call_wrapper is not None:
+        call = _call_wrapper(call)
+    return await loop.run_in_executor(get_io_executor(), call)
+
+
+def set_call_wrapper(wrapper: Optional[Callable[[Callable[[], Any]], Callable[[], Any]]]) -> None:
+    """Install (or with None, remove) a wrapper around every `run_blocking` call."""
+    global _call_wrapper
+    _call_wrapper = wrapper
+
+
+def shutdown_io_executor() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
@@ -1,13 +1,131 @@
 import os
+import threading
+from datetime import datetime
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Tuple
+import cachetools
+from google.api_core.exceptions import NotFound
 from google.cloud import firestore
+from google.cloud.firestore_v1.base_query import FieldFilter
+from google.cloud.firestore_v1.field_path import FieldPath
+from app.metrics import instrument
 
 ENV_VAR_MSG = "Specified environment variable is not set."
 
+# Firestore caps a single WriteBatch at 500 operations.
+MAX_BATCH_WRITES = 500
+
+class DocumentCache:
+    """
+    Bounded TTL/LRU cache of documents by ID, shared by the Firestore services.
+
+    Entries are dropped by the services' own writes and refreshed by snapshot
+    listeners; the TTL (FIRESTORE_CACHE_TTL seconds) bounds how stale a
+    document changed by another writer can get. FIRESTORE_CACHE_SIZE=0
+    disables caching.
+    """
+
+    def __init__(self, maxsize: Optional[int] = None, ttl: Optional[float] = None):
+        maxsize = int(os.getenv("FIRESTORE_CACHE_SIZE", "1024")) if maxsize is None else maxsize
+        ttl = float(os.getenv("FIRESTORE_CACHE_TTL", "5")) if ttl is None else ttl
+        self.enabled = maxsize > 0 and ttl > 0
+        self._cache = cachetools.TTLCache(maxsize=max(maxsize, 1), ttl=ttl)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_entry(self, doc_id: str) -> Optional[Tuple[dict, Optional[datetime]]]:
+        """The cached (document, update time), or None."""
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._cache.get(doc_id)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry
+
+    def get(self, doc_id: str) -> Optional[dict]:
+        entry = self.get_entry(doc_id)
+        return entry[0] if entry else None
+
+    def get_update_time(self, doc_id: str) -> Optional[datetime]:
+        with self._lock:
+            entry = self._cache.get(doc_id)
+        return entry[1] if entry else None
+
+    def put(self, doc_id: str, data: dict, update_time: Optional[datetime] = None) -> None:
+        if self.enabled:
+            with self._lock:
+                self._cache[doc_id] = (data, update_time)
+
+    def invalidate(self, doc_id: str) -> None:
+        with self._lock:
+            self._cache.pop(doc_id, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._cache),
+                "hitRatio": self.hits / lookups if lookups else 0.0,
+            }
+
+# Process-wide cache, so writes through any service invalidate it.
+document_cache = DocumentCache()
+
+def build_list_query(
+    collection,
+    page_size: Optional[int] = None,
+    cursor: Optional[str] = None,
+    fields: Optional[List[str]] = None,
+    uploaded_by_user_id: Optional[str] = None,
+    stage: Optional[str] = None,
+):
+    """
+    Builds the collection query shared by the list helpers.
+    Results are ordered by document ID so `cursor` (the last ID of the
+    previous page) resumes exactly where that page ended. Equality filters
+    plus document-ID ordering need no composite index.
+    """
+    query = collection
+    if uploaded_by_user_id is not None:
+        query = query.where(filter=FieldFilter("uploadedByUserId", "==", uploaded_by_user_id))
+    if stage is not None:
+        query = query.where(filter=FieldFilter("status.stage", "==", stage))
+    if fields:
+        query = query.select(fields)
+    query = query.order_by(FieldPath.document_id())
+    if cursor:
+        query = query.start_after({FieldPath.document_id(): cursor})
+    if page_size:
+        query = query.limit(page_size)
+    return query
+
+def _project(data: dict, field_paths: Optional[List[str]]) -> dict:
+    """The subset of `data` a read with this field mask would return."""
+    if not field_paths:
+        return data
+    projected: dict = {}
+    for field_path in field_paths:
+        source, target = data, projected
+        *parents, leaf = field_path.split(".")
+        for part in parents:
+            source = source.get(part) if isinstance(source, dict) else None
+            target = target.setdefault(part, {})
+        if isinstance(source, dict) and leaf in source:
+            target[leaf] = source[leaf]
+    return projected
+
 class FirestoreService:
-    def __init__(self):
-        self.client = firestore.Client()
+    def __init__(self, client: Optional[firestore.Client] = None, cache: Optional[DocumentCache] = None):
+        self.client = client or firestore.Client()
         self.collection_name = os.environ.get("FIRESTORE_COLLECTION", ENV_VAR_MSG)
+        self.cache = cache if cache is not None else document_cache
 
+    @instrument("firestore")
     def create_document(self, data: dict) -> str:
         """
         Creates a new document in Firestore with the provided data.
@@ -17,27 +135,288 @@ class FirestoreService:
         doc_ref.set(data)
         return doc_ref.id
 
+    @instrument("firestore")
+    def create_documents(self, items: List[dict]) -> List[str]:
+        """
+        Creates several documents with one WriteBatch commit per 500 documents.
+        Returns the document IDs in the same order as `items`.
+        """
+        collection = self.client.collection(self.collection_name)
+        doc_ids = []
+        for offset in range(0, len(items), MAX_BATCH_WRITES):
+            batch = self.client.batch()
+            for data in items[offset:offset + MAX_BATCH_WRITES]:
+                doc_ref = collection.document()
+                batch.set(doc_ref, data)
+                doc_ids.append(doc_ref.id)
+            batch.commit()
+        return doc_ids
+
+    @instrument("firestore", "get_document")
+    def _get_snapshot(self, doc_id: str):
+        return self.client.collection(self.collection_name).document(doc_id).get()
+
+    def get_document_with_update_time(self, doc_id: str) -> Tuple[Optional[dict], Optional[datetime]]:
+        """The document and when it last changed, or (None, None) if it does not exist."""
+        cached = self.cache.get_entry(doc_id)
+        if cached is not None:
+            return cached
+        doc_snapshot = self._get_snapshot(doc_id)
+        if doc_snapshot.exists:
+            data = doc_snapshot.to_dict()
+            self.cache.put(doc_id, data, doc_snapshot.update_time)
+            return data, doc_snapshot.update_time
+        return None, None
+
     def get_document(self, doc_id: str) -> dict:
+        return self.get_document_with_update_time(doc_id)[0]
+
+    @instrument("firestore", "get_update_time")
+    def _get_update_time(self, doc_id: str) -> Optional[datetime]:
+        # An empty field mask returns the document's metadata without its fields.
+        snapshot = self.client.collection(self.collection_name).document(doc_id).get(field_paths=[])
+        return snapshot.update_time if snapshot.exists else None
+
+    def get_update_time(self, doc_id: str) -> Optional[datetime]:
+        """
+        When the document last changed, or None if it does not exist. Served
+        from the cache when possible, otherwise read without the document's fields.
+        """
+        cached = self.cache.get_update_time(doc_id)
+        if cached is not None:
+            return cached
+        return self._get_update_time(doc_id)
+
+    @instrument("firestore", "get_documents")
+    def _get_snapshots(self, doc_ids: List[str], field_paths: Optional[List[str]] = None) -> list:
+        collection = self.client.collection(self.collection_name)
+        return list(self.client.get_all([collection.document(doc_id) for doc_id in doc_ids], field_paths=field_paths))
+
+    def get_documents(self, doc_ids: List[str], field_paths: Optional[List[str]] = None) -> Dict[str, Optional[dict]]:
+        """
+        Reads several documents in one `get_all` RPC, limited to `field_paths`
+        when given. Cached documents are served from the cache. Returns a map
+        of ID -> data, with None for documents that do not exist.
+        """
+        found: Dict[str, Optional[dict]] = {}
+        misses = []
+        for doc_id in dict.fromkeys(doc_ids):
+            cached = self.cache.get(doc_id)
+            if cached is not None:
+                found[doc_id] = _project(cached, field_paths)
+            else:
+                misses.append(doc_id)
+        if misses:
+            for snapshot in self._get_snapshots(misses, field_paths):
+                found[snapshot.id] = snapshot.to_dict() if snapshot.exists else None
+                # Only whole documents may be cached; masked reads would shadow the other fields.
+                if snapshot.exists and not field_paths:
+                    self.cache.put(snapshot.id, found[snapshot.id], snapshot.update_time)
+        return found
+
+    def _list_query(self, **query_options):
+        return build_list_query(self.client.collection(self.collection_name), **query_options)
+
+    @instrument("firestore")
+    def stream_documents(self, **query_options) -> Iterator[dict]:
+        """
+        Yields documents one at a time as the query streams in.
+        Accepts the same keyword arguments as `list_documents`.
+        """
+        for doc in self._list_query(**query_options).stream():
+            yield {"id": doc.id, **(doc.to_dict() or {})}
+
+    def list_documents(
+        self,
+        page_size: Optional[int] = None,
+        cursor: Optional[str] = None,
+        fields: Optional[List[str]] = None,
+        uploaded_by_user_id: Optional[str] = None,
+        stage: Optional[str] = None,
+    ) -> list:
+        """
+        Lists documents, optionally paginated, projected to `fields` and
+        filtered on `uploadedByUserId` / `status.stage`.
+        """
+        return list(self.stream_documents(
+            page_size=page_size,
+            cursor=cursor,
+            fields=fields,
+            uploaded_by_user_id=uploaded_by_user_id,
+            stage=stage,
+        ))
+
+    def _write_option(self, exists: Optional[bool] = None, last_update_time: Optional[datetime] = None):
+        if last_update_time is not None:
+            return self.client.write_option(last_update_time=last_update_time)
+        if exists is not None:
+            return self.client.write_option(exists=exists)
+        return None
+
+    @instrument("firestore")
+    def update_document(self, doc_id: str, data: dict, last_update_time: Optional[datetime] = None) -> bool:
+        """
+        Updates an existing document in a single RPC. `update` already requires
+        the document to exist; pass `last_update_time` to also reject concurrent
+        changes (raises FailedPrecondition). Returns False if it does not exist.
+        """
         doc_ref = self.client.collection(self.collection_name).document(doc_id)
-        doc_snapshot = doc_ref.get()
+        try:
+            doc_ref.update(data, option=self._write_option(last_update_time=last_update_time))
+        except NotFound:
+            return False
+        finally:
+            self.cache.invalidate(doc_id)
+        return True
+
+    @instrument("firestore")
+    def delete_document(self, doc_id: str, last_update_time: Optional[datetime] = None) -> bool:
+        """
+        Deletes an existing document in a single RPC with an `exists` (or
+        `last_update_time`) precondition. Returns False if it does not exist.
+        """
+        doc_ref = self.client.collection(self.collection_name).document(doc_id)
+        try:
+            doc_ref.delete(option=self._write_option(exists=True, last_update_time=last_update_time))
+        except NotFound:
+            return False
+        finally:
+            self.cache.invalidate(doc_id)
+        return True
+
+
+class AsyncFirestoreService:
+    """
+    Same operations as FirestoreService on `firestore.AsyncClient`, so
+    request handlers can await Firestore without blocking the event loop.
+    """
+
+    def __init__(self, client: Optional[firestore.AsyncClient] = None, cache: Optional[DocumentCache] = None):
+        self.client = client or firestore.AsyncClient()
+        self.collection_name = os.environ.get("FIRESTORE_COLLECTION", ENV_VAR_MSG)
+        self.cache = cache if cache is not None else document_cache
+
+    @instrument("firestore")
+    async def create_document(self, data: dict) -> str:
+        doc_ref = self.client.collection(self.collection_name).document()
+        await doc_ref.set(data)
+        return doc_ref.id
+
+    @instrument("firestore")
+    async def create_documents(self, items: List[dict]) -> List[str]:
+        collection = self.client.collection(self.collection_name)
+        doc_ids = []
+        for offset in range(0, len(items), MAX_BATCH_WRITES):
+            batch = self.client.batch()
+            for data in items[offset:offset + MAX_BATCH_WRITES]:
+                doc_ref = collection.document()
+                batch.set(doc_ref, data)
+                doc_ids.append(doc_ref.id)
+            await batch.commit()
+        return doc_ids
+
+    @instrument("firestore", "get_document")
+    async def _get_snapshot(self, doc_id: str):
+        return await self.client.collection(self.collection_name).document(doc_id).get()
+
+    async def get_document_with_update_time(self, doc_id: str) -> Tuple[Optional[dict], Optional[datetime]]:
+        cached = self.cache.get_entry(doc_id)
+        if cached is not None:
+            return cached
+        doc_snapshot = await self._get_snapshot(doc_id)
         if doc_snapshot.exists:
-            return doc_snapshot.to_dict()
-        return None
+            data = doc_snapshot.to_dict()
+            self.cache.put(doc_id, data, doc_snapshot.update_time)
+            return data, doc_snapshot.update_time
+        return None, None
+
+    async def get_document(self, doc_id: str) -> dict:
+        return (await self.get_document_with_update_time(doc_id))[0]
+
+    @instrument("firestore", "get_update_time")
+    async def _get_update_time(self, doc_id: str) -> Optional[datetime]:
+        snapshot = await self.client.collection(self.collection_name).document(doc_id).get(field_paths=[])
+        return snapshot.update_time if snapshot.exists else None
 
-    def list_documents(self) -> list:
-        docs = self.client.collection(self.collection_name).stream()
-        return [{"id": doc.id, **doc.to_dict()} for doc in docs]
+    async def get_update_time(self, doc_id: str) -> Optional[datetime]:
+        cached = self.cache.get_update_time(doc_id)
+        if cached is not None:
+            return cached
+        return await self._get_update_time(doc_id)
+
+    @instrument("firestore", "get_documents")
+    async def _get_snapshots(self, doc_ids: List[str], field_paths: Optional[List[str]] = None) -> list:
+        collection = self.client.collection(self.collection_name)
+        references = [collection.document(doc_id) for doc_id in doc_ids]
+        return [snapshot async for snapshot in self.client.get_all(references, field_paths=field_paths)]
+
+    async def get_documents(self, doc_ids: List[str], field_paths: Optional[List[str]] = None) -> Dict[str, Optional[dict]]:
+        found: Dict[str, Optional[dict]] = {}
+        misses = []
+        for doc_id in dict.fromkeys(doc_ids):
+            cached = self.cache.get(doc_id)
+            if cached is not None:
+                found[doc_id] = _project(cached, field_paths)
+            else:
+                misses.append(doc_id)
+        if misses:
+            for snapshot in await self._get_snapshots(misses, field_paths):
+                found[snapshot.id] = snapshot.to_dict() if snapshot.exists else None
+                if snapshot.exists and not field_paths:
+                    self.cache.put(snapshot.id, found[snapshot.id], snapshot.update_time)
+        return found
+
+    @instrument("firestore")
+    async def stream_documents(self, **query_options) -> AsyncIterator[dict]:
+        query = build_list_query(self.client.collection(self.collection_name), **query_options)
+        async for doc in query.stream():
+            yield {"id": doc.id, **(doc.to_dict() or {})}
+
+    async def list_documents(self, **query_options) -> list:
+        return [doc async for doc in self.stream_documents(**query_options)]
+
+    @instrument("firestore", "list_documents")
+    async def list_documents_with_versions(self, **query_options) -> Tuple[list, List[Tuple[str, datetime]]]:
+        """`list_documents`, plus the (ID, update time) of each document for a list ETag."""
+        query = build_list_query(self.client.collection(self.collection_name), **query_options)
+        documents, versions = [], []
+        async for doc in query.stream():
+            documents.append({"id": doc.id, **(doc.to_dict() or {})})
+            versions.append((doc.id, doc.update_time))
+        return documents, versions
+
+    @instrument("firestore")
+    async def list_versions(self, **query_options) -> List[Tuple[str, datetime]]:
+        """The (ID, update time) pairs of `list_documents_with_versions`, from a keys-only query."""
+        query_options = {**query_options, "fields": [FieldPath.document_id()]}
+        query = build_list_query(self.client.collection(self.collection_name), **query_options)
+        return [(doc.id, doc.update_time) async for doc in query.stream()]
+
+    def _write_option(self, exists: Optional[bool] = None, last_update_time: Optional[datetime] = None):
+        if last_update_time is not None:
+            return self.client.write_option(last_update_time=last_update_time)
+        if exists is not None:
+            return self.client.write_option(exists=exists)
+        return None
 
-    def update_document(self, doc_id: str, data: dict) -> bool:
+    @instrument("firestore")
+    async def update_document(self, doc_id: str, data: dict, last_update_time: Optional[datetime] = None) -> bool:
         doc_ref = self.client.collection(self.collection_name).document(doc_id)
-        if not doc_ref.get().exists:
+        try:
+            await doc_ref.update(data, option=self._write_option(last_update_time=last_update_time))
+        except NotFound:
             return False
-        doc_ref.update(data)
+        finally:
+            self.cache.invalidate(doc_id)
         return True
 
-    def delete_document(self, doc_id: str) -> bool:
+    @instrument("firestore")
+    async def delete_document(self, doc_id: str, last_update_time: Optional[datetime] = None) -> bool:
         doc_ref = self.client.collection(self.collection_name).document(doc_id)
-        if not doc_ref.get().exists:
+        try:
+            await doc_ref.delete(option=self._write_option(exists=True, last_update_time=last_update_time))
+        except NotFound:
             return False
-        doc_ref.delete()
+        finally:
+            self.cache.invalidate(doc_id)
         return True
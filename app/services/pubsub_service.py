@@ -1,14 +1,37 @@
 import os
 import json
+import time
+import asyncio
+import threading
+from concurrent import futures
+from concurrent.futures import Future
 from google.cloud import pubsub_v1
-from typing import Union
+from typing import List, Optional, Union
 import logging
+from app.services.executor import run_blocking
+from app.metrics import observe_dependency
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
 ENV_VAR_MSG = "Specified environment variable is not set."
 
+def _batch_settings() -> pubsub_v1.types.BatchSettings:
+    return pubsub_v1.types.BatchSettings(
+        max_messages=int(os.getenv("PUBSUB_BATCH_MAX_MESSAGES", "100")),
+        max_bytes=int(os.getenv("PUBSUB_BATCH_MAX_BYTES", str(1024 * 1024))),
+        max_latency=float(os.getenv("PUBSUB_BATCH_MAX_LATENCY", "0.05")),
+    )
+
+def _publisher_options() -> pubsub_v1.types.PublisherOptions:
+    # Block publishers instead of buffering without bound when Pub/Sub falls behind.
+    flow_control = pubsub_v1.types.PublishFlowControl(
+        message_limit=int(os.getenv("PUBSUB_FLOW_MAX_MESSAGES", "1000")),
+        byte_limit=int(os.getenv("PUBSUB_FLOW_MAX_BYTES", str(10 * 1024 * 1024))),
+        limit_exceeded_behavior=pubsub_v1.types.LimitExceededBehavior.BLOCK,
+    )
+    return pubsub_v1.types.PublisherOptions(flow_control=flow_control)
+
 class PubSubService:
     def __init__(self):
         self.project_id = os.getenv("GCP_PROJECT_ID", ENV_VAR_MSG)
@@ -20,35 +43,108 @@ class PubSubService:
         if not self.topic_id:
             raise ValueError("Environment variable 'PUBSUB_TOPIC' is not set.")
 
-        self.publisher = pubsub_v1.PublisherClient()
+        # Honors PUBSUB_EMULATOR_HOST for local testing.
+        self.publisher = pubsub_v1.PublisherClient(
+            batch_settings=_batch_settings(),
+            publisher_options=_publisher_options(),
+        )
         self.topic_path = self.publisher.topic_path(self.project_id, self.topic_id)
-    
-    def publish_message(self, message: Union[str, dict]) -> str:
-        """
-        Publishes a message to the configured Pub/Sub topic.
-        
-        Args:
-            message (str | dict): The message to publish. If dict, it will be serialized to JSON.
-        
-        Returns:
-            str: The message ID of the published message.
-        """
+        self._pending = set()
+        self._pending_lock = threading.Lock()
+
+    @staticmethod
+    def _encode(message: Union[str, dict]) -> bytes:
         if isinstance(message, dict):
             try:
                 message = json.dumps(message)
             except (TypeError, ValueError) as e:
                 raise ValueError(f"Failed to serialize message to JSON: {e}")
-        
+
         if not isinstance(message, str):
             raise TypeError("Message must be a string or a dictionary.")
-        
+
+        return message.encode("utf-8")
+
+    def _on_published(self, future: Future, started: float) -> None:
+        with self._pending_lock:
+            self._pending.discard(future)
         try:
-            data = message.encode("utf-8")
-            future = self.publisher.publish(self.topic_path, data=data)
-            message_id = future.result()
-            logger.info(f"Published message ID: {message_id}")
-            return message_id
+            logger.info(f"Published message ID: {future.result()}")
         except Exception as e:
+            observe_dependency("pubsub", "publish", started, e)
             logger.error(f"Failed to publish message: {e}")
-            raise
-    
\ No newline at end of file
+        else:
+            observe_dependency("pubsub", "publish", started)
+
+    def publish_nowait(self, message: Union[str, dict]) -> Future:
+        """
+        Queues a message on the batching publisher and returns its future
+        without waiting for the round trip. Success and failure are logged
+        by a callback; pending futures are flushed by `shutdown`.
+        """
+        data = self._encode(message)
+        # Latency is measured up to the server ack, including time spent batching.
+        started = time.perf_counter()
+        future = self.publisher.publish(self.topic_path, data=data)
+        with self._pending_lock:
+            self._pending.add(future)
+        future.add_done_callback(lambda f: self._on_published(f, started))
+        return future
+
+    def publish_message(self, message: Union[str, dict]) -> str:
+        """
+        Publishes a message to the configured Pub/Sub topic.
+        
+        Args:
+            message (str | dict): The message to publish. If dict, it will be serialized to JSON.
+        
+        Returns:
+            str: The message ID of the published message.
+        """
+        return self.publish_nowait(message).result()
+
+    def shutdown(self, timeout: Optional[float] = None) -> None:
+        """
+        Sends every batched message and waits up to `timeout` seconds
+        (PUBSUB_SHUTDOWN_TIMEOUT, default 10) for them to be acknowledged.
+        """
+        if timeout is None:
+            timeout = float(os.getenv("PUBSUB_SHUTDOWN_TIMEOUT", "10"))
+        self.publisher.stop()
+        with self._pending_lock:
+            pending = list(self._pending)
+        _, not_done = futures.wait(pending, timeout=timeout)
+        if not_done:
+            logger.error(f"{len(not_done)} Pub/Sub messages still pending at shutdown")
+
+
+class AsyncPubSubService:
+    """
+    Awaitable wrapper around PubSubService. Messages go through the client's
+    batching publisher; the call itself runs on the bounded I/O executor
+    because flow control may block it.
+    """
+
+    def __init__(self, pubsub_service: Optional[PubSubService] = None):
+        self.pubsub_service = pubsub_service or PubSubService()
+
+    async def publish_nowait(self, message: Union[str, dict]) -> Future:
+        return await run_blocking(self.pubsub_service.publish_nowait, message)
+
+    async def publish(self, message: Union[str, dict]) -> str:
+        """Publish a message and await its message ID."""
+        future = await self.publish_nowait(message)
+        return await asyncio.wrap_future(future)
+
+    async def publish_message(self, message: Union[str, dict]) -> str:
+        return await self.publish(message)
+
+    async def publish_batch(self, messages: List[Union[str, dict]]) -> List[Future]:
+        """
+        Queues every message in one executor hop so they share publisher
+        batches, without waiting for the round trips.
+        """
+        return await run_blocking(lambda: [self.pubsub_service.publish_nowait(m) for m in messages])
+
+    async def shutdown(self) -> None:
+        await run_blocking(self.pubsub_service.shutdown)
@@ -0,0 +1,194 @@
+import os
+import asyncio
+import logging
+import threading
+from typing import TYPE_CHECKING, Any, Callable, Dict
+
+from google.cloud import firestore, storage
+
+from app.services.dedup_service import DedupService
+from app.services.executor import run_blocking
+from app.services.firestore_service import AsyncFirestoreService, FirestoreService
+from app.services.pubsub_service import AsyncPubSubService, PubSubService
+from app.services.status_watch_service import StatusWatchService
+from app.services.storage_service import AsyncStorageService, StorageService
+
+if TYPE_CHECKING:
+    from app.scrub.engine import ScrubEngine
+
+logger = logging.getLogger(__name__)
+
+
+class ClientRegistry:
+    """
+    Process-wide home of the GCP clients and the services built on them.
+
+    - Every client and service is built on first use, exactly once, and then
+      shared, so credentials are discovered once and gRPC channels and HTTP
+      connection pools are reused by every router.
+    - `warm_up` builds them ahead of the first request (call it at startup);
+      `close` flushes Pub/Sub, detaches listeners and closes the clients.
+    - `register` installs a ready-made instance, e.g. a fake in benchmarks.
+    """
+
+    def __init__(self):
+        self._instances: Dict[str, Any] = {}
+        # Re-entrant: building a service builds the client it wraps.
+        self._lock = threading.RLock()
+
+    def _get(self, name: str, factory: Callable[[], Any]) -> Any:
+        instance = self._instances.get(name)
+        if instance is None:
+            with self._lock:
+                instance = self._instances.get(name)
+                if instance is None:
+                    instance = self._instances[name] = factory()
+        return instance
+
+    def register(self, name: str, instance: Any) -> None:
+        with self._lock:
+            self._instances[name] = instance
+
+    def firestore_client(self) -> firestore.Client:
+        return self._get("firestore_client", firestore.Client)
+
+    def firestore_async_client(self) -> firestore.AsyncClient:
+        # grpc.aio channels bind to the running loop; build this one from async code.
+        return self._get("firestore_async_client", firestore.AsyncClient)
+
+    def storage_client(self) -> storage.Client:
+        return self._get("storage_client", storage.Client)
+
+    def firestore_service(self) -> FirestoreService:
+        return self._get("firestore_service", lambda: FirestoreService(client=self.firestore_client()))
+
+    def async_firestore_service(self) -> AsyncFirestoreService:
+        return self._get(
+            "async_firestore_service", lambda: AsyncFirestoreService(client=self.firestore_async_client())
+        )
+
+    def dedup_service(self) -> DedupService:
+        # Built on the async client, so from async code as well.
+        return self._get(
+            "dedup_service", lambda: DedupService(self.firestore_async_client(), self.async_firestore_service())
+        )
+
+    def storage_service(self) -> StorageService:
+        return self._get("storage_service", lambda: StorageService(client=self.storage_client()))
+
+    def async_storage_service(self) -> AsyncStorageService:
+        return self._get("async_storage_service", lambda: AsyncStorageService(self.storage_service()))
+
+    def pubsub_service(self) -> PubSubService:
+        return self._get("pubsub_service", PubSubService)
+
+    def async_pubsub_service(self) -> AsyncPubSubService:
+        return self._get("async_pubsub_service", lambda: AsyncPubSubService(self.pubsub_service()))
+
+    def status_watch_service(self) -> StatusWatchService:
+        return self._get("status_watch_service", lambda: StatusWatchService(client=self.firestore_client()))
+
+    def scrub_engine(self) -> "ScrubEngine":
+        def build():
+            # Imported here so numpy only loads once a scrub job actually runs.
+            from app.scrub.engine import ScrubEngine
+            return ScrubEngine(self.storage_service(), self.firestore_service())
+        return self._get("scrub_engine", build)
+
+    async def warm_up(self) -> None:
+        """
+        Build every client and service before the first request. Blocking
+        constructors run concurrently on the I/O executor; failures are
+        logged and retried lazily on first use.
+        """
+        builders = [
+            self.firestore_service,
+            self.async_storage_service,
+            self.async_pubsub_service,
+            self.status_watch_service,
+        ]
+        results = await asyncio.gather(
+            *(run_blocking(builder) for builder in builders), return_exceptions=True
+        )
+        try:
+            self.async_firestore_service()
+            self.dedup_service()
+        except Exception as e:
+            results.append(e)
+        for result in results:
+            if isinstance(result, Exception):
+                logger.error(f"Warming up GCP clients failed: {result}")
+
+    async def close(self) -> None:
+        """Flush pending publishes, stop listeners and close every client that was built."""
+        with self._lock:
+            instances = dict(self._instances)
+            self._instances.clear()
+
+        if "pubsub_service" in instances:
+            pubsub_service = instances["pubsub_service"]
+            # Cloud Run sends SIGTERM on scale-in; flush batched messages so no scrub job is lost.
+            await run_blocking(pubsub_service.shutdown)
+            pubsub_service.publisher.transport.close()
+        if "status_watch_service" in instances:
+            await run_blocking(instances["status_watch_service"].close)
+        if "scrub_engine" in instances:
+            await run_blocking(instances["scrub_engine"].close)
+
+        for name in ("firestore_client", "storage_client"):
+            client = instances.get(name)
+            if client is not None:
+                _close_sync_client(client)
+        async_client = instances.get("firestore_async_client")
+        if async_client is not None:
+            api = getattr(async_client, "_firestore_api_internal", None)
+            if api is not None:
+                await api.transport.close()
+            async_client.close()
+
+
+def _close_sync_client(client) -> None:
+    # `close` only releases the HTTP session; the gRPC channel lives on the
+    # generated API object, which exists once the client has been used.
+    api = getattr(client, "_firestore_api_internal", None)
+    if api is not None:
+        api.transport.close()
+    client.close()
+
+
+registry = ClientRegistry()
+
+
+def warm_up_enabled() -> bool:
+    return os.getenv("GCP_CLIENT_WARMUP", "true").lower() not in ("0", "false", "no")
+
+
+# FastAPI dependencies. They are coroutines so resolving them never costs a
+# threadpool hop; after warm-up they only read the registry.
+
+async def get_firestore_service() -> FirestoreService:
+    return registry.firestore_service()
+
+async def get_async_firestore_service() -> AsyncFirestoreService:
+    return registry.async_firestore_service()
+
+async def get_dedup_service() -> DedupService:
+    return registry.dedup_service()
+
+async def get_storage_service() -> StorageService:
+    return registry.storage_service()
+
+async def get_async_storage_service() -> AsyncStorageService:
+    return registry.async_storage_service()
+
+async def get_pubsub_service() -> PubSubService:
+    return registry.pubsub_service()
+
+async def get_async_pubsub_service() -> AsyncPubSubService:
+    return registry.async_pubsub_service()
+
+async def get_status_watch_service() -> StatusWatchService:
+    return registry.status_watch_service()
+
+async def get_scrub_engine() -> "ScrubEngine":
+    return registry.scrub_engine()
@@ -0,0 +1,127 @@
+import os
+import asyncio
+import logging
+import threading
+from typing import Dict, Optional, Set, Tuple
+from google.cloud import firestore
+from app.utils import make_serializable
+from app.services.firestore_service import DocumentCache, document_cache
+
+logger = logging.getLogger(__name__)
+
+ENV_VAR_MSG = "Specified environment variable is not set."
+
+
+class _DocumentWatch:
+    """One Firestore listener and the subscriber queues fed by it."""
+
+    def __init__(self):
+        self.watch = None
+        self.subscribers: Set[Tuple[asyncio.AbstractEventLoop, asyncio.Queue]] = set()
+        self.last_event: Optional[dict] = None
+
+
+class StatusWatchService:
+    """
+    Pushes status changes of scrub-file documents to asyncio subscribers.
+
+    Every document gets at most one snapshot listener, shared by all clients
+    watching it. The listener is attached on the first subscription and
+    detached when the last subscriber leaves. Subscribers receive an event
+    each time `status.stage` changes, starting with the current status.
+    """
+
+    def __init__(self, client: Optional[firestore.Client] = None, cache: Optional[DocumentCache] = None):
+        self._client = client
+        # Snapshots keep the shared document cache fresh for watched documents.
+        self.cache = cache if cache is not None else document_cache
+        self.collection_name = os.environ.get("FIRESTORE_COLLECTION", ENV_VAR_MSG)
+        self._watches: Dict[str, _DocumentWatch] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def client(self) -> firestore.Client:
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = firestore.Client()
+        return self._client
+
+    def _on_snapshot(self, doc_id: str, docs, changes, read_time) -> None:
+        snapshot = docs[0] if docs else None
+        if snapshot is not None and snapshot.exists:
+            data = snapshot.to_dict() or {}
+            self.cache.put(doc_id, data, snapshot.update_time)
+            event = {"id": doc_id, "exists": True, "status": make_serializable(data.get("status") or {})}
+        else:
+            self.cache.invalidate(doc_id)
+            event = {"id": doc_id, "exists": False, "status": None}
+
+        with self._lock:
+            entry = self._watches.get(doc_id)
+            if entry is None:
+                return
+            previous = entry.last_event
+            if previous is not None and previous["exists"] == event["exists"] and \
+                    (previous["status"] or {}).get("stage") == (event["status"] or {}).get("stage"):
+                # Only stage transitions are pushed.
+                return
+            entry.last_event = event
+            subscribers = list(entry.subscribers)
+
+        for loop, queue in subscribers:
+            loop.call_soon_threadsafe(queue.put_nowait, event)
+
+    def subscribe(self, doc_id: str, queue: asyncio.Queue, loop: asyncio.AbstractEventLoop) -> None:
+        """
+        Start delivering status events for `doc_id` to `queue` on `loop`.
+        Blocking (it may open a listener), so call it off the event loop.
+        """
+        with self._lock:
+            entry = self._watches.get(doc_id)
+            if entry is None:
+                entry = self._watches[doc_id] = _DocumentWatch()
+            entry.subscribers.add((loop, queue))
+            last_event = entry.last_event
+            needs_listener = entry.watch is None
+
+        if last_event is not None:
+            loop.call_soon_threadsafe(queue.put_nowait, last_event)
+
+        if needs_listener:
+            doc_ref = self.client.collection(self.collection_name).document(doc_id)
+            watch = doc_ref.on_snapshot(
+                lambda docs, changes, read_time: self._on_snapshot(doc_id, docs, changes, read_time)
+            )
+            with self._lock:
+                if entry.watch is None and self._watches.get(doc_id) is entry:
+                    entry.watch = watch
+                    watch = None
+            if watch is not None:
+                # Raced with another subscriber or with the last unsubscribe.
+                watch.unsubscribe()
+
+    def unsubscribe(self, doc_id: str, queue: asyncio.Queue, loop: asyncio.AbstractEventLoop) -> None:
+        """Stop delivering events to `queue`; detaches the listener when nobody is left."""
+        with self._lock:
+            entry = self._watches.get(doc_id)
+            if entry is None:
+                return
+            entry.subscribers.discard((loop, queue))
+            if entry.subscribers:
+                return
+            del self._watches[doc_id]
+            watch = entry.watch
+        if watch is not None:
+            watch.unsubscribe()
+
+    def watched_documents(self) -> int:
+        with self._lock:
+            return len(self._watches)
+
+    def close(self) -> None:
+        with self._lock:
+            watches = [entry.watch for entry in self._watches.values() if entry.watch is not None]
+            self._watches.clear()
+        for watch in watches:
+            watch.unsubscribe()
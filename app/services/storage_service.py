@@ -1,26 +1,376 @@
 import os
+import base64
+import hashlib
+import threading
+import google_crc32c
+from datetime import timedelta
+from typing import AsyncIterator, Iterator, Optional, Tuple
+import google.auth.credentials
+import google.auth.transport.requests
+from google.api_core.exceptions import NotFound, PreconditionFailed
+from google.oauth2 import service_account
 from google.cloud import storage
 from fastapi import UploadFile
+from app.services.executor import run_blocking
+from app.compression import DecodingReader, EncodingWriter, compressor, decompressor, storage_encoding
+from app.metrics import STORAGE_COMPRESSION_BYTES, STORAGE_DOWNLOADED_BYTES, STORAGE_UPLOADED_BYTES, instrument
 
 ENV_VAR_MSG = "Specified environment variable is not set."
 
+# Resumable uploads require chunk sizes that are a multiple of 256 KiB.
+CHUNK_SIZE_MULTIPLE = 256 * 1024
+DEFAULT_UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+DEFAULT_DOWNLOAD_CHUNK_SIZE = 4 * 1024 * 1024
+DEFAULT_SIGNED_URL_TTL = 15 * 60
+# V4 signatures are valid for at most seven days.
+MAX_SIGNED_URL_TTL = 7 * 24 * 60 * 60
+
+
+def _upload_chunk_size() -> int:
+    """Read GCS_UPLOAD_CHUNK_SIZE, rounded down to a valid resumable chunk size."""
+    size = int(os.environ.get("GCS_UPLOAD_CHUNK_SIZE", DEFAULT_UPLOAD_CHUNK_SIZE))
+    return max(CHUNK_SIZE_MULTIPLE, size - size % CHUNK_SIZE_MULTIPLE)
+
+
 class StorageService:
-    def __init__(self):
-        self.client = storage.Client()
+    def __init__(self, client: Optional[storage.Client] = None):
+        # Honors STORAGE_EMULATOR_HOST, so a local fake GCS server can be used.
+        self.client = client or storage.Client()
         self.bucket_name = os.environ.get("BUCKET_NAME", ENV_VAR_MSG)
+        self.upload_chunk_size = _upload_chunk_size()
+        self.download_chunk_size = int(
+            os.environ.get("GCS_DOWNLOAD_CHUNK_SIZE", DEFAULT_DOWNLOAD_CHUNK_SIZE)
+        )
+        self.signed_url_ttl = min(
+            int(os.environ.get("GCS_SIGNED_URL_TTL", DEFAULT_SIGNED_URL_TTL)), MAX_SIGNED_URL_TTL
+        )
+        self._signing_credentials = None
+        self._signing_lock = threading.Lock()
+
+    @instrument("storage")
+    async def upload_stream(self, file: UploadFile, path: str) -> dict:
+        """
+        Streams an UploadFile to GCS through a resumable upload session.
+
+        The file is read and sent in `upload_chunk_size` pieces, so peak memory
+        per upload stays around one chunk regardless of the file size. Blocking
+        GCS calls run off the event loop.
 
-    async def upload_file(self, file: UploadFile, path: str) -> str:
+        With GCS_CONTENT_ENCODING set, the content is compressed on the way
+        and stored with that `Content-Encoding`.
+
+        Returns a dict with the object `path`, the content's `size` in bytes
+        and hex `sha256`, plus the `stored_size`, base64-encoded `crc32c` and
+        `content_encoding` of the object as stored.
+        """
+        encoding = storage_encoding()
         bucket = self.client.bucket(self.bucket_name)
-        blob = bucket.blob(path)
-        blob.upload_from_string(await file.read(), content_type=file.content_type)
-        return path
+        blob = bucket.blob(path, chunk_size=self.upload_chunk_size)
+        blob.content_encoding = encoding
+        # GCS validates the final object against the CRC32C computed by the
+        # resumable upload, so a corrupted transfer fails instead of landing.
+        writer = blob.open("wb", content_type=file.content_type, checksum="crc32c")
+        encoder = compressor(encoding) if encoding else None
+
+        checksum = google_crc32c.Checksum()
+        digest = hashlib.sha256()
+        size = 0
+        stored_size = 0
+        while True:
+            chunk = await file.read(self.upload_chunk_size)
+            if not chunk:
+                break
+            digest.update(chunk)
+            size += len(chunk)
+            if encoder is not None:
+                chunk = await run_blocking(encoder.compress, chunk)
+            checksum.update(chunk)
+            stored_size += len(chunk)
+            await run_blocking(writer.write, chunk)
+            STORAGE_UPLOADED_BYTES.inc(len(chunk))
+        if encoder is not None:
+            tail = encoder.flush()
+            checksum.update(tail)
+            stored_size += len(tail)
+            await run_blocking(writer.write, tail)
+            STORAGE_UPLOADED_BYTES.inc(len(tail))
+            STORAGE_COMPRESSION_BYTES.labels(encoding, "in").inc(size)
+            STORAGE_COMPRESSION_BYTES.labels(encoding, "out").inc(stored_size)
+        # Only finalize on success; an abandoned session never creates the object.
+        await run_blocking(writer.close)
+
+        return {
+            "path": path,
+            "size": size,
+            "sha256": digest.hexdigest(),
+            "stored_size": stored_size,
+            "crc32c": base64.b64encode(checksum.digest()).decode("ascii"),
+            "content_encoding": encoding,
+        }
+
+    async def upload_file(self, file: UploadFile, path: str = None) -> str:
+        path = path or file.filename
+        result = await self.upload_stream(file, path)
+        return result["path"]
+
+    @instrument("storage")
+    def get_blob(self, path: str) -> Optional[storage.Blob]:
+        """
+        Fetches object metadata (size, generation, CRC32C, updated) in a single
+        request. Returns None if the object does not exist.
+        """
+        bucket = self.client.bucket(self.bucket_name)
+        return bucket.get_blob(path)
+
+    @instrument("storage")
+    def delete_blob(self, path: str, generation: Optional[int] = None) -> bool:
+        """
+        Deletes the object, only if it is still at `generation` when given.
+        Returns False if it does not exist (or was replaced).
+        """
+        blob = self.client.bucket(self.bucket_name).blob(path)
+        try:
+            blob.delete(if_generation_match=generation)
+        except (NotFound, PreconditionFailed):
+            return False
+        return True
+
+    @instrument("storage")
+    def download_range(self, blob: storage.Blob, start: int, end: int) -> bytes:
+        """
+        Bytes `start` to `end` (inclusive) of the object as stored, in one
+        ranged GET pinned to `blob`'s generation.
+        """
+        # Checksums cannot be validated on partial reads. Raw: compressed
+        # objects are read as stored, never transcoded by GCS.
+        chunk = blob.download_as_bytes(start=start, end=end, checksum=None, raw_download=True)
+        STORAGE_DOWNLOADED_BYTES.inc(len(chunk))
+        return chunk
+
+    def read_head(self, blob: storage.Blob, size: int) -> Tuple[bytes, int]:
+        """
+        Up to `size` bytes from the start of the decoded content, read with
+        ranged GETs of at most `size` stored bytes. Returns the bytes and how
+        many stored bytes were read, to scale estimates up to `blob.size`.
+        """
+        if not blob.size or size <= 0:
+            return b"", 0
+        if not blob.content_encoding:
+            data = self.download_range(blob, 0, min(size, blob.size) - 1)
+            return data, len(data)
+        decoder = decompressor(blob.content_encoding)
+        decoded, position = b"", 0
+        while len(decoded) < size and position < blob.size:
+            chunk = self.download_range(blob, position, min(position + size, blob.size) - 1)
+            if not chunk:
+                break
+            position += len(chunk)
+            decoded += decoder.decompress(chunk)
+        return decoded[:size], position
+
+    def iter_download(
+        self, blob: storage.Blob, start: int = 0, end: Optional[int] = None
+    ) -> Iterator[bytes]:
+        """
+        Yields the object's bytes from `start` to `end` (inclusive) in
+        `download_chunk_size` pieces, one ranged GET per chunk.
+
+        `blob` should come from `get_blob`, so every chunk is pinned to the
+        same generation even if the object is overwritten mid-stream. Bytes
+        are yielded as stored, i.e. still in the blob's `content_encoding`.
+        """
+        if end is None:
+            end = blob.size - 1
+        position = start
+        while position <= end:
+            chunk_end = min(position + self.download_chunk_size - 1, end)
+            chunk = self.download_range(blob, position, chunk_end)
+            if not chunk:
+                break
+            position += len(chunk)
+            yield chunk
+
+    def iter_decoded(self, blob: storage.Blob) -> Iterator[bytes]:
+        """Like `iter_download`, but undoing the blob's `content_encoding`."""
+        chunks = self.iter_download(blob)
+        if not blob.content_encoding:
+            yield from chunks
+            return
+        decoder = decompressor(blob.content_encoding)
+        for chunk in chunks:
+            data = decoder.decompress(chunk)
+            if data:
+                yield data
+
+    @instrument("storage")
+    def download_to_filename(self, blob: storage.Blob, filename: str) -> None:
+        """Download the whole object to a local file, validating its CRC32C."""
+        blob.download_to_filename(filename, checksum="crc32c")
+        STORAGE_DOWNLOADED_BYTES.inc(os.path.getsize(filename))
+
+    def open_reader(self, blob: storage.Blob):
+        """
+        File-like reader over `blob`'s decoded content, buffering
+        `download_chunk_size` stored bytes per ranged GET. `tell()` counts
+        stored bytes, like `blob.size`.
+        """
+        reader = blob.open("rb", chunk_size=self.download_chunk_size, raw_download=True)
+        if blob.content_encoding:
+            return DecodingReader(reader, blob.content_encoding, self.download_chunk_size)
+        return reader
+
+    def open_writer(self, path: str, content_type: str = "text/csv"):
+        """
+        File-like writer streaming to a resumable upload in `upload_chunk_size`
+        pieces, compressed per GCS_CONTENT_ENCODING. The object only appears
+        once the writer is closed.
+        """
+        encoding = storage_encoding()
+        blob = self.client.bucket(self.bucket_name).blob(path, chunk_size=self.upload_chunk_size)
+        blob.content_encoding = encoding
+        writer = blob.open("wb", content_type=content_type, checksum="crc32c")
+        return EncodingWriter(writer, encoding) if encoding else writer
 
+    @instrument("storage")
     def download_file(self, filename: str) -> bytes:
         bucket = self.client.bucket(self.bucket_name)
-        blob = bucket.blob(filename)
-        if not blob.exists():
+        # One metadata request tells both existence and the stored coding.
+        blob = bucket.get_blob(filename)
+        if blob is None:
             return None
-        return blob.download_as_bytes()
+        data = blob.download_as_bytes(raw_download=True)
+        STORAGE_DOWNLOADED_BYTES.inc(len(data))
+        if blob.content_encoding:
+            data = decompressor(blob.content_encoding).decompress(data)
+        return data
 
     def get_public_url(self, filename: str) -> str:
-        return f"https://storage.googleapis.com/{self.bucket_name}/{filename}"
\ No newline at end of file
+        return f"https://storage.googleapis.com/{self.bucket_name}/{filename}"
+
+    def _signing_kwargs(self) -> dict:
+        """
+        Credentials for V4 signing. A service-account key (GCS_SIGNING_KEY_FILE,
+        or the client's own key) signs locally with no network call. Metadata
+        server credentials cannot sign, so GCS signs through IAM signBlob instead.
+        """
+        with self._signing_lock:
+            if self._signing_credentials is None:
+                key_file = os.environ.get("GCS_SIGNING_KEY_FILE")
+                if key_file:
+                    self._signing_credentials = service_account.Credentials.from_service_account_file(key_file)
+                else:
+                    self._signing_credentials = self.client._credentials
+            credentials = self._signing_credentials
+            if isinstance(credentials, google.auth.credentials.Signing):
+                return {"credentials": credentials}
+            if not credentials.valid:
+                credentials.refresh(google.auth.transport.requests.Request())
+            return {
+                "service_account_email": credentials.service_account_email,
+                "access_token": credentials.token,
+            }
+
+    def _expiration(self, expires_in: Optional[int]) -> timedelta:
+        seconds = self.signed_url_ttl if expires_in is None else min(expires_in, MAX_SIGNED_URL_TTL)
+        return timedelta(seconds=seconds)
+
+    @instrument("storage")
+    def generate_upload_url(
+        self, path: str, content_type: str = "application/octet-stream", expires_in: Optional[int] = None
+    ) -> str:
+        """
+        Returns a V4 signed URL the client can PUT the object to directly.
+        The PUT must send the same `Content-Type` the URL was signed for.
+        """
+        blob = self.client.bucket(self.bucket_name).blob(path)
+        return blob.generate_signed_url(
+            version="v4",
+            method="PUT",
+            content_type=content_type,
+            expiration=self._expiration(expires_in),
+            **self._signing_kwargs(),
+        )
+
+    @instrument("storage")
+    def generate_download_url(
+        self, path: str, filename: Optional[str] = None, expires_in: Optional[int] = None
+    ) -> str:
+        """
+        Returns a V4 signed GET URL for the object. With `filename`, GCS
+        serves it as an attachment under that name.
+        """
+        blob = self.client.bucket(self.bucket_name).blob(path)
+        disposition = f'attachment; filename="{filename}"' if filename else None
+        return blob.generate_signed_url(
+            version="v4",
+            method="GET",
+            expiration=self._expiration(expires_in),
+            response_disposition=disposition,
+            **self._signing_kwargs(),
+        )
+
+
+class AsyncStorageService:
+    """
+    Awaitable wrapper around StorageService. Blocking GCS calls run on the
+    bounded I/O executor, so request handlers never block the event loop.
+    """
+
+    def __init__(self, storage_service: Optional[StorageService] = None):
+        self.storage_service = storage_service or StorageService()
+
+    async def upload_stream(self, file: UploadFile, path: str) -> dict:
+        return await self.storage_service.upload_stream(file, path)
+
+    async def upload_file(self, file: UploadFile, path: str = None) -> str:
+        return await self.storage_service.upload_file(file, path)
+
+    async def get_blob(self, path: str) -> Optional[storage.Blob]:
+        return await run_blocking(self.storage_service.get_blob, path)
+
+    async def delete_blob(self, path: str, generation: Optional[int] = None) -> bool:
+        return await run_blocking(self.storage_service.delete_blob, path, generation)
+
+    async def download_range(self, blob: storage.Blob, start: int, end: int) -> bytes:
+        return await run_blocking(self.storage_service.download_range, blob, start, end)
+
+    async def read_head(self, blob: storage.Blob, size: int) -> Tuple[bytes, int]:
+        return await run_blocking(self.storage_service.read_head, blob, size)
+
+    async def iter_download(
+        self, blob: storage.Blob, start: int = 0, end: Optional[int] = None
+    ) -> AsyncIterator[bytes]:
+        chunks = self.storage_service.iter_download(blob, start, end)
+        while True:
+            chunk = await run_blocking(next, chunks, None)
+            if chunk is None:
+                break
+            yield chunk
+
+    async def iter_decoded(self, blob: storage.Blob) -> AsyncIterator[bytes]:
+        chunks = self.storage_service.iter_decoded(blob)
+        while True:
+            chunk = await run_blocking(next, chunks, None)
+            if chunk is None:
+                break
+            yield chunk
+
+    async def download_file(self, filename: str) -> bytes:
+        return await run_blocking(self.storage_service.download_file, filename)
+
+    def get_public_url(self, filename: str) -> str:
+        return self.storage_service.get_public_url(filename)
+
+    async def generate_upload_url(
+        self, path: str, content_type: str = "application/octet-stream", expires_in: Optional[int] = None
+    ) -> str:
+        return await run_blocking(self.storage_service.generate_upload_url, path, content_type, expires_in)
+
+    async def generate_download_url(
+        self, path: str, filename: Optional[str] = None, expires_in: Optional[int] = None
+    ) -> str:
+        return await run_blocking(self.storage_service.generate_download_url, path, filename, expires_in)
+
+    @property
+    def signed_url_ttl(self) -> int:
+        return self.storage_service.signed_url_ttl
@@ -0,0 +1,157 @@
+import os
+import re
+import json
+import time
+import base64
+import hashlib
+import logging
+import threading
+from typing import Optional
+
+import cachetools
+import requests
+import google.auth.jwt
+
+logger = logging.getLogger(__name__)
+
+GOOGLE_CERTS_URL = "https://www.googleapis.com/oauth2/v1/certs"
+DEFAULT_CERTS_MAX_AGE = 3600.0
+# Refresh this many seconds before the cached certs expire.
+REFRESH_MARGIN = 300.0
+MIN_REFRESH_INTERVAL = 30.0
+# Unknown key IDs trigger at most one forced refresh per interval,
+# so forged tokens cannot be used to hammer the certs endpoint.
+UNKNOWN_KID_REFRESH_INTERVAL = 60.0
+
+_MAX_AGE_RE = re.compile(r"max-age=(\d+)")
+
+
+def _parse_max_age(cache_control: Optional[str]) -> float:
+    if cache_control:
+        match = _MAX_AGE_RE.search(cache_control)
+        if match:
+            return float(match.group(1))
+    return DEFAULT_CERTS_MAX_AGE
+
+
+def _token_key_id(token: str) -> Optional[str]:
+    """Read the `kid` from the (unverified) token header."""
+    try:
+        header_segment = token.split(".", 1)[0]
+        padded = header_segment + "=" * (-len(header_segment) % 4)
+        return json.loads(base64.urlsafe_b64decode(padded)).get("kid")
+    except (ValueError, AttributeError):
+        return None
+
+
+class GoogleTokenVerifier:
+    """
+    Verifies Google ID tokens against an in-memory copy of Google's signing certs.
+
+    - Certs are fetched once, kept for their `Cache-Control` max-age and
+      refreshed by a background thread shortly before they expire.
+    - Verified claims are kept in a bounded LRU keyed by the token's SHA-256
+      until the token's `exp`, so repeat calls skip signature checks entirely.
+
+    Point `GOOGLE_CERTS_URL` at a stub server to verify self-signed tokens locally.
+    """
+
+    def __init__(self, certs_url: Optional[str] = None, cache_size: Optional[int] = None):
+        self.certs_url = certs_url or os.getenv("GOOGLE_CERTS_URL", GOOGLE_CERTS_URL)
+        cache_size = cache_size or int(os.getenv("GOOGLE_TOKEN_CACHE_SIZE", "1024"))
+        self._session = requests.Session()
+        self._certs = {}
+        self._certs_expiry = 0.0
+        self._certs_lock = threading.Lock()
+        self._last_forced_refresh = 0.0
+        self._token_cache = cachetools.LRUCache(maxsize=cache_size)
+        self._token_lock = threading.Lock()
+        self._refresher = None
+        self._stop = threading.Event()
+
+    def _fetch_certs(self) -> None:
+        response = self._session.get(self.certs_url, timeout=10)
+        response.raise_for_status()
+        certs = response.json()
+        max_age = _parse_max_age(response.headers.get("Cache-Control"))
+        # Swap in the new mapping atomically; readers never see a partial update.
+        self._certs = certs
+        self._certs_expiry = time.time() + max_age
+        logger.info(f"Loaded {len(certs)} Google signing certs (max-age {max_age:.0f}s)")
+
+    def refresh_certs(self, force: bool = False) -> None:
+        """Fetch certs if they are missing, expired, or `force` is set. One caller fetches at a time."""
+        with self._certs_lock:
+            if not force and self._certs and time.time() < self._certs_expiry:
+                return
+            self._fetch_certs()
+
+    def get_certs(self) -> dict:
+        if not self._certs or time.time() >= self._certs_expiry:
+            try:
+                self.refresh_certs()
+            except requests.RequestException:
+                # Keep serving stale certs rather than failing every request.
+                if not self._certs:
+                    raise
+                logger.exception("Failed to refresh Google certs; using cached copy")
+        self.start()
+        return self._certs
+
+    def start(self) -> None:
+        """Start the background refresh thread (idempotent)."""
+        if self._refresher is not None:
+            return
+        with self._certs_lock:
+            if self._refresher is not None:
+                return
+            self._stop.clear()
+            self._refresher = threading.Thread(
+                target=self._refresh_loop, name="google-certs-refresh", daemon=True
+            )
+            self._refresher.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._refresher = None
+
+    def _refresh_loop(self) -> None:
+        delay = max(self._certs_expiry - time.time() - REFRESH_MARGIN, MIN_REFRESH_INTERVAL)
+        while not self._stop.wait(delay):
+            try:
+                self.refresh_certs(force=True)
+                delay = max(self._certs_expiry - time.time() - REFRESH_MARGIN, MIN_REFRESH_INTERVAL)
+            except Exception:
+                logger.exception("Background refresh of Google certs failed")
+                delay = MIN_REFRESH_INTERVAL
+
+    def _decode(self, token: str) -> dict:
+        certs = self.get_certs()
+        key_id = _token_key_id(token)
+        if key_id and key_id not in certs:
+            # Google may have rotated keys before our cached copy expired.
+            now = time.time()
+            if now - self._last_forced_refresh >= UNKNOWN_KID_REFRESH_INTERVAL:
+                self._last_forced_refresh = now
+                self.refresh_certs(force=True)
+                certs = self._certs
+        return google.auth.jwt.decode(token, certs=certs)
+
+    def verify(self, token: str) -> dict:
+        """
+        Verify the token's signature, `iat` and `exp` and return its claims.
+        Raises ValueError if the token is invalid.
+        """
+        key = hashlib.sha256(token.encode("utf-8")).digest()
+        now = time.time()
+        with self._token_lock:
+            cached = self._token_cache.get(key)
+        if cached is not None and cached[1] > now:
+            return cached[0]
+
+        claims = self._decode(token)
+        exp = claims.get("exp")
+        if exp:
+            with self._token_lock:
+                self._token_cache[key] = (claims, float(exp))
+        return claims
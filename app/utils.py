@@ -1,26 +1,204 @@
-from datetime import datetime
-from typing import Any
+from datetime import date, datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Dict, Iterable, Optional, Tuple
+import hashlib
+import orjson
+from fastapi.responses import JSONResponse, Response
+from google.api_core.datetime_helpers import DatetimeWithNanoseconds
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+# Values that are already JSON-serializable, matched by exact type.
+_SCALAR_TYPES = frozenset({str, int, float, bool, type(None)})
+
+# Exact-type converters for leaf values that JSON cannot represent natively.
+_CONVERTERS = {
+    datetime: datetime.isoformat,
+    date: date.isoformat,
+    DatetimeWithNanoseconds: DatetimeWithNanoseconds.isoformat,
+}
+
+def _convert_unknown(obj: Any) -> Any:
+    """Slow path for types missing from the dispatch tables."""
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    elif hasattr(obj, 'to_dict'):  # Firestore DocumentSnapshot
+        return obj.to_dict()
+    elif hasattr(obj, 'items'):  # Mapping
+        return dict(obj.items())
+    try:
+        return obj.isoformat()
+    except AttributeError:
+        # If the object doesn't have isoformat, return its string representation
+        return str(obj)
 
 def make_serializable(obj: Any) -> Any:
     """
-    Recursively convert Firestore data to a JSON-serializable format.
+    Convert Firestore data to a JSON-serializable format.
     - Converts Firestore's DatetimeWithNanoseconds to ISO-formatted strings.
-    - Handles nested dictionaries and lists.
+    - Handles nested dictionaries and lists iteratively, dispatching on exact types.
     """
-    if isinstance(obj, datetime):
-        return obj.isoformat()
-    elif hasattr(obj, 'to_dict'):  # Firestore DocumentSnapshot
-        return make_serializable(obj.to_dict())
-    elif hasattr(obj, 'items'):  # Dictionary
-        return {k: make_serializable(v) for k, v in obj.items()}
-    elif isinstance(obj, list):
-        return [make_serializable(item) for item in obj]
-    elif isinstance(obj, (int, float, str, bool)) or obj is None:
-        return obj
+    root = [obj]
+    stack = [(root, 0, obj)]
+    while stack:
+        parent, key, value = stack.pop()
+        value_type = type(value)
+        if value_type in _SCALAR_TYPES:
+            continue
+        converter = _CONVERTERS.get(value_type)
+        if converter is not None:
+            parent[key] = converter(value)
+        elif value_type is dict:
+            out = dict(value)
+            for k, v in out.items():
+                if type(v) not in _SCALAR_TYPES:
+                    stack.append((out, k, v))
+            parent[key] = out
+        elif value_type is list or value_type is tuple:
+            out = list(value)
+            for index, v in enumerate(out):
+                if type(v) not in _SCALAR_TYPES:
+                    stack.append((out, index, v))
+            parent[key] = out
+        else:
+            converted = _convert_unknown(value)
+            parent[key] = converted
+            if type(converted) not in _SCALAR_TYPES:
+                stack.append((parent, key, converted))
+    return root[0]
+
+def _orjson_default(obj: Any) -> Any:
+    converter = _CONVERTERS.get(type(obj))
+    if converter is not None:
+        return converter(obj)
+    return _convert_unknown(obj)
+
+def dumps(obj: Any) -> bytes:
+    """
+    Encode Firestore data straight to JSON bytes in one pass with orjson.
+    Produces the same output as json.dumps(make_serializable(obj)), without
+    building the intermediate copy.
+    """
+    return orjson.dumps(obj, default=_orjson_default, option=orjson.OPT_NON_STR_KEYS)
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with `dumps`, so Firestore documents need no pre-pass."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+def parse_byte_range(range_header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single HTTP `Range: bytes=...` header against an object of `size` bytes.
+    - Returns an inclusive (start, end) tuple for a satisfiable single range.
+    - Returns None when the header is absent, malformed or asks for several ranges,
+      in which case the full representation should be served.
+    - Raises ValueError when the range cannot be satisfied (respond with 416).
+    """
+    if not range_header:
+        return None
+    unit, _, spec = range_header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, sep, last = spec.strip().partition("-")
+    first, last = first.strip(), last.strip()
+    if not sep or not (first or last):
+        return None
+    if (first and not first.isdigit()) or (last and not last.isdigit()):
+        return None
+    if first:
+        start = int(first)
+        end = int(last) if last else size - 1
+        if last and end < start:
+            return None
     else:
-        # For Firestore's DatetimeWithNanoseconds or other types
-        try:
-            return obj.isoformat()
-        except AttributeError:
-            # If the object doesn't have isoformat, return its string representation
-            return str(obj)
+        # Suffix range: the last N bytes.
+        suffix = int(last)
+        if suffix == 0:
+            raise ValueError("Empty suffix range.")
+        start, end = max(size - suffix, 0), size - 1
+    if start >= size:
+        raise ValueError("Range start is beyond the end of the object.")
+    return start, min(end, size - 1)
+
+def if_range_matches(if_range: Optional[str], etag: str, last_modified: Optional[datetime]) -> bool:
+    """
+    Evaluate an `If-Range` header. Only a strong ETag match or an exact
+    Last-Modified date match allows the Range to be honored.
+    """
+    if not if_range:
+        return True
+    if_range = if_range.strip()
+    if if_range.startswith('"'):
+        return if_range == etag
+    if last_modified is None:
+        return False
+    try:
+        return parsedate_to_datetime(if_range) == last_modified.replace(microsecond=0)
+    except (TypeError, ValueError):
+        return False
+
+def update_time_etag(update_time: datetime) -> str:
+    """Strong ETag naming a Firestore document version: its update time in microseconds."""
+    if update_time.tzinfo is None:
+        update_time = update_time.replace(tzinfo=timezone.utc)
+    delta = update_time - _EPOCH
+    return f'"{(delta.days * 86400 + delta.seconds) * 1_000_000 + delta.microseconds}"'
+
+def versions_etag(versions: Iterable[Tuple[str, Optional[datetime]]]) -> str:
+    """Weak ETag for a list of documents, from their (ID, update time) pairs in order."""
+    digest = hashlib.sha256()
+    for doc_id, update_time in versions:
+        digest.update(f"{doc_id}@{update_time_etag(update_time) if update_time else ''};".encode("utf-8"))
+    return f'W/"{digest.hexdigest()[:32]}"'
+
+def is_not_modified(
+    if_none_match: Optional[str],
+    if_modified_since: Optional[str],
+    etag: Optional[str],
+    last_modified: Optional[datetime],
+) -> bool:
+    """
+    Evaluate `If-None-Match` / `If-Modified-Since` for a GET, i.e. whether
+    to answer 304. `If-None-Match` takes precedence and compares weakly;
+    `If-Modified-Since` has one-second resolution.
+    """
+    if if_none_match:
+        if etag is None:
+            return False
+        if if_none_match.strip() == "*":
+            return True
+        candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return etag.removeprefix("W/") in candidates
+    if not if_modified_since or last_modified is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    if last_modified.tzinfo is None:
+        last_modified = last_modified.replace(tzinfo=timezone.utc)
+    return last_modified.replace(microsecond=0) <= since
+
+# Headers a 304 carries over from the 200 it stands for.
+_NOT_MODIFIED_HEADERS = ("etag", "last-modified", "vary", "cache-control", "content-location", "expires")
+
+def not_modified_response(headers: Dict[str, str]) -> Response:
+    """Empty 304 keeping the validators and caching headers of the full response."""
+    return Response(
+        status_code=304,
+        headers={k: v for k, v in headers.items() if k.lower() in _NOT_MODIFIED_HEADERS},
+    )
+
+def validator_headers(etag: Optional[str], last_modified: Optional[datetime]) -> Dict[str, str]:
+    """ETag / Last-Modified response headers for a representation."""
+    headers = {}
+    if etag:
+        headers["ETag"] = etag
+    if last_modified:
+        if last_modified.tzinfo is None:
+            last_modified = last_modified.replace(tzinfo=timezone.utc)
+        headers["Last-Modified"] = format_datetime(last_modified.astimezone(timezone.utc), usegmt=True)
+    return headers
@@ -0,0 +1,148 @@
+"""
+Micro-benchmark for compression at rest and on responses.
+
+Compresses a synthetic lead CSV and a `/scrub-files/list` JSON page with
+every available coding and reports the ratio, bytes saved and CPU cost
+(compress and decompress throughput), then the per-request overhead of
+`CompressionMiddleware` on the JSON page.
+
+    python -m benchmarks.bench_compression [--rows 200000] [--docs 1000] [--repeat 3]
+"""
+import argparse
+import asyncio
+import random
+import time
+from typing import Callable, List, Tuple
+
+from app.compression import (
+    RESPONSE_LEVELS,
+    STORAGE_LEVELS,
+    SUPPORTED_ENCODINGS,
+    ZSTD,
+    CompressionMiddleware,
+    compressor,
+    decompressor,
+)
+from app.utils import dumps
+from benchmarks.asgi import call_asgi
+
+FIRST_NAMES = ["James", "Mary", "Robert", "Patricia", "John", "Jennifer", "Michael", "Linda", "David", "Elizabeth"]
+LAST_NAMES = ["Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller", "Davis", "Rodriguez", "Martinez"]
+STREETS = ["Main St", "Oak Ave", "Maple Dr", "Cedar Ln", "Pine St", "Elm St", "Washington Blvd", "Lake Rd"]
+CITIES = [("Springfield", "IL"), ("Austin", "TX"), ("Columbus", "OH"), ("Denver", "CO"), ("Phoenix", "AZ")]
+
+
+def lead_csv(rows: int, seed: int = 0) -> bytes:
+    rng = random.Random(seed)
+    lines = ["first_name,last_name,phone,alt_phone,email,address,city,state,zip"]
+    for _ in range(rows):
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        city, state = rng.choice(CITIES)
+        lines.append(",".join([
+            first,
+            last,
+            f"({rng.randint(200, 999)}) {rng.randint(200, 999)}-{rng.randint(0, 9999):04d}",
+            f"{rng.randint(200, 999)}{rng.randint(200, 999)}{rng.randint(0, 9999):04d}" if rng.random() < 0.4 else "",
+            f"{first.lower()}.{last.lower()}{rng.randint(1, 999)}@example.com",
+            f"{rng.randint(1, 9999)} {rng.choice(STREETS)}",
+            city,
+            state,
+            f"{rng.randint(10000, 99999)}",
+        ]))
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def list_page(docs: int) -> bytes:
+    return dumps({
+        "data": [
+            {
+                "id": f"doc-{i:06d}",
+                "fileName": f"leads-{i}.csv",
+                "uploadedByUserId": f"user-{i % 25}",
+                "status": {"stage": "DONE", "lastUpdated": f"2024-01-01T00:{i % 60:02d}:00", "progress": 1.0},
+                "outputFiles": {
+                    "baseFilePath": f"uploads/leads-{i}.csv",
+                    "cleanFilePath": f"results/doc-{i:06d}/leads-{i}-clean.csv",
+                },
+            }
+            for i in range(docs)
+        ],
+        "nextCursor": None,
+    })
+
+
+def best_of(repeat: int, func: Callable[[], object]) -> Tuple[float, object]:
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def compress_all(encoding: str, level: int, data: bytes, chunk_size: int = 1024 * 1024) -> bytes:
+    encoder = compressor(encoding, level)
+    parts = [encoder.compress(data[i:i + chunk_size]) for i in range(0, len(data), chunk_size)]
+    parts.append(encoder.flush())
+    return b"".join(parts)
+
+
+def codec_rows(name: str, data: bytes, levels: dict, repeat: int) -> List[str]:
+    rows = []
+    for encoding in SUPPORTED_ENCODINGS:
+        level = levels[encoding]
+        compress_s, compressed = best_of(repeat, lambda: compress_all(encoding, level, data))
+        decompress_s, restored = best_of(repeat, lambda: decompressor(encoding).decompress(compressed))
+        assert restored == data
+        mb = len(data) / 1e6
+        rows.append(
+            f"{name:<10} {encoding:<5} {level:>5} {len(data) / len(compressed):>7.1f}x "
+            f"{(len(data) - len(compressed)) / 2 ** 20:>10.1f} {mb / compress_s:>12.0f} {mb / decompress_s:>14.0f}"
+        )
+    return rows
+
+
+async def middleware_overhead(body: bytes, requests: int) -> List[str]:
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200,
+                    "headers": [(b"content-type", b"application/json")]})
+        await send({"type": "http.response.body", "body": body})
+
+    wrapped = CompressionMiddleware(app)
+    rows = []
+    for label, accept in [("identity", None)] + [(e, e) for e in SUPPORTED_ENCODINGS]:
+        headers = {"Accept-Encoding": accept} if accept else None
+        started = time.perf_counter()
+        for _ in range(requests):
+            response = await call_asgi(wrapped, "GET", "/", headers)
+        elapsed = (time.perf_counter() - started) / requests
+        rows.append(f"{label:<9} {len(response.body):>10} bytes  {elapsed * 1000:>7.2f} ms/request")
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200_000, help="Rows in the synthetic lead CSV.")
+    parser.add_argument("--docs", type=int, default=1000, help="Documents in the list page.")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--requests", type=int, default=200, help="Requests per coding for the middleware run.")
+    args = parser.parse_args()
+
+    csv_data = lead_csv(args.rows)
+    json_data = list_page(args.docs)
+    if ZSTD not in SUPPORTED_ENCODINGS:
+        print("zstandard is not installed; measuring gzip only.\n")
+
+    print(f"{'payload':<10} {'codec':<5} {'level':>5} {'ratio':>8} {'saved MiB':>10} {'compress MB/s':>12} {'decompress MB/s':>14}")
+    for line in codec_rows(f"csv {len(csv_data) / 2 ** 20:.0f}MiB", csv_data, STORAGE_LEVELS, args.repeat):
+        print(line)
+    for line in codec_rows("list json", json_data, RESPONSE_LEVELS, args.repeat):
+        print(line)
+
+    print(f"\nCompressionMiddleware on a {len(json_data)}-byte list page:")
+    for line in asyncio.run(middleware_overhead(json_data, args.requests)):
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Micro-benchmark for DNC lookups.
+
+Builds an index of random NANP numbers and compares batch lookups against
+a Python set of the same numbers, reporting lookups per second, the index
+file size and the memory the set would need.
+
+    python -m benchmarks.bench_dnc_index [--numbers 5000000] [--batch 100000] [--bloom-bits 10]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from app.scrub.dnc_index import DncIndex, build_index
+
+
+def random_numbers(rng: np.random.Generator, count: int) -> np.ndarray:
+    # Area code and exchange both start with 2-9, as normalize_phones requires.
+    area = rng.integers(200, 1000, count)
+    exchange = rng.integers(200, 1000, count)
+    line = rng.integers(0, 10000, count)
+    return area * 10 ** 7 + exchange * 10 ** 4 + line
+
+
+def best_of(repeat: int, func) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--numbers", type=int, default=5_000_000)
+    parser.add_argument("--batch", type=int, default=100_000, help="Numbers per lookup batch.")
+    parser.add_argument("--hit-rate", type=float, default=0.05, help="Share of looked-up numbers that are listed.")
+    parser.add_argument("--bloom-bits", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    listed = random_numbers(rng, args.numbers)
+    hits = int(args.batch * args.hit_rate)
+    batch = np.concatenate([rng.choice(listed, hits), random_numbers(rng, args.batch - hits)])
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        source = os.path.join(work_dir, "dnc.txt")
+        np.savetxt(source, listed, fmt="%d")
+        output = os.path.join(work_dir, "dnc.idx")
+        started = time.perf_counter()
+        stats = build_index([source], output, bloom_bits=args.bloom_bits)
+        build_s = time.perf_counter() - started
+
+        index = DncIndex(output)
+        index_s = best_of(args.repeat, lambda: index.contains(batch))
+
+        tracemalloc.start()
+        number_set = set(listed.tolist())
+        set_bytes = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        values = batch.tolist()
+        set_s = best_of(args.repeat, lambda: [n in number_set for n in values])
+
+        expected = np.array([n in number_set for n in values])
+        if not np.array_equal(index.contains(batch), expected):
+            sys.exit("Index and set disagree.")
+
+    print(f"{stats['count']} numbers, built in {build_s:.1f} s")
+    print(f"{'index':<6} {stats['bytes'] / 2 ** 20:>9.1f} MiB  {args.batch / index_s / 1e6:>7.2f} M lookups/s")
+    print(f"{'set':<6} {set_bytes / 2 ** 20:>9.1f} MiB  {args.batch / set_s / 1e6:>7.2f} M lookups/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Micro-benchmark for the list-endpoint serialization path.
+
+Compares the original recursive `make_serializable` + `json.dumps` against
+`app.utils.dumps` (orjson) on a synthetic collection shaped like
+`scrubFiles` documents.
+
+    python -m benchmarks.bench_serializer [--docs 10000] [--repeat 5]
+"""
+import argparse
+import json
+import time
+from datetime import datetime, timedelta
+from typing import Any
+
+from google.api_core.datetime_helpers import DatetimeWithNanoseconds
+
+from app.utils import dumps, make_serializable
+
+
+def legacy_make_serializable(obj: Any) -> Any:
+    # The implementation this module replaced, kept here as the baseline.
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    elif hasattr(obj, 'to_dict'):
+        return legacy_make_serializable(obj.to_dict())
+    elif hasattr(obj, 'items'):
+        return {k: legacy_make_serializable(v) for k, v in obj.items()}
+    elif isinstance(obj, list):
+        return [legacy_make_serializable(item) for item in obj]
+    elif isinstance(obj, (int, float, str, bool)) or obj is None:
+        return obj
+    else:
+        try:
+            return obj.isoformat()
+        except AttributeError:
+            return str(obj)
+
+
+def build_documents(count: int) -> list:
+    base = datetime(2024, 1, 1)
+    documents = []
+    for i in range(count):
+        ts = base + timedelta(seconds=i)
+        stamp = DatetimeWithNanoseconds(ts.year, ts.month, ts.day, ts.hour, ts.minute, ts.second, nanosecond=i)
+        documents.append({
+            "id": f"doc-{i:06d}",
+            "fileName": f"upload-{i}.csv",
+            "timestamp": stamp,
+            "uploadedByUserId": f"user-{i % 50}",
+            "uploadedByUserName": "Test User",
+            "status": {"stage": "DONE", "progress": 100, "updatedAt": stamp},
+            "config": {
+                "fileHasHeaderRow": True,
+                "columnAliases": {"phone": ["Phone", "phone_number"], "name": ["Name"]},
+                "scrubOptions": {"dnc": True, "litigator": i % 2 == 0},
+            },
+            "outputFiles": {
+                "cleanFilePath": f"scrubbed/doc-{i:06d}/clean.csv",
+                "invaldFilePath": f"scrubbed/doc-{i:06d}/invalid.csv",
+                "blacklistedFilePath": f"scrubbed/doc-{i:06d}/dnc.csv",
+            },
+            "rowCounts": [1000, 20, 3],
+        })
+    return documents
+
+
+def _best_of(func, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--docs", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    documents = build_documents(args.docs)
+    payload = {"data": documents, "nextCursor": documents[-1]["id"]}
+
+    legacy = json.dumps(legacy_make_serializable(payload)).encode("utf-8")
+    if json.loads(legacy) != json.loads(dumps(payload)):
+        raise SystemExit("Serializers disagree; refusing to report timings.")
+
+    results = {
+        "legacy make_serializable + json.dumps": _best_of(
+            lambda: json.dumps(legacy_make_serializable(payload)).encode("utf-8"), args.repeat),
+        "make_serializable + json.dumps": _best_of(
+            lambda: json.dumps(make_serializable(payload)).encode("utf-8"), args.repeat),
+        "orjson dumps": _best_of(lambda: dumps(payload), args.repeat),
+    }
+    baseline = results["legacy make_serializable + json.dumps"]
+    print(f"{args.docs} documents, {len(legacy)} bytes, best of {args.repeat}")
+    for name, seconds in results.items():
+        print(f"  {name:<40} {seconds * 1000:8.1f} ms  {baseline / seconds:5.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Measures cold-start cost: time to import `app.main`, run the startup
+handlers, and serve the first `/health` response, each in a fresh process.
+
+Clients are built for real from a throwaway service-account key, so
+credential loading and channel setup are included, but nothing is sent
+over the network: the allowlist load at startup is skipped. Calls to
+`google.auth.default` are counted, since on Cloud Run each one is a
+metadata-server round trip this run cannot see.
+
+    python -m benchmarks.cold_start --runs 10
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+import rsa
+
+CHILD = r"""
+import time
+started = time.perf_counter()
+import asyncio, json
+import google.auth
+# Count credential discovery, which costs a metadata-server round trip on Cloud Run.
+lookups = {"count": 0, "seconds": 0.0}
+_default = google.auth.default
+def counting_default(*args, **kwargs):
+    lookup_started = time.perf_counter()
+    try:
+        return _default(*args, **kwargs)
+    finally:
+        lookups["count"] += 1
+        lookups["seconds"] += time.perf_counter() - lookup_started
+google.auth.default = counting_default
+import app.client_allowlist
+# Loading the allowlist is a network call; keep it out of the measurement.
+app.client_allowlist.ClientIdAllowlist.start = lambda self: None
+from benchmarks.asgi import call_asgi
+from app.main import app as application
+imported = time.perf_counter()
+
+async def first_response():
+    await application.router.startup()
+    ready = time.perf_counter()
+    response = await call_asgi(application, "GET", "/health")
+    assert response.status == 200, response.status
+    return ready, time.perf_counter()
+
+ready, responded = asyncio.run(first_response())
+print(json.dumps({
+    "import_ms": (imported - started) * 1000,
+    "startup_ms": (ready - imported) * 1000,
+    "first_response_ms": (responded - started) * 1000,
+    "credential_lookups": lookups["count"],
+    "credential_lookup_ms": lookups["seconds"] * 1000,
+}))
+"""
+
+
+def write_credentials(directory: str) -> str:
+    _, private_key = rsa.newkeys(2048)
+    info = {
+        "type": "service_account",
+        "project_id": "cold-start-benchmark",
+        "private_key_id": "benchmark",
+        "private_key": private_key.save_pkcs1().decode("ascii"),
+        "client_email": "benchmark@cold-start-benchmark.iam.gserviceaccount.com",
+        "client_id": "0",
+        "token_uri": "https://oauth2.googleapis.com/token",
+    }
+    path = os.path.join(directory, "service-account.json")
+    with open(path, "w") as f:
+        json.dump(info, f)
+    return path
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Measure import and time-to-first-response in fresh processes.")
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        env = {
+            **os.environ,
+            "GOOGLE_APPLICATION_CREDENTIALS": write_credentials(directory),
+            "GCP_PROJECT_ID": "cold-start-benchmark",
+            "FIRESTORE_COLLECTION": "scrubFiles",
+            "BUCKET_NAME": "cold-start-benchmark",
+            "PUBSUB_TOPIC": "benchmark",
+            "PYTHONPATH": os.getcwd() + os.pathsep + os.environ.get("PYTHONPATH", ""),
+        }
+        samples = []
+        for _ in range(args.runs):
+            output = subprocess.run(
+                [sys.executable, "-c", CHILD], env=env, check=True, capture_output=True, text=True
+            ).stdout
+            samples.append(json.loads(output.strip().splitlines()[-1]))
+
+    report = {
+        key: {
+            "median": round(statistics.median(s[key] for s in samples), 1),
+            "min": round(min(s[key] for s in samples), 1),
+            "max": round(max(s[key] for s in samples), 1),
+        }
+        for key in samples[0]
+    }
+    print(json.dumps({"runs": args.runs, **report}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,448 @@
+"""
+In-memory stand-ins for the GCP-backed services, with injected latency.
+
+They expose the same methods the routers call on the real services, keep
+their state in one shared `FakeBackend`, and sleep for a simulated round
+trip on every call that would hit the network. `install()` registers them
+in the client registry, so the routers' dependencies resolve to them.
+"""
+import asyncio
+import base64
+import hashlib
+import itertools
+import random
+import threading
+import time
+from concurrent.futures import Future
+from datetime import datetime, timezone
+from typing import AsyncIterator, Dict, Iterator, List, Optional
+
+import google_crc32c
+from fastapi import UploadFile
+
+from app.compression import decompressor
+from app.services.dedup_service import DedupService
+from app.services.storage_service import StorageService
+from app.utils import make_serializable
+
+# Round-trip times in seconds, roughly what Cloud Run sees in-region.
+DEFAULT_LATENCY = {
+    "firestore": 0.008,
+    "storage": 0.025,
+    "pubsub": 0.005,
+}
+DEFAULT_CHUNK_SIZE = 4 * 1024 * 1024
+
+
+class LatencyModel:
+    """
+    Samples a round-trip time per dependency: the configured mean, spread
+    uniformly by +/- `jitter` (a fraction of the mean).
+    """
+
+    def __init__(self, rtts: Optional[Dict[str, float]] = None, jitter: float = 0.25, seed: Optional[int] = None):
+        self.rtts = dict(DEFAULT_LATENCY if rtts is None else rtts)
+        self.jitter = jitter
+        self._random = random.Random(seed)
+
+    def sample(self, dependency: str) -> float:
+        rtt = self.rtts.get(dependency, 0.0)
+        if rtt <= 0:
+            return 0.0
+        return rtt * self._random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def sleep(self, dependency: str) -> None:
+        delay = self.sample(dependency)
+        if delay:
+            time.sleep(delay)
+
+    async def asleep(self, dependency: str) -> None:
+        delay = self.sample(dependency)
+        if delay:
+            await asyncio.sleep(delay)
+
+
+class FakeBlob:
+    def __init__(self, name: str, data: bytes, generation: int, content_type: Optional[str] = None):
+        self.name = name
+        self.data = data
+        self.size = len(data)
+        self.generation = generation
+        self.content_type = content_type
+        self.content_encoding = None
+        self.crc32c = base64.b64encode(google_crc32c.Checksum(data).digest()).decode("ascii")
+        self.updated = datetime.now(timezone.utc)
+
+
+class FakeBackend:
+    """Documents, objects and published messages shared by every fake service."""
+
+    def __init__(self, latency: Optional[LatencyModel] = None):
+        self.latency = latency or LatencyModel()
+        self.documents: Dict[str, dict] = {}
+        self.blobs: Dict[str, FakeBlob] = {}
+        self.published: int = 0
+        # Documents seeded straight into `documents` share the backend's start time.
+        self.update_times: Dict[str, datetime] = {}
+        self.started = datetime.now(timezone.utc)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def next_id(self) -> str:
+        with self._lock:
+            return f"doc-{next(self._ids):08d}"
+
+    def put_blob(self, name: str, data: bytes, content_type: Optional[str] = None) -> FakeBlob:
+        with self._lock:
+            generation = next(self._ids)
+        blob = self.blobs[name] = FakeBlob(name, data, generation, content_type)
+        return blob
+
+    def touch(self, doc_id: str) -> None:
+        self.update_times[doc_id] = datetime.now(timezone.utc)
+
+    def update_time(self, doc_id: str) -> Optional[datetime]:
+        if doc_id not in self.documents:
+            return None
+        return self.update_times.get(doc_id, self.started)
+
+    def project(self, doc_id: str, field_paths: Optional[List[str]] = None) -> Optional[dict]:
+        data = self.documents.get(doc_id)
+        if data is None or not field_paths:
+            return data
+        return {k: v for k, v in data.items() if k in field_paths}
+
+    def query(self, page_size=None, cursor=None, fields=None, uploaded_by_user_id=None, stage=None) -> List[dict]:
+        results = []
+        for doc_id in sorted(self.documents):
+            if cursor and doc_id <= cursor:
+                continue
+            data = self.documents[doc_id]
+            if uploaded_by_user_id is not None and data.get("uploadedByUserId") != uploaded_by_user_id:
+                continue
+            if stage is not None and (data.get("status") or {}).get("stage") != stage:
+                continue
+            if fields:
+                data = {k: v for k, v in data.items() if k in fields}
+            results.append({"id": doc_id, **data})
+            if page_size and len(results) == page_size:
+                break
+        return results
+
+
+backend = FakeBackend()
+
+
+class FakeFirestoreService:
+    def __init__(self, *args, **kwargs):
+        self.backend = backend
+
+    def create_document(self, data: dict) -> str:
+        self.backend.latency.sleep("firestore")
+        doc_id = self.backend.next_id()
+        self.backend.documents[doc_id] = dict(data)
+        self.backend.touch(doc_id)
+        return doc_id
+
+    def create_documents(self, items: List[dict]) -> List[str]:
+        self.backend.latency.sleep("firestore")
+        doc_ids = []
+        for data in items:
+            doc_id = self.backend.next_id()
+            self.backend.documents[doc_id] = dict(data)
+            self.backend.touch(doc_id)
+            doc_ids.append(doc_id)
+        return doc_ids
+
+    def get_document(self, doc_id: str) -> Optional[dict]:
+        self.backend.latency.sleep("firestore")
+        return self.backend.documents.get(doc_id)
+
+    def get_document_with_update_time(self, doc_id: str) -> tuple:
+        self.backend.latency.sleep("firestore")
+        return self.backend.documents.get(doc_id), self.backend.update_time(doc_id)
+
+    def get_update_time(self, doc_id: str) -> Optional[datetime]:
+        self.backend.latency.sleep("firestore")
+        return self.backend.update_time(doc_id)
+
+    def get_documents(self, doc_ids: List[str], field_paths: Optional[List[str]] = None) -> Dict[str, Optional[dict]]:
+        self.backend.latency.sleep("firestore")
+        return {doc_id: self.backend.project(doc_id, field_paths) for doc_id in doc_ids}
+
+    def stream_documents(self, **query_options) -> Iterator[dict]:
+        self.backend.latency.sleep("firestore")
+        yield from self.backend.query(**query_options)
+
+    def list_documents(self, **query_options) -> list:
+        return list(self.stream_documents(**query_options))
+
+    def update_document(self, doc_id: str, data: dict, last_update_time=None) -> bool:
+        self.backend.latency.sleep("firestore")
+        if doc_id not in self.backend.documents:
+            return False
+        self.backend.documents[doc_id].update(data)
+        self.backend.touch(doc_id)
+        return True
+
+    def delete_document(self, doc_id: str, last_update_time=None) -> bool:
+        self.backend.latency.sleep("firestore")
+        return self.backend.documents.pop(doc_id, None) is not None
+
+
+class FakeAsyncFirestoreService:
+    def __init__(self, *args, **kwargs):
+        self.backend = backend
+
+    async def create_document(self, data: dict) -> str:
+        await self.backend.latency.asleep("firestore")
+        doc_id = self.backend.next_id()
+        self.backend.documents[doc_id] = dict(data)
+        self.backend.touch(doc_id)
+        return doc_id
+
+    async def create_documents(self, items: List[dict]) -> List[str]:
+        await self.backend.latency.asleep("firestore")
+        doc_ids = []
+        for data in items:
+            doc_id = self.backend.next_id()
+            self.backend.documents[doc_id] = dict(data)
+            self.backend.touch(doc_id)
+            doc_ids.append(doc_id)
+        return doc_ids
+
+    async def get_document(self, doc_id: str) -> Optional[dict]:
+        await self.backend.latency.asleep("firestore")
+        return self.backend.documents.get(doc_id)
+
+    async def get_document_with_update_time(self, doc_id: str) -> tuple:
+        await self.backend.latency.asleep("firestore")
+        return self.backend.documents.get(doc_id), self.backend.update_time(doc_id)
+
+    async def get_update_time(self, doc_id: str) -> Optional[datetime]:
+        await self.backend.latency.asleep("firestore")
+        return self.backend.update_time(doc_id)
+
+    async def get_documents(self, doc_ids: List[str], field_paths: Optional[List[str]] = None) -> Dict[str, Optional[dict]]:
+        await self.backend.latency.asleep("firestore")
+        return {doc_id: self.backend.project(doc_id, field_paths) for doc_id in doc_ids}
+
+    async def stream_documents(self, **query_options) -> AsyncIterator[dict]:
+        await self.backend.latency.asleep("firestore")
+        for doc in self.backend.query(**query_options):
+            yield doc
+
+    async def list_documents(self, **query_options) -> list:
+        return [doc async for doc in self.stream_documents(**query_options)]
+
+    async def list_documents_with_versions(self, **query_options) -> tuple:
+        documents = await self.list_documents(**query_options)
+        return documents, [(doc["id"], self.backend.update_time(doc["id"])) for doc in documents]
+
+    async def list_versions(self, **query_options) -> list:
+        await self.backend.latency.asleep("firestore")
+        return [(doc["id"], self.backend.update_time(doc["id"])) for doc in self.backend.query(**query_options)]
+
+    async def update_document(self, doc_id: str, data: dict, last_update_time=None) -> bool:
+        await self.backend.latency.asleep("firestore")
+        if doc_id not in self.backend.documents:
+            return False
+        self.backend.documents[doc_id].update(data)
+        self.backend.touch(doc_id)
+        return True
+
+    async def delete_document(self, doc_id: str, last_update_time=None) -> bool:
+        await self.backend.latency.asleep("firestore")
+        return self.backend.documents.pop(doc_id, None) is not None
+
+
+class FakeStorageService:
+    def __init__(self, *args, **kwargs):
+        self.backend = backend
+        self.bucket_name = "fake-bucket"
+        self.download_chunk_size = DEFAULT_CHUNK_SIZE
+        self.signed_url_ttl = 900
+
+    async def upload_stream(self, file: UploadFile, path: str) -> dict:
+        chunks = []
+        while True:
+            chunk = await file.read(DEFAULT_CHUNK_SIZE)
+            if not chunk:
+                break
+            chunks.append(chunk)
+        await self.backend.latency.asleep("storage")
+        blob = self.backend.put_blob(path, b"".join(chunks), file.content_type)
+        return {
+            "path": path,
+            "size": blob.size,
+            "sha256": hashlib.sha256(blob.data).hexdigest(),
+            "stored_size": blob.size,
+            "crc32c": blob.crc32c,
+            "content_encoding": None,
+        }
+
+    async def upload_file(self, file: UploadFile, path: str = None) -> str:
+        path = path or file.filename
+        result = await self.upload_stream(file, path)
+        return result["path"]
+
+    def get_blob(self, path: str) -> Optional[FakeBlob]:
+        self.backend.latency.sleep("storage")
+        return self.backend.blobs.get(path)
+
+    def delete_blob(self, path: str, generation: Optional[int] = None) -> bool:
+        self.backend.latency.sleep("storage")
+        blob = self.backend.blobs.get(path)
+        if blob is None or (generation is not None and blob.generation != generation):
+            return False
+        del self.backend.blobs[path]
+        return True
+
+    def download_range(self, blob: FakeBlob, start: int, end: int) -> bytes:
+        self.backend.latency.sleep("storage")
+        return blob.data[start:end + 1]
+
+    # Same decoding and stored-byte accounting as the real service, over fake ranged reads.
+    read_head = StorageService.read_head
+
+    def iter_download(self, blob: FakeBlob, start: int = 0, end: Optional[int] = None) -> Iterator[bytes]:
+        if end is None:
+            end = blob.size - 1
+        position = start
+        while position <= end:
+            chunk_end = min(position + self.download_chunk_size - 1, end)
+            self.backend.latency.sleep("storage")
+            yield blob.data[position:chunk_end + 1]
+            position = chunk_end + 1
+
+    def iter_decoded(self, blob: FakeBlob) -> Iterator[bytes]:
+        if not blob.content_encoding:
+            yield from self.iter_download(blob)
+            return
+        decoder = decompressor(blob.content_encoding)
+        for chunk in self.iter_download(blob):
+            yield decoder.decompress(chunk)
+
+    def download_file(self, filename: str) -> Optional[bytes]:
+        self.backend.latency.sleep("storage")
+        blob = self.backend.blobs.get(filename)
+        return blob.data if blob else None
+
+    def get_public_url(self, filename: str) -> str:
+        return f"https://storage.googleapis.com/{self.bucket_name}/{filename}"
+
+    def generate_upload_url(self, path: str, content_type: str = "application/octet-stream", expires_in=None) -> str:
+        # Signing with a service-account key is local; no round trip.
+        return f"{self.get_public_url(path)}?X-Goog-Signature=fake"
+
+    def generate_download_url(self, path: str, filename: Optional[str] = None, expires_in=None) -> str:
+        return f"{self.get_public_url(path)}?X-Goog-Signature=fake"
+
+
+class FakePubSubService:
+    def __init__(self, *args, **kwargs):
+        self.backend = backend
+
+    def publish_nowait(self, message) -> Future:
+        # Batched publishes complete in the background; only the ack is simulated.
+        future = Future()
+        delay = self.backend.latency.sample("pubsub")
+        with self.backend._lock:
+            self.backend.published += 1
+            message_id = str(self.backend.published)
+        timer = threading.Timer(delay, future.set_result, args=(message_id,))
+        timer.daemon = True
+        timer.start()
+        return future
+
+    def publish_message(self, message) -> str:
+        return self.publish_nowait(message).result()
+
+    def shutdown(self, timeout: Optional[float] = None) -> None:
+        pass
+
+
+class FakeStatusWatchService:
+    """Delivers each watched document's current status once, like a listener's first snapshot."""
+
+    def __init__(self, *args, **kwargs):
+        self.backend = backend
+
+    def subscribe(self, doc_id: str, queue: asyncio.Queue, loop: asyncio.AbstractEventLoop) -> None:
+        self.backend.latency.sleep("firestore")
+        data = self.backend.documents.get(doc_id)
+        if data is None:
+            event = {"id": doc_id, "exists": False, "status": None}
+        else:
+            event = {"id": doc_id, "exists": True, "status": make_serializable(data.get("status") or {})}
+        loop.call_soon_threadsafe(queue.put_nowait, event)
+
+    def unsubscribe(self, doc_id: str, queue: asyncio.Queue, loop: asyncio.AbstractEventLoop) -> None:
+        pass
+
+    def watched_documents(self) -> int:
+        return 0
+
+    def close(self) -> None:
+        pass
+
+
+class FakeDedupService(DedupService):
+    """The real lookup logic over an in-memory dedup index."""
+
+    def __init__(self, firestore_service):
+        self.backend = backend
+        self.firestore_service = firestore_service
+        self.max_age = 24 * 60 * 60
+        self.entries: Dict[str, dict] = {}
+
+    async def _get_entry(self, key: str) -> Optional[dict]:
+        await self.backend.latency.asleep("firestore")
+        return self.entries.get(key)
+
+    async def _set_entry(self, key: str, entry: dict) -> None:
+        await self.backend.latency.asleep("firestore")
+        self.entries[key] = entry
+
+
+class FakeScrubEngine:
+    """Accepts scrub jobs and completes them at once, without touching the data."""
+
+    def __init__(self):
+        self.submitted: List[str] = []
+
+    def submit(self, doc_id: str) -> Future:
+        self.submitted.append(doc_id)
+        future = Future()
+        future.set_result({})
+        return future
+
+    def close(self) -> None:
+        pass
+
+
+def install(latency: Optional[LatencyModel] = None) -> FakeBackend:
+    """
+    Register the fakes in the client registry in place of the GCP-backed
+    services. The async Storage and Pub/Sub wrappers are kept, so their
+    executor hops are part of what gets measured.
+    """
+    from app.services.pubsub_service import AsyncPubSubService
+    from app.services.registry import registry
+    from app.services.storage_service import AsyncStorageService
+
+    if latency is not None:
+        backend.latency = latency
+    storage_service = FakeStorageService()
+    pubsub_service = FakePubSubService()
+    async_firestore_service = FakeAsyncFirestoreService()
+    registry.register("firestore_service", FakeFirestoreService())
+    registry.register("async_firestore_service", async_firestore_service)
+    registry.register("dedup_service", FakeDedupService(async_firestore_service))
+    registry.register("storage_service", storage_service)
+    registry.register("async_storage_service", AsyncStorageService(storage_service))
+    registry.register("pubsub_service", pubsub_service)
+    registry.register("async_pubsub_service", AsyncPubSubService(pubsub_service))
+    registry.register("status_watch_service", FakeStatusWatchService())
+    registry.register("scrub_engine", FakeScrubEngine())
+    return backend
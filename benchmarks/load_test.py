@@ -0,0 +1,419 @@
+"""
+Load test for the API against in-memory fakes of Firestore, GCS and Pub/Sub.
+
+Every route under /api/v1 plus /health is driven in-process (no sockets, no
+GCP) at each concurrency level, with simulated round trips from
+`benchmarks.fakes.LatencyModel`. Results are written as JSON so CI can keep
+a baseline and fail on regressions:
+
+    python -m benchmarks.load_test --concurrency 1,16,64 --output results.json
+    python -m benchmarks.load_test --baseline baseline.json --tolerance 0.2
+
+Auth is stubbed by overriding `google_auth_dependency`; startup/shutdown
+handlers are not run, so nothing tries to reach Firestore.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import platform
+import resource
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, List
+
+for name, value in {
+    "FIRESTORE_COLLECTION": "scrubFiles",
+    "BUCKET_NAME": "fake-bucket",
+    "GCP_PROJECT_ID": "fake-project",
+    "PUBSUB_TOPIC": "fake-topic",
+    # Queue transfers beyond the admission limits instead of shedding them, so
+    # every level completes; throughput then reflects the limits themselves.
+    "ADMISSION_MAX_QUEUE": "1024",
+    "ADMISSION_QUEUE_TIMEOUT": "60",
+}.items():
+    os.environ.setdefault(name, value)
+
+from benchmarks import fakes
+from benchmarks.asgi import call_asgi, multipart
+
+SEED_DOCUMENTS = 500
+SEED_FILE_SIZE = 256 * 1024
+RANGE_SIZE = 64 * 1024
+BATCH_FILES = 5
+STATUS_BATCH_IDS = 100
+DUPLICATE_MARKER = b"5552345678,Already Scrubbed\n"
+
+
+# --- Scenarios -------------------------------------------------------------
+
+def _item(file_name: str, stage: str = "DONE") -> dict:
+    return {
+        "fileName": file_name,
+        "uploadedByUserId": "bench-user",
+        "phoneColumns": ["phone"],
+        "columnAliases": {"phone": "Phone"},
+        "phoneColumnIndexes": [0],
+        "phoneOrderIndexes": [0],
+        "hasHeaderRow": True,
+        "timestamp": "2024-01-01T00:00:00",
+        "status": {"stage": stage, "lastUpdated": "2024-01-01T00:00:00"},
+        "outputFiles": {},
+    }
+
+
+def _csv(size: int) -> bytes:
+    row = b"5551234567,Jane Doe\n"
+    return b"phone,name\n" + row * (size // len(row))
+
+
+class Scenario:
+    """
+    One route exercised by the load test. `build(i)` returns the i-th request
+    as (method, url, headers, body); `prepare(n)` may seed state for n requests.
+    """
+
+    def __init__(self, name: str, route: str, build: Callable[[int], tuple], expect=(200,), prepare: Callable[[int], None] = None):
+        self.name = name
+        self.route = route
+        self.build = build
+        self.expect = expect
+        self.prepare = prepare
+
+
+def build_scenarios(backend: fakes.FakeBackend) -> List[Scenario]:
+    from app.utils import update_time_etag
+
+    seed_ids = sorted(backend.documents)
+    payload = _csv(SEED_FILE_SIZE)
+    duplicate_payload = _csv(SEED_FILE_SIZE) + DUPLICATE_MARKER
+    item_body = json.dumps(_item("bench.csv")).encode("utf-8")
+    # Finalizing expects the object the client PUT to the signed URL; see seed().
+    signed_item_body = json.dumps(_item("signed.csv", "UPLOADED")).encode("utf-8")
+    json_headers = {"Content-Type": "application/json"}
+    disposable: List[str] = []
+
+    def seed_id(i: int) -> str:
+        return seed_ids[i % len(seed_ids)]
+
+    def clean_etag(doc_id: str) -> str:
+        return f'"{backend.blobs[backend.documents[doc_id]["outputFiles"]["cleanFilePath"]].generation}"'
+
+    def prepare_deletes(n: int) -> None:
+        # Each delete needs a document of its own.
+        disposable[:] = [_seed_disposable(backend) for _ in range(n)]
+
+    def upload(i: int):
+        body, content_type = multipart({}, [("file", f"bench-{i}.csv", payload, "text/csv")])
+        return "POST", "/api/v1/storage/upload", {"Content-Type": content_type}, body
+
+    def scrub_upload(i: int):
+        body, content_type = multipart(
+            {"fileConfig": json.dumps(_item(f"bench-{i}.csv", "UPLOADED"))},
+            [("file", f"bench-{i}.csv", payload, "text/csv")],
+        )
+        return "POST", "/api/v1/scrub-files/upload", {"Content-Type": content_type}, body
+
+    def scrub_upload_duplicate(i: int):
+        # Same content and phone settings as the job seeded by seed_duplicate().
+        body, content_type = multipart(
+            {"fileConfig": json.dumps(_item(f"dup-{i}.csv", "UPLOADED"))},
+            [("file", f"dup-{i}.csv", duplicate_payload, "text/csv")],
+        )
+        return "POST", "/api/v1/scrub-files/upload", {"Content-Type": content_type}, body
+
+    def scrub_upload_batch(i: int):
+        names = [f"bench-{i}-{n}.csv" for n in range(BATCH_FILES)]
+        body, content_type = multipart(
+            {"fileConfigs": json.dumps([_item(name, "UPLOADED") for name in names])},
+            [("files", name, payload, "text/csv") for name in names],
+        )
+        return "POST", "/api/v1/scrub-files/upload-batch", {"Content-Type": content_type}, body
+
+    return [
+        Scenario("health", "/health", lambda i: ("GET", "/health", None, b"")),
+        Scenario("firestore.create", "/api/v1/firestore/create",
+                 lambda i: ("POST", "/api/v1/firestore/create", json_headers, item_body)),
+        Scenario("firestore.get", "/api/v1/firestore/{doc_id}",
+                 lambda i: ("GET", f"/api/v1/firestore/{seed_id(i)}", None, b"")),
+        Scenario("firestore.update", "/api/v1/firestore/{doc_id}",
+                 lambda i: ("PUT", f"/api/v1/firestore/{seed_id(i)}", json_headers, item_body)),
+        Scenario("firestore.delete", "/api/v1/firestore/{doc_id}",
+                 lambda i: ("DELETE", f"/api/v1/firestore/{disposable[i]}", None, b""),
+                 prepare=prepare_deletes),
+        Scenario("pubsub.publish", "/api/v1/pubsub/publish",
+                 lambda i: ("POST", f"/api/v1/pubsub/publish?message=bench-{i}", None, b"")),
+        Scenario("storage.upload", "/api/v1/storage/upload", upload),
+        Scenario("storage.download", "/api/v1/storage/download/{filename}",
+                 lambda i: ("GET", "/api/v1/storage/download/seed.csv", None, b"")),
+        Scenario("scrub.list", "/api/v1/scrub-files/list",
+                 lambda i: ("GET", "/api/v1/scrub-files/list?page_size=100", None, b"")),
+        Scenario("scrub.list_ndjson", "/api/v1/scrub-files/list",
+                 lambda i: ("GET", "/api/v1/scrub-files/list?page_size=100&format=ndjson", None, b"")),
+        Scenario("scrub.upload", "/api/v1/scrub-files/upload", scrub_upload),
+        Scenario("scrub.upload_duplicate", "/api/v1/scrub-files/upload", scrub_upload_duplicate),
+        Scenario("scrub.upload_batch", "/api/v1/scrub-files/upload-batch", scrub_upload_batch),
+        Scenario("scrub.upload_url", "/api/v1/scrub-files/upload-url",
+                 lambda i: ("POST", "/api/v1/scrub-files/upload-url", json_headers,
+                            json.dumps({"fileName": f"bench-{i}.csv", "contentType": "text/csv"}).encode("utf-8"))),
+        Scenario("scrub.upload_finalize", "/api/v1/scrub-files/upload/finalize",
+                 lambda i: ("POST", "/api/v1/scrub-files/upload/finalize", json_headers, signed_item_body)),
+        Scenario("scrub.process", "/api/v1/scrub-files/process/{id}",
+                 lambda i: ("POST", f"/api/v1/scrub-files/process/{seed_id(i)}", None, b""),
+                 expect=(202,)),
+        Scenario("scrub.status", "/api/v1/scrub-files/status/{id}",
+                 lambda i: ("GET", f"/api/v1/scrub-files/status/{seed_id(i)}", None, b"")),
+        Scenario("scrub.status_not_modified", "/api/v1/scrub-files/status/{id}",
+                 lambda i: ("GET", f"/api/v1/scrub-files/status/{seed_id(i)}",
+                            {"If-None-Match": update_time_etag(backend.update_time(seed_id(i)))}, b""),
+                 expect=(304,)),
+        Scenario("scrub.status_events", "/api/v1/scrub-files/status/{id}/events",
+                 lambda i: ("GET", f"/api/v1/scrub-files/status/{seed_id(i)}/events", None, b"")),
+        Scenario("scrub.status_events_multi", "/api/v1/scrub-files/status/events",
+                 lambda i: ("GET", "/api/v1/scrub-files/status/events?ids="
+                            + ",".join(seed_id(i + n) for n in range(5)), None, b"")),
+        Scenario("scrub.status_batch", "/api/v1/scrub-files/status:batch",
+                 lambda i: ("POST", "/api/v1/scrub-files/status:batch", json_headers,
+                            json.dumps({"ids": [seed_id(i + n) for n in range(STATUS_BATCH_IDS)]
+                                        + ["missing-doc"]}).encode("utf-8"))),
+        Scenario("scrub.download", "/api/v1/scrub-files/download/{id}",
+                 lambda i: ("GET", f"/api/v1/scrub-files/download/{seed_id(i)}?file_type=clean", None, b"")),
+        Scenario("scrub.download_range", "/api/v1/scrub-files/download/{id}",
+                 lambda i: ("GET", f"/api/v1/scrub-files/download/{seed_id(i)}?file_type=clean",
+                            {"Range": f"bytes=0-{RANGE_SIZE - 1}"}, b""),
+                 expect=(206,)),
+        Scenario("scrub.download_not_modified", "/api/v1/scrub-files/download/{id}",
+                 lambda i: ("GET", f"/api/v1/scrub-files/download/{seed_id(i)}?file_type=clean",
+                            {"If-None-Match": clean_etag(seed_id(i))}, b""),
+                 expect=(304,)),
+        Scenario("scrub.preview", "/api/v1/scrub-files/preview/{id}",
+                 lambda i: ("GET", f"/api/v1/scrub-files/preview/{seed_id(i)}?file_type=clean&size_kb=16", None, b"")),
+        Scenario("scrub.summary", "/api/v1/scrub-files/summary/{id}",
+                 lambda i: ("GET", f"/api/v1/scrub-files/summary/{seed_id(i)}", None, b"")),
+        Scenario("scrub.download_url", "/api/v1/scrub-files/download-url/{id}",
+                 lambda i: ("GET", f"/api/v1/scrub-files/download-url/{seed_id(i)}?file_type=clean", None, b"")),
+    ]
+
+
+def _seed_disposable(backend: fakes.FakeBackend) -> str:
+    doc_id = backend.next_id()
+    backend.documents[doc_id] = _item("disposable.csv")
+    return doc_id
+
+
+def seed(backend: fakes.FakeBackend, documents: int, file_size: int) -> None:
+    data = _csv(file_size)
+    backend.put_blob("seed.csv", data, "text/csv")
+    backend.put_blob("uploads/signed.csv", data, "text/csv")
+    for n in range(documents):
+        doc_id = backend.next_id()
+        paths = {
+            "baseFilePath": f"uploads/seed-{n}.csv",
+            "cleanFilePath": f"results/{doc_id}/clean.csv",
+            "invaldFilePath": f"results/{doc_id}/invalid.csv",
+            "blacklistedFilePath": f"results/{doc_id}/dnc.csv",
+        }
+        backend.documents[doc_id] = {**_item(f"seed-{n}.csv"), "outputFiles": paths}
+        backend.put_blob(paths["cleanFilePath"], data, "text/csv")
+    seed_duplicate(backend, data + DUPLICATE_MARKER)
+
+
+def seed_duplicate(backend: fakes.FakeBackend, data: bytes) -> None:
+    """A finished job for `data`, indexed so identical uploads reuse it."""
+    from app.models.item import Item
+    from app.services.dedup_service import dedup_key
+    from app.services.registry import registry
+
+    doc_id = backend.next_id()
+    base_path = "uploads/dedup-source.csv"
+    backend.put_blob(base_path, data, "text/csv")
+    backend.documents[doc_id] = {
+        **_item("dedup-source.csv"),
+        "status": {"stage": "DONE", "lastUpdated": datetime.now(timezone.utc)},
+        "outputFiles": {"baseFilePath": base_path, "cleanFilePath": f"results/{doc_id}/clean.csv"},
+    }
+    key = dedup_key(hashlib.sha256(data).hexdigest(), Item(**_item("dedup-source.csv")))
+    registry.dedup_service().entries[key] = {"docId": doc_id}
+
+
+# --- Runner ----------------------------------------------------------------
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes.
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+async def run_scenario(app, scenario: Scenario, concurrency: int, requests: int) -> dict:
+    if scenario.prepare:
+        scenario.prepare(requests)
+    counter = iter(range(requests))
+    latencies: List[float] = []
+    errors: Dict[str, int] = {}
+
+    async def worker():
+        for i in counter:
+            method, url, headers, body = scenario.build(i)
+            started = time.perf_counter()
+            response = await call_asgi(app, method, url, headers, body)
+            latencies.append(time.perf_counter() - started)
+            if response.status not in scenario.expect:
+                errors[str(response.status)] = errors.get(str(response.status), 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "scenario": scenario.name,
+        "route": scenario.route,
+        "concurrency": concurrency,
+        "requests": requests,
+        "errors": errors,
+        "throughput_rps": round(requests / elapsed, 2),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+
+def uncovered_routes(app, scenarios: List[Scenario]) -> List[str]:
+    covered = {scenario.route for scenario in scenarios}
+    return sorted(
+        route.path for route in app.routes
+        if getattr(route, "include_in_schema", False)
+        and (route.path.startswith("/api/v1") or route.path == "/health")
+        and route.path not in covered
+    )
+
+
+def compare(results: List[dict], baseline: dict, tolerance: float) -> List[str]:
+    """List regressions against a previous run: slower p95, lower throughput or more memory."""
+    previous = {(r["scenario"], r["concurrency"]): r for r in baseline.get("results", [])}
+    regressions = []
+    for result in results:
+        base = previous.get((result["scenario"], result["concurrency"]))
+        if base is None:
+            continue
+        label = f'{result["scenario"]} @ c={result["concurrency"]}'
+        if result["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            regressions.append(f'{label}: p95 {base["p95_ms"]} -> {result["p95_ms"]} ms')
+        if result["throughput_rps"] < base["throughput_rps"] * (1 - tolerance):
+            regressions.append(f'{label}: throughput {base["throughput_rps"]} -> {result["throughput_rps"]} rps')
+    base_rss = baseline.get("peak_rss_mb")
+    if base_rss and results and results[-1]["peak_rss_mb"] > base_rss * (1 + tolerance):
+        regressions.append(f'peak RSS {base_rss} -> {results[-1]["peak_rss_mb"]} MB')
+    return regressions
+
+
+def parse_latency(spec: str) -> Dict[str, float]:
+    """Parse `firestore=0.008,storage=0.025` (seconds) over the defaults."""
+    rtts = dict(fakes.DEFAULT_LATENCY)
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        name, _, value = part.partition("=")
+        rtts[name.strip()] = float(value)
+    return rtts
+
+
+async def main_async(args) -> int:
+    latency = fakes.LatencyModel(
+        {} if args.no_latency else parse_latency(args.latency), jitter=args.jitter, seed=args.seed
+    )
+    backend = fakes.install(latency)
+
+    from app.main import app
+    from app.auth_google import google_auth_dependency
+    from app.models.claims import GoogleClaims
+
+    logging.getLogger().setLevel(args.log_level)
+    claims = GoogleClaims(iss="https://accounts.google.com", aud="benchmark", sub="bench-user")
+    app.dependency_overrides[google_auth_dependency] = lambda: claims
+
+    seed(backend, SEED_DOCUMENTS, SEED_FILE_SIZE)
+    scenarios = build_scenarios(backend)
+    if args.only:
+        wanted = set(args.only.split(","))
+        scenarios = [s for s in scenarios if s.name in wanted]
+    missing = uncovered_routes(app, scenarios) if not args.only else []
+    if missing:
+        print(f"warning: routes without a scenario: {', '.join(missing)}", file=sys.stderr)
+
+    levels = [int(c) for c in args.concurrency.split(",")]
+    results = []
+    for scenario in scenarios:
+        for concurrency in levels:
+            # Warm up imports, caches and the thread pools before measuring.
+            await run_scenario(app, scenario, concurrency, min(args.requests, concurrency))
+            result = await run_scenario(app, scenario, concurrency, args.requests)
+            results.append(result)
+            print(
+                f'{result["scenario"]:<28} c={concurrency:<4} {result["throughput_rps"]:>9.1f} rps  '
+                f'p50 {result["p50_ms"]:>8.2f}  p95 {result["p95_ms"]:>8.2f}  p99 {result["p99_ms"]:>8.2f} ms'
+                + (f'  errors {result["errors"]}' if result["errors"] else ""),
+                file=sys.stderr,
+            )
+
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "latency": latency.rtts,
+            "jitter": latency.jitter,
+            "requests": args.requests,
+            "concurrency": levels,
+        },
+        "results": results,
+        "uncovered_routes": missing,
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+    status = 0
+    if any(result["errors"] for result in results):
+        print("error: some requests returned unexpected status codes", file=sys.stderr)
+        status = 1
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"regression: {regression}", file=sys.stderr)
+        if regressions:
+            status = 1
+    return status
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load test the API against in-memory GCP fakes.")
+    parser.add_argument("--concurrency", default="1,16,64", help="Comma-separated concurrency levels.")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per scenario and level.")
+    parser.add_argument("--latency", default="", help="Round trips in seconds, e.g. firestore=0.008,storage=0.025.")
+    parser.add_argument("--no-latency", action="store_true", help="Measure pure in-process overhead.")
+    parser.add_argument("--jitter", type=float, default=0.25, help="Latency spread as a fraction of the mean.")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed for latency sampling.")
+    parser.add_argument("--only", help="Comma-separated scenario names to run.")
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout.")
+    parser.add_argument("--baseline", help="Previous JSON report to compare against.")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative regression.")
+    parser.add_argument("--log-level", default="WARNING")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(main_async(args)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""Shared fixtures: the app wired to fresh in-memory fakes, and an in-process client for it."""
+import asyncio
+import os
+
+import pytest
+
+for name, value in {
+    "FIRESTORE_COLLECTION": "scrubFiles",
+    "BUCKET_NAME": "fake-bucket",
+    "GCP_PROJECT_ID": "fake-project",
+    "PUBSUB_TOPIC": "fake-topic",
+}.items():
+    os.environ.setdefault(name, value)
+
+from benchmarks import fakes
+from benchmarks.asgi import call_asgi
+
+
+@pytest.fixture
+def backend() -> fakes.FakeBackend:
+    """Empty fake Firestore/GCS/Pub/Sub state with no simulated latency, installed in the registry."""
+    fakes.backend = fakes.FakeBackend(fakes.LatencyModel({}))
+    return fakes.install()
+
+
+@pytest.fixture
+def app(backend):
+    from app.main import app
+    from app.auth_google import google_auth_dependency
+    from app.models.claims import GoogleClaims
+
+    claims = GoogleClaims(iss="https://accounts.google.com", aud="test", sub="test-user")
+
+    async def authenticated():
+        return claims
+
+    app.dependency_overrides[google_auth_dependency] = authenticated
+    yield app
+    app.dependency_overrides.pop(google_auth_dependency, None)
+
+
+@pytest.fixture
+def client(app):
+    """`client(method, url, headers=None, body=b"")` sends one request and returns the whole response."""
+
+    def send(method: str, url: str, headers: dict = None, body: bytes = b""):
+        return asyncio.run(call_asgi(app, method, url, headers, body))
+
+    return send
@@ -0,0 +1,191 @@
+"""AdmissionController with small limits, and the 429s AdmissionMiddleware turns its rejections into."""
+import asyncio
+import json
+
+import pytest
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+
+from app.admission import DOWNLOAD, UPLOAD, AdmissionController, AdmissionMiddleware, Rejected, admission_class
+from benchmarks.asgi import call_asgi
+
+
+def _controller(**kwargs) -> AdmissionController:
+    settings = {
+        "budget": 1000,
+        "limits": {UPLOAD: 1, DOWNLOAD: 4},
+        "max_per_user": 4,
+        "max_queue": 4,
+        "queue_timeout": 5.0,
+        **kwargs,
+    }
+    return AdmissionController(**settings)
+
+
+async def _settle() -> None:
+    """Let queued tasks run up to their next wait."""
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def _assert_idle(controller: AdmissionController) -> None:
+    assert controller.reserved == 0
+    assert not any(controller.in_flight.values())
+    assert not controller.per_user
+    assert not controller._waiters
+
+
+def test_full_queue_is_rejected():
+    async def scenario():
+        controller = _controller(max_queue=1)
+        await controller.acquire(UPLOAD, "a", 10)
+        queued = asyncio.ensure_future(controller.acquire(UPLOAD, "b", 10))
+        await _settle()
+
+        with pytest.raises(Rejected) as error:
+            await controller.acquire(UPLOAD, "c", 10)
+
+        assert error.value.reason == "queue_full"
+        queued.cancel()
+        await asyncio.gather(queued, return_exceptions=True)
+
+    asyncio.run(scenario())
+
+
+def test_wait_past_the_timeout_is_rejected():
+    async def scenario():
+        controller = _controller(queue_timeout=0.05)
+        reserved = await controller.acquire(UPLOAD, "a", 10)
+
+        with pytest.raises(Rejected) as error:
+            await controller.acquire(UPLOAD, "b", 10)
+
+        assert error.value.reason == "timeout"
+        assert not controller._waiters
+        controller.release(UPLOAD, "a", reserved)
+        _assert_idle(controller)
+
+    asyncio.run(scenario())
+
+
+def test_user_over_its_share_lets_another_user_ahead():
+    async def scenario():
+        controller = _controller(limits={UPLOAD: 4})
+        await controller.acquire(UPLOAD, "a", 10)
+        await controller.acquire(UPLOAD, "b", 10)
+        # Two active users split the limit of 4: "a" may have 2 in flight.
+        await controller.acquire(UPLOAD, "a", 10)
+        third_of_a = asyncio.ensure_future(controller.acquire(UPLOAD, "a", 10))
+        await _settle()
+        assert not third_of_a.done()
+
+        # Queued behind "a", but "a" is only held back by its share.
+        await asyncio.wait_for(controller.acquire(UPLOAD, "b", 10), 1)
+        assert controller.per_user == {(UPLOAD, "a"): 2, (UPLOAD, "b"): 2}
+        assert not third_of_a.done()
+
+        # With "b" gone, "a" has the whole class limit to itself.
+        controller.release(UPLOAD, "b", 10)
+        controller.release(UPLOAD, "b", 10)
+        assert await asyncio.wait_for(third_of_a, 1) == 10
+        assert controller.per_user == {(UPLOAD, "a"): 3}
+
+    asyncio.run(scenario())
+
+
+def test_upload_over_the_budget_holds_back_later_uploads():
+    async def scenario():
+        controller = _controller(budget=100, limits={UPLOAD: 4, DOWNLOAD: 4})
+        await controller.acquire(UPLOAD, "a", 60)
+        large = asyncio.ensure_future(controller.acquire(UPLOAD, "b", 60))
+        small = asyncio.ensure_future(controller.acquire(UPLOAD, "c", 10))
+        await _settle()
+
+        # The small upload would fit the budget, but must not overtake the large one.
+        assert not large.done()
+        assert not small.done()
+        # Downloads are a class of their own and are not held back.
+        assert await asyncio.wait_for(controller.acquire(DOWNLOAD, "d", 10), 1) == 10
+
+        controller.release(UPLOAD, "a", 60)
+        assert await asyncio.wait_for(large, 1) == 60
+        assert await asyncio.wait_for(small, 1) == 10
+        assert controller.reserved == 80
+
+    asyncio.run(scenario())
+
+
+def test_waiter_cancelled_after_admission_returns_its_slot():
+    async def scenario():
+        controller = _controller()
+        await controller.acquire(UPLOAD, "a", 10)
+        waiting = asyncio.ensure_future(controller.acquire(UPLOAD, "b", 20))
+        await _settle()
+
+        # Admitted by the release, then cancelled before it gets to run.
+        controller.release(UPLOAD, "a", 10)
+        assert controller.per_user == {(UPLOAD, "b"): 1}
+        waiting.cancel()
+
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        _assert_idle(controller)
+
+    asyncio.run(scenario())
+
+
+def test_waiter_cancelled_in_the_queue_leaves_it():
+    async def scenario():
+        controller = _controller()
+        await controller.acquire(UPLOAD, "a", 10)
+        waiting = asyncio.ensure_future(controller.acquire(UPLOAD, "b", 20))
+        await _settle()
+
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+
+        assert not controller._waiters
+        controller.release(UPLOAD, "a", 10)
+        _assert_idle(controller)
+
+    asyncio.run(scenario())
+
+
+@admission_class(UPLOAD)
+async def _upload(request):
+    await request.app.state.proceed.wait()
+    return PlainTextResponse("stored")
+
+
+def _app(controller: AdmissionController) -> Starlette:
+    app = Starlette(
+        routes=[Route("/upload", _upload, methods=["POST"])],
+        middleware=[Middleware(AdmissionMiddleware, controller=controller, retry_after=7)],
+    )
+    app.state.proceed = asyncio.Event()
+    return app
+
+
+@pytest.mark.parametrize("settings", [{"max_queue": 0}, {"queue_timeout": 0.05}])
+def test_middleware_answers_rejections_with_429(settings):
+    async def scenario():
+        controller = _controller(**settings)
+        app = _app(controller)
+        first = asyncio.ensure_future(call_asgi(app, "POST", "/upload", {"Content-Length": "3"}, b"abc"))
+        await _settle()
+
+        rejected = await call_asgi(app, "POST", "/upload", {"Content-Length": "3"}, b"abc")
+
+        app.state.proceed.set()
+        assert (await first).status == 200
+        _assert_idle(controller)
+        return rejected
+
+    response = asyncio.run(scenario())
+
+    assert response.status == 429
+    assert dict(response.headers)[b"retry-after"] == b"7"
+    assert json.loads(response.body) == {"detail": "Too many concurrent transfers; retry later."}
@@ -0,0 +1,195 @@
+"""If-None-Match / If-Modified-Since / If-Range on status, list and download, against the fakes."""
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import pytest
+
+from app.services.registry import registry
+
+DATA = b"phone\n" + b"5552341234\n" * 100
+
+
+@pytest.fixture
+def reads(backend, monkeypatch):
+    """Counts the calls that read document contents or object bytes."""
+    counts = {"document": 0, "list": 0, "object": 0}
+    firestore_service = registry.async_firestore_service()
+    storage_service = registry.storage_service()
+
+    def counting(service, method: str, key: str):
+        original = getattr(service, method)
+
+        def wrapper(*args, **kwargs):
+            counts[key] += 1
+            return original(*args, **kwargs)
+
+        monkeypatch.setattr(service, method, wrapper)
+
+    counting(firestore_service, "get_document_with_update_time", "document")
+    counting(firestore_service, "list_documents_with_versions", "list")
+    counting(storage_service, "iter_download", "object")
+    counting(storage_service, "iter_decoded", "object")
+    return counts
+
+
+def _job(backend, data: bytes = DATA) -> str:
+    doc_id = backend.next_id()
+    path = f"results/{doc_id}/leads-clean.csv"
+    backend.documents[doc_id] = {
+        "fileName": "leads.csv",
+        "status": {"stage": "DONE"},
+        "outputFiles": {"cleanFilePath": path},
+    }
+    backend.put_blob(path, data, "text/csv")
+    return doc_id
+
+
+def _headers(response) -> dict:
+    return {name.decode("latin-1"): value.decode("latin-1") for name, value in response.headers}
+
+
+def _status_url(doc_id: str) -> str:
+    return f"/api/v1/scrub-files/status/{doc_id}"
+
+
+def _download_url(doc_id: str) -> str:
+    return f"/api/v1/scrub-files/download/{doc_id}?file_type=clean"
+
+
+LIST_URL = "/api/v1/scrub-files/list"
+
+# How a client may echo the ETag it got back: as is, weakened, or in a list.
+IF_NONE_MATCH_FORMS = [
+    lambda etag: etag,
+    lambda etag: f"W/{etag.removeprefix('W/')}",
+    lambda etag: etag.removeprefix("W/"),
+    lambda etag: f'"stale", {etag}',
+    lambda etag: f'W/"stale",W/{etag.removeprefix("W/")}',
+]
+
+
+@pytest.mark.parametrize("if_none_match", IF_NONE_MATCH_FORMS)
+def test_status_not_modified_without_reading_the_document(backend, client, reads, if_none_match):
+    doc_id = _job(backend)
+    etag = _headers(client("GET", _status_url(doc_id)))["etag"]
+    assert reads["document"] == 1
+
+    response = client("GET", _status_url(doc_id), {"If-None-Match": if_none_match(etag)})
+
+    assert response.status == 304
+    assert response.body == b""
+    assert _headers(response)["etag"] == etag
+    assert reads["document"] == 1
+
+
+@pytest.mark.parametrize("if_none_match", IF_NONE_MATCH_FORMS)
+def test_list_not_modified_without_reading_the_documents(backend, client, reads, if_none_match):
+    _job(backend)
+    _job(backend)
+    etag = _headers(client("GET", LIST_URL))["etag"]
+    assert etag.startswith('W/"')
+    assert reads["list"] == 1
+
+    response = client("GET", LIST_URL, {"If-None-Match": if_none_match(etag)})
+
+    assert response.status == 304
+    assert response.body == b""
+    assert reads["list"] == 1
+
+
+@pytest.mark.parametrize("if_none_match", IF_NONE_MATCH_FORMS)
+def test_download_not_modified_without_reading_the_object(backend, client, reads, if_none_match):
+    doc_id = _job(backend)
+    etag = _headers(client("GET", _download_url(doc_id)))["etag"]
+    assert reads["object"] == 1
+
+    response = client("GET", _download_url(doc_id), {"If-None-Match": if_none_match(etag)})
+
+    assert response.status == 304
+    assert response.body == b""
+    assert reads["object"] == 1
+
+
+def test_if_none_match_of_another_version_sends_the_status(backend, client, reads):
+    doc_id = _job(backend)
+
+    response = client("GET", _status_url(doc_id), {"If-None-Match": '"1", W/"2"'})
+
+    assert response.status == 200
+    assert reads["document"] == 1
+
+
+def test_if_modified_since_compares_whole_seconds(backend, client, reads):
+    doc_id = _job(backend)
+    backend.update_times[doc_id] = datetime(2024, 5, 1, 12, 30, 15, 750_000, tzinfo=timezone.utc)
+    last_modified = _headers(client("GET", _status_url(doc_id)))["last-modified"]
+    assert last_modified == "Wed, 01 May 2024 12:30:15 GMT"
+
+    # Same second as the update, which Last-Modified cannot resolve any finer.
+    response = client("GET", _status_url(doc_id), {"If-Modified-Since": last_modified})
+    assert response.status == 304
+
+    earlier = format_datetime(datetime(2024, 5, 1, 12, 30, 14, tzinfo=timezone.utc), usegmt=True)
+    response = client("GET", _status_url(doc_id), {"If-Modified-Since": earlier})
+    assert response.status == 200
+
+
+def test_download_if_modified_since_its_last_modified(backend, client, reads):
+    doc_id = _job(backend)
+    backend.blobs[f"results/{doc_id}/leads-clean.csv"].updated = datetime(
+        2024, 5, 1, 12, 30, 15, 999_999, tzinfo=timezone.utc
+    )
+    last_modified = _headers(client("GET", _download_url(doc_id)))["last-modified"]
+
+    response = client("GET", _download_url(doc_id), {"If-Modified-Since": last_modified})
+
+    assert response.status == 304
+    assert reads["object"] == 1
+
+
+def test_if_range_of_the_current_version_sends_the_range(backend, client):
+    doc_id = _job(backend)
+    etag = _headers(client("GET", _download_url(doc_id)))["etag"]
+
+    response = client("GET", _download_url(doc_id), {"Range": "bytes=0-9", "If-Range": etag})
+
+    assert response.status == 206
+    assert response.body == DATA[:10]
+
+
+def test_stale_if_range_sends_the_whole_new_version(backend, client):
+    doc_id = _job(backend)
+    path = f"results/{doc_id}/leads-clean.csv"
+    old = _headers(client("GET", _download_url(doc_id)))
+    replaced = b"phone\n" + b"5552349999\n" * 100
+    backend.put_blob(path, replaced, "text/csv")
+    backend.blobs[path].updated += timedelta(seconds=5)
+
+    for if_range in (old["etag"], old["last-modified"]):
+        response = client("GET", _download_url(doc_id), {"Range": "bytes=10-", "If-Range": if_range})
+
+        assert response.status == 200
+        assert response.body == replaced
+        assert "content-range" not in _headers(response)
+
+
+def test_weak_if_range_never_matches(backend, client):
+    doc_id = _job(backend)
+    etag = _headers(client("GET", _download_url(doc_id)))["etag"]
+
+    response = client("GET", _download_url(doc_id), {"Range": "bytes=0-9", "If-Range": f"W/{etag}"})
+
+    assert response.status == 200
+    assert response.body == DATA
+
+
+def test_list_etag_changes_with_one_update_time(backend, client, reads):
+    doc_ids = [_job(backend) for _ in range(3)]
+    etag = _headers(client("GET", LIST_URL))["etag"]
+
+    backend.update_times[doc_ids[1]] = backend.update_time(doc_ids[1]) + timedelta(microseconds=1)
+    response = client("GET", LIST_URL, {"If-None-Match": etag})
+
+    assert response.status == 200
+    assert _headers(response)["etag"] != etag
+    assert reads["list"] == 2
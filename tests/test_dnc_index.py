@@ -0,0 +1,166 @@
+"""DNC index files and DncIndexManager's version swaps while jobs are running."""
+import os
+import shutil
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from app.scrub.dnc_index import DncIndex, build_index
+from app.scrub.dnc_manager import DncIndexManager
+from app.scrub.phones import normalize_phones
+
+
+def _build(tmp_path, name: str, lines, bloom_bits: int = 10) -> str:
+    source = tmp_path / f"{name}.txt"
+    source.write_text("\n".join(lines) + "\n")
+    output = str(tmp_path / f"{name}.idx")
+    build_index([str(source)], output, bloom_bits=bloom_bits, partitions=4)
+    return output
+
+
+@pytest.mark.parametrize("bloom_bits", [0, 10])
+def test_build_index_deduplicates_and_skips_invalid_lines(tmp_path, bloom_bits):
+    source = tmp_path / "dnc.txt"
+    source.write_text("555-234-0000\n(555) 234-7777\n1 555 234 0000\nnot a phone\n9999999999\n")
+    output = str(tmp_path / "dnc.idx")
+
+    stats = build_index([str(source)], output, bloom_bits=bloom_bits, partitions=4)
+
+    assert stats["read"] == 4
+    assert stats["count"] == 3
+    assert stats["bloom_hashes"] == (7 if bloom_bits else 0)
+    assert stats["bytes"] == os.path.getsize(output)
+    index = DncIndex(output)
+    assert len(index) == 3
+    assert (index.bloom is not None) == bool(bloom_bits)
+
+
+@pytest.mark.parametrize("bloom_bits", [0, 10])
+def test_contains_checks_a_whole_batch(tmp_path, bloom_bits):
+    rng = np.random.default_rng(7)
+    # Valid NANP numbers: area code and exchange start with 2-9.
+    listed = np.unique(
+        rng.integers(200, 1000, 5_000) * 10 ** 7 + rng.integers(200, 1000, 5_000) * 10 ** 4
+        + rng.integers(0, 10_000, 5_000)
+    )
+    index = DncIndex(_build(tmp_path, "dnc", [str(number) for number in listed], bloom_bits))
+    absent = np.setdiff1d(listed + 1, listed)
+    queries = np.concatenate([listed, absent, normalize_phones(["bad", "", "555-234-000"])])
+
+    result = index.contains(queries)
+
+    assert result[:len(listed)].all()
+    assert not result[len(listed):].any()
+
+
+def test_contains_on_an_empty_index(tmp_path):
+    index = DncIndex(_build(tmp_path, "empty", ["not a phone"]))
+
+    assert len(index) == 0
+    assert not index.contains(np.array([5552340000, -1])).any()
+
+
+def test_index_rejects_other_files(tmp_path):
+    path = tmp_path / "dnc.idx"
+    path.write_bytes(b"5552340000\n" * 10)
+
+    with pytest.raises(ValueError):
+        DncIndex(str(path))
+
+
+class FakeIndexStorage:
+    """Serves index builds as successive generations of one object."""
+
+    def __init__(self):
+        self.blob = None
+        self.builds = {}
+        self.downloads = 0
+
+    def publish(self, path: str) -> None:
+        generation = len(self.builds) + 1
+        self.builds[generation] = path
+        self.blob = SimpleNamespace(generation=generation)
+
+    def get_blob(self, path: str):
+        return self.blob
+
+    def download_to_filename(self, blob, filename: str) -> None:
+        self.downloads += 1
+        shutil.copyfile(self.builds[blob.generation], filename)
+
+
+@pytest.fixture
+def builds(tmp_path):
+    return [_build(tmp_path, f"dnc-build-{n}", [f"555234{n:04d}"]) for n in range(3)]
+
+
+@pytest.fixture
+def manager(monkeypatch, tmp_path):
+    monkeypatch.setenv("DNC_INDEX_BLOB", "dnc/dnc.idx")
+    monkeypatch.setenv("DNC_INDEX_DIR", str(tmp_path / "cache"))
+    monkeypatch.setenv("DNC_INDEX_REFRESH_INTERVAL", "0")
+    return DncIndexManager(FakeIndexStorage())
+
+
+def _cached(manager) -> set:
+    return set(os.listdir(manager.cache_dir))
+
+
+def test_job_keeps_its_version_across_a_swap(manager, builds):
+    manager.storage_service.publish(builds[0])
+
+    with manager.pinned() as first:
+        manager.storage_service.publish(builds[1])
+        with manager.pinned() as second:
+            assert second != first
+        # A worker opening the old version only now still finds it.
+        assert DncIndex(first).contains(np.array([5552340000, 5552340001])).tolist() == [True, False]
+
+    assert _cached(manager) == {os.path.basename(second)}
+    with manager.pinned() as third:
+        assert third == second
+    assert manager.storage_service.downloads == 2
+
+
+def test_versions_on_disk_are_bounded(manager, builds):
+    manager.max_versions = 2
+    storage = manager.storage_service
+    storage.publish(builds[0])
+
+    with manager.pinned() as first:
+        storage.publish(builds[1])
+        with manager.pinned() as second:
+            storage.publish(builds[2])
+            # Both versions on disk are in use: generation 3 has to wait.
+            with manager.pinned() as waiting:
+                assert waiting == second
+            assert _cached(manager) == {os.path.basename(first), os.path.basename(second)}
+
+    with manager.pinned() as third:
+        assert third not in (first, second)
+        assert _cached(manager) == {os.path.basename(third)}
+
+
+def test_failed_refresh_keeps_the_current_version(manager, builds):
+    manager.storage_service.publish(builds[0])
+    with manager.pinned() as first:
+        pass
+
+    def unreachable(path):
+        raise ConnectionError("storage unreachable")
+
+    manager.storage_service.get_blob = unreachable
+    with manager.pinned() as path:
+        assert path == first
+        assert os.path.exists(path)
+
+
+def test_local_index_is_used_as_is(monkeypatch, builds):
+    monkeypatch.delenv("DNC_INDEX_BLOB", raising=False)
+    monkeypatch.setenv("DNC_LIST_FILE", builds[0])
+    manager = DncIndexManager(FakeIndexStorage())
+
+    with manager.pinned() as path:
+        assert path == builds[0]
+    assert os.path.exists(builds[0])
@@ -0,0 +1,109 @@
+"""Single byte ranges: `parse_byte_range` and resumable result downloads."""
+import pytest
+
+from app.utils import parse_byte_range
+
+DATA = bytes(range(256)) * 40  # 10240 bytes
+
+
+def _job(backend, data: bytes = DATA) -> str:
+    """A finished scrub job whose clean output holds `data`."""
+    doc_id = backend.next_id()
+    path = f"results/{doc_id}/leads-clean.csv"
+    backend.documents[doc_id] = {
+        "fileName": "leads.csv",
+        "status": {"stage": "DONE"},
+        "outputFiles": {"cleanFilePath": path},
+    }
+    backend.put_blob(path, data, "text/csv")
+    return doc_id
+
+
+def _download(client, doc_id: str, headers: dict = None):
+    return client("GET", f"/api/v1/scrub-files/download/{doc_id}?file_type=clean", headers)
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("bytes=0-", (0, 99)),
+    ("bytes=10-19", (10, 19)),
+    ("bytes=90-500", (90, 99)),
+    ("bytes=-10", (90, 99)),
+    ("bytes=-500", (0, 99)),
+    (" BYTES = 5 - 6 ", (5, 6)),
+])
+def test_parse_byte_range_satisfiable(header, expected):
+    assert parse_byte_range(header, 100) == expected
+
+
+@pytest.mark.parametrize("header", [
+    None,
+    "",
+    "bytes=5-3",
+    "bytes=0-1,5-6",
+    "items=0-1",
+    "bytes=",
+    "bytes=-",
+    "bytes=a-b",
+    "bytes=5",
+])
+def test_parse_byte_range_falls_back_to_full_content(header):
+    assert parse_byte_range(header, 100) is None
+
+
+@pytest.mark.parametrize("header, size", [
+    ("bytes=100-", 100),
+    ("bytes=150-200", 100),
+    ("bytes=-0", 100),
+    ("bytes=0-", 0),
+])
+def test_parse_byte_range_unsatisfiable(header, size):
+    with pytest.raises(ValueError):
+        parse_byte_range(header, size)
+
+
+def test_download_without_range_sends_everything(backend, client):
+    response = _download(client, _job(backend))
+
+    headers = dict(response.headers)
+    assert response.status == 200
+    assert response.body == DATA
+    assert headers[b"accept-ranges"] == b"bytes"
+    assert headers[b"content-length"] == str(len(DATA)).encode()
+    assert b"content-range" not in headers
+
+
+@pytest.mark.parametrize("header, start, end", [
+    ("bytes=100-199", 100, 199),
+    ("bytes=10000-", 10000, len(DATA) - 1),
+    ("bytes=-40", len(DATA) - 40, len(DATA) - 1),
+])
+def test_download_range_sends_partial_content(backend, client, header, start, end):
+    response = _download(client, _job(backend), {"Range": header})
+
+    headers = dict(response.headers)
+    assert response.status == 206
+    assert response.body == DATA[start:end + 1]
+    assert headers[b"content-range"] == f"bytes {start}-{end}/{len(DATA)}".encode()
+    assert headers[b"content-length"] == str(end - start + 1).encode()
+
+
+@pytest.mark.parametrize("header", ["bytes=5-3", "bytes=0-9,20-29"])
+def test_download_unsupported_range_sends_everything(backend, client, header):
+    response = _download(client, _job(backend), {"Range": header})
+
+    assert response.status == 200
+    assert response.body == DATA
+
+
+def test_download_range_past_the_end_is_416(backend, client):
+    response = _download(client, _job(backend), {"Range": f"bytes={len(DATA)}-"})
+
+    assert response.status == 416
+    assert dict(response.headers)[b"content-range"] == f"bytes */{len(DATA)}".encode()
+
+
+def test_download_range_of_empty_object_is_416(backend, client):
+    response = _download(client, _job(backend, b""), {"Range": "bytes=0-"})
+
+    assert response.status == 416
+    assert dict(response.headers)[b"content-range"] == b"bytes */0"
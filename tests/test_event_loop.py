@@ -0,0 +1,113 @@
+"""
+Concurrency check for the async service layer: uploads and downloads run
+against the local fakes, whose blocking calls sleep for a simulated round
+trip, while a ticker measures how late the event loop wakes it. A blocking
+call made on the loop shows up as lag of at least one round trip.
+
+Files are kept small: multipart parsing is CPU work on the loop, bounded
+by the size of each received body chunk, and is not what is checked here.
+"""
+import asyncio
+import gc
+import json
+import time
+
+from benchmarks import load_test
+from benchmarks import fakes
+from benchmarks.asgi import call_asgi, multipart
+
+ROUND_TRIP = 0.5
+# Under one round trip, with room for the GIL hand-offs between the worker threads.
+MAX_LAG = ROUND_TRIP * 0.6
+TICK = 0.005
+REQUESTS = 32
+FILE_SIZE = 4 * 1024
+
+
+async def _measure_lag(stop: asyncio.Event) -> float:
+    """Largest delay past a `TICK` sleep seen until `stop` is set."""
+    worst = 0.0
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(TICK)
+        worst = max(worst, time.perf_counter() - started - TICK)
+    return worst
+
+
+def _upload(i: int) -> tuple:
+    data = load_test._csv(FILE_SIZE) + f"555234{i:04d},Row {i}\n".encode("utf-8")
+    body, content_type = multipart(
+        {"fileConfig": json.dumps(load_test._item(f"loop-{i}.csv", "UPLOADED"))},
+        [("file", f"loop-{i}.csv", data, "text/csv")],
+    )
+    return "POST", "/api/v1/scrub-files/upload", {"Content-Type": content_type}, body
+
+
+def _from_client(request: tuple, i: int) -> tuple:
+    """`request` sent from a client of its own, so admission's per-user share does not serialize them."""
+    method, url, headers, body = request
+    return method, url, {**(headers or {}), "X-Forwarded-For": f"10.0.{i // 256}.{i % 256}"}, body
+
+
+async def _run(app, warm_up, requests):
+    """Send `warm_up`, then `requests` while measuring event-loop lag."""
+    # Worker threads start on first use, which waits on them from the loop.
+    await asyncio.gather(*(call_asgi(app, *request) for request in warm_up))
+    # A full collection over the test session's heap pauses the whole process,
+    # which is not a blocking call; keep the collector out of the measured round.
+    gc.collect()
+    gc.freeze()
+    gc.disable()
+    try:
+        stop = asyncio.Event()
+        monitor = asyncio.ensure_future(_measure_lag(stop))
+        # Let the ticker settle before the load starts.
+        await asyncio.sleep(TICK * 4)
+        started = time.perf_counter()
+        responses = await asyncio.gather(*(call_asgi(app, *request) for request in requests))
+        elapsed = time.perf_counter() - started
+        stop.set()
+        lag = await monitor
+    finally:
+        gc.enable()
+        gc.unfreeze()
+    return responses, elapsed, lag
+
+
+def test_uploads_and_downloads_never_block_the_event_loop():
+    backend = fakes.install(fakes.LatencyModel(
+        {"firestore": ROUND_TRIP, "storage": ROUND_TRIP, "pubsub": ROUND_TRIP},
+    ))
+    load_test.seed(backend, 2 * REQUESTS, FILE_SIZE)
+
+    from app.main import app
+    from app.auth_google import google_auth_dependency
+    from app.models.claims import GoogleClaims
+
+    claims = GoogleClaims(iss="https://accounts.google.com", aud="test", sub="test-user")
+
+    async def authenticated():
+        return claims
+
+    # Async, so the stub does not add threadpool hops of its own.
+    app.dependency_overrides[google_auth_dependency] = authenticated
+    try:
+        scenarios = {scenario.name: scenario for scenario in load_test.build_scenarios(backend)}
+
+        def round_of(offset: int) -> list:
+            requests = [
+                request
+                for i in range(offset, offset + REQUESTS)
+                for request in (_upload(i), scenarios["scrub.download"].build(i), scenarios["storage.download"].build(i))
+            ]
+            return [_from_client(request, n) for n, request in enumerate(requests)]
+
+        requests = round_of(REQUESTS)
+        responses, elapsed, lag = asyncio.run(_run(app, round_of(0), requests))
+    finally:
+        app.dependency_overrides.pop(google_auth_dependency, None)
+
+    assert [response.status for response in responses] == [200] * len(requests)
+    assert lag < MAX_LAG, f"event loop stalled for {lag * 1000:.1f} ms"
+    # Every request waits on at least one round trip, so run one by one they would take longer.
+    assert elapsed < len(requests) * ROUND_TRIP * 0.75, f"requests took {elapsed:.2f} s"
@@ -0,0 +1,95 @@
+"""PubSubService against a fake PublisherClient whose futures resolve when the test says so."""
+import logging
+import threading
+import time
+from concurrent.futures import Future
+
+import pytest
+
+import app.services.pubsub_service as pubsub_module
+from app.services.pubsub_service import PubSubService
+
+
+class FakePublisherClient:
+    def __init__(self, batch_settings=None, publisher_options=None):
+        self.batch_settings = batch_settings
+        self.publisher_options = publisher_options
+        self.published = []
+        self.stopped = False
+
+    @staticmethod
+    def topic_path(project_id: str, topic_id: str) -> str:
+        return f"projects/{project_id}/topics/{topic_id}"
+
+    def publish(self, topic: str, data: bytes) -> Future:
+        future = Future()
+        self.published.append((topic, data, future))
+        return future
+
+    def stop(self) -> None:
+        self.stopped = True
+
+
+@pytest.fixture
+def service(monkeypatch):
+    monkeypatch.setenv("GCP_PROJECT_ID", "test-project")
+    monkeypatch.setenv("PUBSUB_TOPIC", "scrub-jobs")
+    monkeypatch.setattr(pubsub_module.pubsub_v1, "PublisherClient", FakePublisherClient)
+    return PubSubService()
+
+
+def test_publish_nowait_returns_before_the_ack(service):
+    future = service.publish_nowait({"id": "doc-1"})
+
+    assert not future.done()
+    [(topic, data, _)] = service.publisher.published
+    assert topic == "projects/test-project/topics/scrub-jobs"
+    assert data == b'{"id": "doc-1"}'
+
+    future.set_result("message-1")
+    assert future.result() == "message-1"
+    assert not service._pending
+
+
+def test_publish_message_waits_for_the_message_id(service):
+    threading.Timer(0.05, lambda: service.publisher.published[0][2].set_result("message-2")).start()
+
+    assert service.publish_message("hello") == "message-2"
+
+
+def test_failed_publish_is_logged_by_the_callback(service, caplog):
+    future = service.publish_nowait("hello")
+
+    with caplog.at_level(logging.ERROR, logger=pubsub_module.__name__):
+        future.set_exception(RuntimeError("topic not found"))
+
+    assert "Failed to publish message: topic not found" in caplog.text
+    assert not service._pending
+
+
+def test_shutdown_stops_the_publisher_and_waits_for_pending_messages(service, monkeypatch):
+    monkeypatch.setenv("PUBSUB_SHUTDOWN_TIMEOUT", "5")
+    future = service.publish_nowait("hello")
+    threading.Timer(0.1, lambda: future.set_result("message-3")).start()
+
+    started = time.perf_counter()
+    service.shutdown()
+    elapsed = time.perf_counter() - started
+
+    assert service.publisher.stopped
+    assert future.done()
+    assert 0.05 < elapsed < 5
+
+
+def test_shutdown_gives_up_after_the_timeout(service, monkeypatch, caplog):
+    monkeypatch.setenv("PUBSUB_SHUTDOWN_TIMEOUT", "0.2")
+    service.publish_nowait("never acked")
+
+    started = time.perf_counter()
+    with caplog.at_level(logging.ERROR, logger=pubsub_module.__name__):
+        service.shutdown()
+    elapsed = time.perf_counter() - started
+
+    assert service.publisher.stopped
+    assert 0.2 <= elapsed < 2
+    assert "1 Pub/Sub messages still pending at shutdown" in caplog.text
@@ -0,0 +1,117 @@
+"""Unit tests for the in-process scrub engine's record splitting, column resolution and chunk scrubbing."""
+import pytest
+
+from app.scrub import worker
+from app.scrub.dnc_index import build_index
+from app.scrub.engine import resolve_phone_indexes, split_records
+from app.scrub.worker import scrub_chunk
+
+
+@pytest.fixture
+def dnc_path(tmp_path):
+    source = tmp_path / "dnc.txt"
+    source.write_text("(555) 234-0000\n1-555-234-0001\n", encoding="utf-8")
+    output = str(tmp_path / "dnc.idx")
+    build_index([str(source)], output, partitions=4)
+    yield output
+    # Drop the worker's memory-mapped index before the file goes away.
+    worker.use_dnc_index(None)
+
+
+# --- split_records -----------------------------------------------------------
+
+def test_split_records_splits_after_last_newline():
+    assert split_records(b"a,1\nb,2\nc,") == (b"a,1\nb,2\n", b"c,")
+
+
+def test_split_records_keeps_complete_block_whole():
+    assert split_records(b"a,1\nb,2\n") == (b"a,1\nb,2\n", b"")
+
+
+def test_split_records_without_newline_returns_remainder_only():
+    assert split_records(b"a,1") == (b"", b"a,1")
+
+
+def test_split_records_ignores_newlines_inside_quotes():
+    data = b'a,1\nb,"two\nlines",2\nc,"open\n'
+    assert split_records(data) == (b'a,1\nb,"two\nlines",2\n', b'c,"open\n')
+
+
+# --- resolve_phone_indexes ---------------------------------------------------
+
+def test_resolve_phone_indexes_prefers_explicit_indexes():
+    config = {"phoneColumnIndexes": [2, 0], "phoneColumns": ["phone"]}
+    assert resolve_phone_indexes(config, ["phone", "name", "mobile"]) == [2, 0]
+
+
+def test_resolve_phone_indexes_looks_up_names_and_aliases():
+    config = {"phoneColumns": ["phone", "mobile", "fax"], "columnAliases": {"mobile": "Cell"}}
+    assert resolve_phone_indexes(config, ["name", " phone ", "Cell"]) == [1, 2]
+
+
+def test_resolve_phone_indexes_without_header_or_indexes():
+    assert resolve_phone_indexes({"phoneColumns": ["phone"]}, None) == []
+
+
+def test_resolve_phone_indexes_orders_by_position():
+    config = {"phoneColumnIndexes": [1, 3, 4], "phoneOrderIndexes": [2, 0, 1]}
+    assert resolve_phone_indexes(config, None) == [4, 1, 3]
+
+
+def test_resolve_phone_indexes_orders_by_column_index():
+    config = {"phoneColumnIndexes": [1, 3, 4], "phoneOrderIndexes": [4]}
+    assert resolve_phone_indexes(config, None) == [4, 1, 3]
+
+
+def test_resolve_phone_indexes_ignores_unknown_order():
+    config = {"phoneColumnIndexes": [1, 3], "phoneOrderIndexes": [7]}
+    assert resolve_phone_indexes(config, None) == [1, 3]
+
+
+# --- scrub_chunk -------------------------------------------------------------
+
+def test_scrub_chunk_normalizes_valid_phones_of_clean_rows():
+    result = scrub_chunk(b"Ann,(555) 234-1111,+1 555.234.2222\n", [1, 2])
+    assert result.clean == b"Ann,5552341111,5552342222\n"
+    assert (result.rows, result.clean_rows, result.invalid_rows, result.dnc_rows) == (1, 1, 0, 0)
+
+
+def test_scrub_chunk_keeps_invalid_secondary_phones():
+    result = scrub_chunk(b"Bob,123,555-234-9999\nCat,555-234-8888,n/a\n", [1, 2])
+    assert result.clean == b"Bob,123,5552349999\nCat,5552348888,n/a\n"
+    assert result.invalid == b""
+
+
+def test_scrub_chunk_writes_rows_without_valid_phone_unchanged():
+    result = scrub_chunk(b"Dan,123,\nEve,555-134-0000,x\n", [1, 2])
+    assert result.invalid == b"Dan,123,\nEve,555-134-0000,x\n"
+    assert (result.clean_rows, result.invalid_rows) == (0, 2)
+
+
+def test_scrub_chunk_handles_rows_missing_phone_columns():
+    result = scrub_chunk(b"Fay\nGus,5552343333\n", [1])
+    assert result.invalid == b"Fay\n"
+    assert result.clean == b"Gus,5552343333\n"
+
+
+def test_scrub_chunk_keeps_quoted_fields():
+    result = scrub_chunk(b'"Hal, Jr.","line\nbreak",555-234-4444\n', [2])
+    assert result.clean == b'"Hal, Jr.","line\nbreak",5552344444\n'
+
+
+def test_scrub_chunk_without_phone_columns_marks_everything_invalid():
+    result = scrub_chunk(b"Ida,5552345555\n\nJon,5552346666\n", [])
+    assert result.invalid == b"Ida,5552345555\nJon,5552346666\n"
+    assert (result.rows, result.invalid_rows) == (2, 2)
+
+
+def test_scrub_chunk_classifies_by_first_valid_phone(dnc_path):
+    data = (
+        b"Kim,555-234-0000,5552347777\n"  # primary listed
+        b"Lee,5552347777,555-234-0000\n"  # secondary listed only
+        b"Max,bad,1 555 234 0001\n"  # first valid phone listed
+    )
+    result = scrub_chunk(data, [1, 2], dnc_path)
+    assert result.dnc == b"Kim,555-234-0000,5552347777\nMax,bad,1 555 234 0001\n"
+    assert result.clean == b"Lee,5552347777,5552340000\n"
+    assert (result.rows, result.clean_rows, result.invalid_rows, result.dnc_rows) == (3, 1, 0, 2)
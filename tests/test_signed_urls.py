@@ -0,0 +1,128 @@
+"""V4 signed URLs signed offline with a service-account key, and the routes that hand them out."""
+import json
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+import rsa
+from google.auth.credentials import AnonymousCredentials
+from google.cloud import storage
+
+from app.services.registry import registry
+from app.services.storage_service import AsyncStorageService, StorageService
+
+SIGNER_EMAIL = "url-signer@test-project.iam.gserviceaccount.com"
+
+
+@pytest.fixture(scope="module")
+def key_file(tmp_path_factory):
+    _, private_key = rsa.newkeys(1024)
+    path = tmp_path_factory.mktemp("keys") / "service-account.json"
+    path.write_text(json.dumps({
+        "type": "service_account",
+        "project_id": "test-project",
+        "private_key_id": "test-key",
+        "private_key": private_key.save_pkcs1().decode("ascii"),
+        "client_email": SIGNER_EMAIL,
+        "client_id": "1",
+        "token_uri": "https://oauth2.googleapis.com/token",
+    }))
+    return str(path)
+
+
+@pytest.fixture
+def service(monkeypatch, key_file):
+    monkeypatch.setenv("GCS_SIGNING_KEY_FILE", key_file)
+    # Anonymous credentials: any attempt to reach Google would fail the test.
+    client = storage.Client(project="test-project", credentials=AnonymousCredentials())
+    return StorageService(client=client)
+
+
+def _query(url: str) -> dict:
+    return {name: values[0] for name, values in parse_qs(urlsplit(url).query).items()}
+
+
+def test_upload_url_is_signed_for_put_with_content_type(service):
+    url = service.generate_upload_url("uploads/leads.csv", content_type="text/csv", expires_in=600)
+
+    parts = urlsplit(url)
+    query = _query(url)
+    assert parts.path == f"/{service.bucket_name}/uploads/leads.csv"
+    assert query["X-Goog-Algorithm"] == "GOOG4-RSA-SHA256"
+    assert query["X-Goog-Credential"].startswith(f"{SIGNER_EMAIL}/")
+    assert query["X-Goog-Expires"] == "600"
+    assert query["X-Goog-SignedHeaders"] == "content-type;host"
+    assert len(query["X-Goog-Signature"]) == 256  # hex of a 1024-bit RSA signature
+
+
+def test_download_url_names_the_attachment(service):
+    url = service.generate_download_url("results/doc-1/leads-clean.csv", filename="leads-clean.csv")
+
+    query = _query(url)
+    assert query["X-Goog-Algorithm"] == "GOOG4-RSA-SHA256"
+    assert query["X-Goog-SignedHeaders"] == "host"
+    assert query["response-content-disposition"] == 'attachment; filename="leads-clean.csv"'
+    assert query["X-Goog-Expires"] == str(service.signed_url_ttl)
+
+
+def test_signed_url_lifetime_is_capped_at_seven_days(service):
+    url = service.generate_download_url("results/doc-1/leads-clean.csv", expires_in=30 * 24 * 3600)
+
+    assert _query(url)["X-Goog-Expires"] == str(7 * 24 * 3600)
+
+
+def _item(file_name: str) -> dict:
+    return {
+        "fileName": file_name,
+        "uploadedByUserId": "test-user",
+        "phoneColumns": ["phone"],
+        "columnAliases": {},
+        "phoneColumnIndexes": [0],
+        "phoneOrderIndexes": [0],
+        "hasHeaderRow": True,
+        "timestamp": "2024-01-01T00:00:00",
+        "status": {"stage": "UPLOADED", "lastUpdated": "2024-01-01T00:00:00"},
+        "outputFiles": {},
+    }
+
+
+def _finalize(client, file_name: str):
+    body = json.dumps(_item(file_name)).encode("utf-8")
+    return client("POST", "/api/v1/scrub-files/upload/finalize", {"Content-Type": "application/json"}, body)
+
+
+def test_finalize_without_uploaded_object_is_404(backend, client):
+    response = _finalize(client, "missing.csv")
+
+    assert response.status == 404
+    assert not backend.documents
+    assert backend.published == 0
+
+
+def test_finalize_saves_config_of_uploaded_object(backend, client):
+    backend.put_blob("uploads/leads.csv", b"phone\n5552341234\n", "text/csv")
+
+    response = _finalize(client, "leads.csv")
+
+    assert response.status == 200
+    content = json.loads(response.body)
+    assert content["size"] == 17
+    assert backend.documents[content["id"]]["fileName"] == "leads.csv"
+
+
+def test_download_url_redirects_to_the_signed_url(backend, client, service):
+    registry.register("storage_service", service)
+    registry.register("async_storage_service", AsyncStorageService(service))
+    backend.documents["doc-1"] = {
+        "fileName": "leads.csv",
+        "status": {"stage": "DONE"},
+        "outputFiles": {"cleanFilePath": "results/doc-1/leads-clean.csv"},
+    }
+
+    response = client("GET", "/api/v1/scrub-files/download-url/doc-1?file_type=clean&redirect=true")
+
+    assert response.status == 307
+    location = dict(response.headers)[b"location"].decode("latin-1")
+    assert urlsplit(location).path == f"/{service.bucket_name}/results/doc-1/leads-clean.csv"
+    query = _query(location)
+    assert query["X-Goog-Algorithm"] == "GOOG4-RSA-SHA256"
+    assert query["response-content-disposition"] == 'attachment; filename="leads-clean.csv"'
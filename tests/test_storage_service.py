@@ -0,0 +1,133 @@
+"""StorageService against a fake GCS client: chunked uploads."""
+import asyncio
+import base64
+import hashlib
+import io
+import json
+
+import google_crc32c
+import pytest
+from starlette.datastructures import Headers, UploadFile
+
+from app.services.registry import registry
+from app.services.storage_service import CHUNK_SIZE_MULTIPLE, StorageService
+from benchmarks.asgi import multipart
+
+
+class FakeWriter:
+    def __init__(self, blob):
+        self.blob = blob
+        self.writes = []
+
+    def write(self, data: bytes) -> int:
+        self.writes.append(len(data))
+        self.blob.parts.append(data)
+        return len(data)
+
+    def close(self) -> None:
+        self.blob.data = b"".join(self.blob.parts)
+
+
+class FakeGcsBlob:
+    def __init__(self, name: str, chunk_size=None):
+        self.name = name
+        self.chunk_size = chunk_size
+        self.content_encoding = None
+        self.parts = []
+        self.data = None
+        self.content_type = None
+        self.writer = None
+
+    def open(self, mode: str, content_type=None, checksum=None):
+        assert mode == "wb"
+        self.content_type = content_type
+        self.writer = FakeWriter(self)
+        return self.writer
+
+
+class FakeGcsBucket:
+    def __init__(self):
+        self.blobs = {}
+
+    def blob(self, name: str, chunk_size=None) -> FakeGcsBlob:
+        blob = self.blobs[name] = FakeGcsBlob(name, chunk_size)
+        return blob
+
+
+class FakeGcsClient:
+    def __init__(self):
+        self.buckets = {}
+
+    def bucket(self, name: str) -> FakeGcsBucket:
+        return self.buckets.setdefault(name, FakeGcsBucket())
+
+
+class RecordingUploadFile(UploadFile):
+    """UploadFile remembering the size of every read."""
+
+    def __init__(self, data: bytes, filename: str):
+        super().__init__(io.BytesIO(data), filename=filename, headers=Headers({"content-type": "text/csv"}))
+        self.reads = []
+
+    async def read(self, size: int = -1) -> bytes:
+        self.reads.append(size)
+        return await super().read(size)
+
+
+@pytest.fixture
+def gcs(monkeypatch):
+    monkeypatch.setenv("GCS_UPLOAD_CHUNK_SIZE", str(CHUNK_SIZE_MULTIPLE))
+    monkeypatch.delenv("GCS_CONTENT_ENCODING", raising=False)
+    client = FakeGcsClient()
+    return client, StorageService(client=client)
+
+
+def test_upload_stream_reads_in_bounded_chunks(gcs):
+    client, service = gcs
+    payload = bytes(range(256)) * 4096 + b"tail"  # four chunks and a bit
+    upload = RecordingUploadFile(payload, "leads.csv")
+
+    result = asyncio.run(service.upload_stream(upload, "uploads/leads.csv"))
+
+    assert upload.reads and all(0 < size <= CHUNK_SIZE_MULTIPLE for size in upload.reads)
+    blob = client.bucket(service.bucket_name).blobs["uploads/leads.csv"]
+    assert blob.chunk_size == CHUNK_SIZE_MULTIPLE
+    assert max(blob.writer.writes) <= CHUNK_SIZE_MULTIPLE
+    assert blob.data == payload
+    assert blob.content_type == "text/csv"
+    assert result == {
+        "path": "uploads/leads.csv",
+        "size": len(payload),
+        "sha256": hashlib.sha256(payload).hexdigest(),
+        "stored_size": len(payload),
+        "crc32c": base64.b64encode(google_crc32c.Checksum(payload).digest()).decode("ascii"),
+        "content_encoding": None,
+    }
+
+
+def test_upload_stream_compresses_at_rest(gcs, monkeypatch):
+    monkeypatch.setenv("GCS_CONTENT_ENCODING", "gzip")
+    client, service = gcs
+    payload = b"5552341234,Jane Doe\n" * 50000
+
+    result = asyncio.run(service.upload_stream(RecordingUploadFile(payload, "leads.csv"), "leads.csv"))
+
+    blob = client.bucket(service.bucket_name).blobs["leads.csv"]
+    assert blob.content_encoding == "gzip"
+    assert result["size"] == len(payload)
+    assert result["sha256"] == hashlib.sha256(payload).hexdigest()
+    assert result["stored_size"] == len(blob.data) < len(payload)
+    assert result["crc32c"] == base64.b64encode(google_crc32c.Checksum(blob.data).digest()).decode("ascii")
+
+
+def test_storage_upload_route_uses_the_file_name(gcs, client):
+    gcs_client, service = gcs
+    registry.register("storage_service", service)
+    payload = b"phone,name\n5552341234,Jane Doe\n"
+    body, content_type = multipart({}, [("file", "leads.csv", payload, "text/csv")])
+
+    response = client("POST", "/api/v1/storage/upload", {"Content-Type": content_type}, body)
+
+    assert response.status == 200
+    assert json.loads(response.body) == {"message": "File uploaded", "file_name": "leads.csv"}
+    assert gcs_client.bucket(service.bucket_name).blobs["leads.csv"].data == payload
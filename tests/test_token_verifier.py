@@ -0,0 +1,224 @@
+"""GoogleTokenVerifier with self-signed tokens and a stubbed certs endpoint."""
+import time
+
+import google.auth.jwt
+import pytest
+import requests
+import rsa
+from fastapi import HTTPException
+from google.auth.crypt import RSASigner
+
+import app.auth_google as auth_google
+import app.token_verifier as token_verifier_module
+from app.token_verifier import UNKNOWN_KID_REFRESH_INTERVAL, GoogleTokenVerifier
+
+AUDIENCE = "test-client.apps.googleusercontent.com"
+
+
+class Keys:
+    def __init__(self, kid: str):
+        public_key, private_key = rsa.newkeys(1024)
+        self.kid = kid
+        self.public_pem = public_key.save_pkcs1().decode("ascii")
+        self.signer = RSASigner.from_string(private_key.save_pkcs1(), key_id=kid)
+
+
+@pytest.fixture(scope="module")
+def keys():
+    return Keys("key-1"), Keys("key-2")
+
+
+class FakeClock:
+    """Stands in for the `time` module inside app.token_verifier."""
+
+    def __init__(self):
+        self.now = time.time()
+
+    def time(self) -> float:
+        return self.now
+
+
+class FakeResponse:
+    def __init__(self, certs: dict, max_age: int):
+        self._certs = certs
+        self.headers = {"Cache-Control": f"public, max-age={max_age}"}
+
+    def raise_for_status(self) -> None:
+        pass
+
+    def json(self) -> dict:
+        return dict(self._certs)
+
+
+class StubCertsSession:
+    """Serves `{kid: PEM}` like Google's certs endpoint; set `fail` to make fetches error."""
+
+    def __init__(self, *keys: Keys, max_age: int = 3600):
+        self.certs = {key.kid: key.public_pem for key in keys}
+        self.max_age = max_age
+        self.fail = False
+        self.fetches = 0
+
+    def get(self, url: str, timeout=None) -> FakeResponse:
+        self.fetches += 1
+        if self.fail:
+            raise requests.ConnectionError("certs endpoint unreachable")
+        return FakeResponse(self.certs, self.max_age)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(token_verifier_module, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def verifier(clock, keys):
+    verifier = GoogleTokenVerifier(certs_url="http://certs.test/oauth2/v1/certs", cache_size=16)
+    verifier._session = StubCertsSession(keys[0])
+    decode = verifier._decode
+    verifier.decodes = 0
+
+    def counting_decode(token):
+        verifier.decodes += 1
+        return decode(token)
+
+    verifier._decode = counting_decode
+    yield verifier
+    verifier.stop()
+
+
+def _token(key: Keys, lifetime: int = 3600, **claims) -> str:
+    # iat/exp are checked against the real clock by google.auth.
+    now = int(time.time())
+    payload = {
+        "iss": "https://accounts.google.com",
+        "aud": AUDIENCE,
+        "sub": "user-1",
+        "iat": now,
+        "exp": now + lifetime,
+        **claims,
+    }
+    return google.auth.jwt.encode(key.signer, payload).decode("ascii")
+
+
+def test_verify_returns_claims(verifier, keys):
+    claims = verifier.verify(_token(keys[0]))
+
+    assert claims["sub"] == "user-1"
+    assert claims["aud"] == AUDIENCE
+
+
+def test_verify_rejects_a_token_signed_with_another_key(verifier, keys):
+    # A different key pair reusing key-1's kid: the signature does not match.
+    forged = _token(Keys("key-1"))
+
+    with pytest.raises(ValueError):
+        verifier.verify(forged)
+
+
+def test_cached_verification_skips_certs_fetch(verifier, clock, keys):
+    verifier._session.max_age = 60
+    token = _token(keys[0])
+    verifier.verify(token)
+    # Past the certs' max-age: a fresh verification would have to refetch them.
+    clock.now += 120
+
+    verifier.verify(token)
+
+    assert verifier._session.fetches == 1
+    assert verifier.decodes == 1
+
+
+def test_cache_entry_expires_at_exp(verifier, clock, keys):
+    token = _token(keys[0], lifetime=600)
+    exp = google.auth.jwt.decode(token, verify=False)["exp"]
+    verifier.verify(token)
+
+    clock.now = exp - 1
+    verifier.verify(token)
+    assert verifier.decodes == 1
+
+    clock.now = exp
+    verifier.verify(token)
+    assert verifier.decodes == 2
+
+
+def test_unknown_kid_forces_one_refresh_per_interval(verifier, clock, keys):
+    token = _token(keys[1])
+
+    with pytest.raises(ValueError):
+        verifier.verify(token)
+    assert verifier._session.fetches == 2  # initial load plus one forced refresh
+
+    with pytest.raises(ValueError):
+        verifier.verify(token)
+    clock.now += UNKNOWN_KID_REFRESH_INTERVAL - 1
+    with pytest.raises(ValueError):
+        verifier.verify(token)
+    assert verifier._session.fetches == 2
+
+    # Google rotates key-2 in; the next forced refresh picks it up.
+    verifier._session.certs[keys[1].kid] = keys[1].public_pem
+    clock.now += 1
+    assert verifier.verify(token)["sub"] == "user-1"
+    assert verifier._session.fetches == 3
+
+
+def test_stale_certs_are_served_when_refresh_fails(verifier, clock, keys):
+    verifier._session.max_age = 60
+    verifier.verify(_token(keys[0]))
+    clock.now += 120
+    verifier._session.fail = True
+
+    claims = verifier.verify(_token(keys[0], sub="user-2"))
+
+    assert claims["sub"] == "user-2"
+    assert verifier._session.fetches == 2
+
+
+def test_verify_fails_when_certs_never_loaded(verifier, keys):
+    verifier._session.fail = True
+
+    with pytest.raises(requests.RequestException):
+        verifier.verify(_token(keys[0]))
+
+
+@pytest.fixture
+def auth(monkeypatch, verifier):
+    monkeypatch.setattr(auth_google, "token_verifier", verifier)
+    monkeypatch.setattr(auth_google, "client_allowlist", frozenset({AUDIENCE}))
+
+
+def test_verify_google_id_token_accepts_allowed_audience(auth, keys):
+    claims = auth_google.verify_google_id_token(_token(keys[0]))
+
+    assert claims.sub == "user-1"
+
+
+@pytest.mark.parametrize("claims, status", [
+    ({"iss": "https://evil.example.com"}, 401),
+    ({"aud": "other-client.apps.googleusercontent.com"}, 403),
+])
+def test_verify_google_id_token_rejects_bad_claims(auth, keys, claims, status):
+    with pytest.raises(HTTPException) as error:
+        auth_google.verify_google_id_token(_token(keys[0], **claims))
+
+    assert error.value.status_code == status
+
+
+def test_verify_google_id_token_rejects_invalid_token(auth):
+    with pytest.raises(HTTPException) as error:
+        auth_google.verify_google_id_token("not.a.token")
+
+    assert error.value.status_code == 401
+
+
+def test_verify_google_id_token_without_certs_is_503(auth, verifier, keys):
+    verifier._session.fail = True
+
+    with pytest.raises(HTTPException) as error:
+        auth_google.verify_google_id_token(_token(keys[0]))
+
+    assert error.value.status_code == 503